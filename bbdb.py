@@ -1,10 +1,12 @@
-from functools import cmp_to_key
+import heapq
 
 class Puzzle:
     """
     Stores data relating to an individual puzzle.
     """
 
+    __slots__ = ("_question", "_answer", "_hint")
+
     def __init__(self, question, answer, hint):
         """
         Constructor.
@@ -89,6 +91,8 @@ class FindStats:
     Stores data relating to when a cache was found and solved and how many attempts were used.
     """
 
+    __slots__ = ("_time_found", "_time_solved", "_attempts")
+
     def __init__(self, time_found, time_solved = None, attempts = 0):
         """
         Constructor.
@@ -175,6 +179,26 @@ class FindStats:
 
         return FindStats(self._time_found, when, self._attempts + 1)
     
+    def sort_key(self):
+        """
+        Gets a key that sorts the best stats first, based on the following:
+        1. Found before not found.
+        2. Solved before not solved.
+        3. If both solved, less time taken to solve first.
+        4. Fewer attempts first.
+        5. Found earlier first.
+
+        @return {tuple (bool, bool, int, int, int)} (not found, not solved, how long, attempts, time found)
+        """
+
+        return (
+            self._time_found is None,
+            self._time_solved is None,
+            self._time_solved - self._time_found if self._time_solved is not None else 0,
+            self._attempts,
+            self._time_found if self._time_found is not None else 0
+        )
+    
     def __eq__(self, other):
         """
         == operator
@@ -201,44 +225,14 @@ class FindStats:
     def __lt__(self, other):
         """
         < operator
-        Checks if this object's stats are better than another object's based on the following:
-        1. If one has been found and another hasn't, the one that has been found wins.
-        2. If one has been solved and another hasn't, the one that has been solved wins.
-        4. If both have been found but not solved (tie for #1), prioritize attempts -> time found.
-        3. If both have been solved (tie for #2), prioritize how_long -> attempts -> time_found.
+        Checks if this object's stats are better than another object's, in the
+        order given by sort_key.
 
         @param  {FindStats} other
         @return {bool}      True if this object's stats beat other object's
         """
 
-        if self.found() and not other.found():
-            return True
-        elif self.found() and other.found():
-            if self.solved() and not other.solved():
-                return True
-            elif self.solved() and other.solved():
-                if self.how_long() < other.how_long():
-                    return True
-                elif self.how_long() == other.how_long():
-                    if self.attempts() < other.attempts():
-                        return True
-                    else:
-                        return self.attempts == other.attempts() \
-                            and self.time_found() < other.time_found()
-                else:
-                    return False
-            elif not self.solved() and not other.solved():
-                if self.attempts() < other.attempts():
-                    return True
-                else:
-                    return self.attempts() == other.attempts() \
-                        and self.time_found() < other.time_found()
-            else:
-                return False
-        elif not self.found() and not other.found():
-            return True
-        else:
-            return False
+        return self.sort_key() < other.sort_key()
     
     def __le__(self, other):
         """
@@ -315,17 +309,22 @@ class FindStats:
     def empty():
         """
         Gets a default empty object that has not been found or solved and has no attempts.
+        FindStats never changes, so the same object is shared.
 
         @return {FindStats} with time_found = None, time_solved = None, attempts = 0
         """
 
-        return FindStats(None)
+        return EMPTY_FIND_STATS
+
+EMPTY_FIND_STATS = FindStats(None)
 
 class PlayerFindStats:
     """
     Associates a player name with a FindStats object.
     """
 
+    __slots__ = ("_player", "_stats")
+
     def __init__(self, player, stats):
         """
         Constructor.
@@ -398,6 +397,8 @@ class PlayerScore:
     Holds data relating to how many puzzle caches a player has found and solved.
     """
 
+    __slots__ = ("_player", "_finds", "_solves")
+
     def __init__(self, player, finds = 0, solves = 0):
         """
         Constructor.
@@ -437,6 +438,17 @@ class PlayerScore:
         
         return self._solves
     
+    def sort_key(self):
+        """
+        Gets a key that sorts the best scores first, based on the following:
+        1. More solves first.
+        2. If tied on solves, more finds first.
+
+        @return {tuple (int, int)} (-solves, -finds)
+        """
+
+        return (-self._solves, -self._finds)
+    
     def __str__(self):
         """
         Gets a human-readable string.
@@ -480,6 +492,8 @@ class CacheRecord:
     Stores data relating to a puzzle cache, including the question and ansewr and which players have found and solved it.
     """
 
+    __slots__ = ("_puzzle", "_stats", "_listener")
+
     def __init__(self, puzzle, stats = None):        
         """
         Constructor.
@@ -490,6 +504,16 @@ class CacheRecord:
 
         self._puzzle = puzzle
         self._stats = stats if stats else {}
+        self._listener = None
+    
+    def listen(self, listener):
+        """
+        Sets a function to call whenever a player's statistics change.
+
+        @param {function} listener Called as listener(player, old, new) with the old and new FindStats
+        """
+
+        self._listener = listener
     
     def find(self, player, when):
         """
@@ -499,7 +523,7 @@ class CacheRecord:
         @param {int} when   Time in Unix nanosecons
         """
 
-        self._stats[player] = FindStats(when)
+        self._set(player, FindStats(when))
     
     def try_to_solve(self, player, guess, when):
         """
@@ -514,12 +538,36 @@ class CacheRecord:
         """
 
         if guess.casefold() == self._puzzle.answer().casefold():
-            self._stats[player] = self._stats[player].with_solution(when)
+            self._set(player, self._stats[player].with_solution(when))
             return True
         else:
-            self._stats[player] = self._stats[player].with_attempt()
+            self._set(player, self._stats[player].with_attempt())
             return False
     
+    def set_stats(self, player, stats):
+        """
+        Sets a player's statistics for this cache, replacing any they had.
+
+        @param {str}       player Name
+        @param {FindStats} stats
+        """
+
+        self._set(player, stats)
+    
+    def _set(self, player, stats):
+        """
+        Sets a player's statistics and tells the listener.
+
+        @param {str}       player Name
+        @param {FindStats} stats
+        """
+
+        old = self.stats(player)
+        self._stats[player] = stats
+        
+        if self._listener is not None:
+            self._listener(player, old, stats)
+    
     def puzzle(self):
         """
         Gets the puzzle associated with this cache.
@@ -545,10 +593,7 @@ class CacheRecord:
         @return {FindStats} Player stats or empty if player hasn't found this cache
         """
 
-        if player in self._stats.keys():
-            return self._stats[player]
-        else:
-            return FindStats.empty()
+        return self._stats.get(player, EMPTY_FIND_STATS)
     
     def top(self, count):
         """
@@ -559,9 +604,8 @@ class CacheRecord:
         """
 
         player_stats = [PlayerFindStats(k, v) for k, v in self._stats.items()]
-        player_stats.sort(key=lambda x: x.stats())
         
-        return player_stats[:count]
+        return heapq.nsmallest(count, player_stats, key=lambda x: x.stats().sort_key())
     
     def __str__(self):
         """
@@ -604,7 +648,9 @@ class CacheRecord:
 class CacheDatabase:
     """
     Stores data for puzzle for every cache and statistics about whether players
-    have found and solved them.
+    have found and solved them. Each player's statistics are also indexed by
+    player, along with their number of finds and solves, and kept up to date
+    as the cache records change.
     """
 
     def __init__(self, d = None):
@@ -617,6 +663,13 @@ class CacheDatabase:
         """
 
         self._dict = d if d else CacheDatabase._get_default_data()
+        self._history = {}
+        self._scores = {}
+
+        for k, v in self._dict.items():
+            for p in v.players():
+                self._update(k, p, EMPTY_FIND_STATS, v.stats(p))
+            v.listen(lambda player, old, new, cache=k: self._update(cache, player, old, new))
     
     @staticmethod
     def _get_default_data():
@@ -679,13 +732,7 @@ class CacheDatabase:
         @return {list of str} Player names
         """
 
-        s = set()
-        
-        for v in self._dict.values():
-            for p in v.players():
-                s.add(p)
-        
-        return list(s)
+        return list(self._history.keys())
     
     def history(self, player):
         """
@@ -693,14 +740,8 @@ class CacheDatabase:
 
         @return {dict of str: FindStats}
         """
-        d = {}
-        
-        for k, v in self._dict.items():
-            s = v.stats(player)
-            if s != FindStats.empty():
-                d[k] = s
-        
-        return d
+
+        return dict(self._history.get(player, {}))
     
     def stats(self, player):
         """
@@ -710,43 +751,10 @@ class CacheDatabase:
         @return {PlayerScore}
         """
 
-        h = self.history(player)
-        finds = 0
-        solves = 0
-        
-        for v in h.values():
-            finds += 1
-            if v.solved():
-                solves += 1
+        finds, solves = self._scores.get(player, (0, 0))
         
         return PlayerScore(player, finds, solves)
     
-    @staticmethod
-    def _compare_stats(a, b):
-        """"
-        Compares player stats, based on the following:
-        1. If a has more solves, a > b.
-        2. If a and be have the same number of solves, but a has more finds,
-           a > b.
-        3. If a and b have the same number of finds, a == b.
-        4. Otherwise, a < b.
-
-        @param {str} a 1st player name
-        @param {str} b 2nd player name
-        @return {int} -1 if a > b, 0 if a == b, 1 if a < b
-        """
-        if a.solves() > b.solves():
-            return -1
-        elif a.solves() == b.solves():
-            if a.finds() > b.finds():
-                return -1
-            elif a.finds() == b.finds():
-                return 0
-            else:
-                return 1
-        else:
-            return 1
-    
     def top(self, count = 0):
         """
         Gets the best-performing players for the game overall.
@@ -755,11 +763,36 @@ class CacheDatabase:
         @return {list of PlayerScore} Up to count number of objects
         """
 
-        s = [self.stats(p) for p in self.players()]
+        s = [PlayerScore(p, finds, solves) for p, (finds, solves) in self._scores.items()]
+        key = lambda x: x.sort_key()
         
-        s.sort(key=cmp_to_key(CacheDatabase._compare_stats))
+        return sorted(s, key=key) if count <= 0 else heapq.nsmallest(count, s, key=key)
+    
+    def _update(self, cache, player, old, new):
+        """
+        Updates the player index after a player's statistics for a cache change.
+
+        @param {str}       cache  Cache name
+        @param {str}       player Name
+        @param {FindStats} old    Statistics before the change
+        @param {FindStats} new    Statistics after the change
+        """
+
+        if new.found():
+            self._history.setdefault(player, {})[cache] = new
+        elif player in self._history:
+            self._history[player].pop(cache, None)
+            if len(self._history[player]) == 0:
+                del self._history[player]
+        
+        finds, solves = self._scores.get(player, (0, 0))
+        finds += new.found() - old.found()
+        solves += new.solved() - old.solved()
         
-        return s if count <= 0 else s[:count]
+        if finds > 0:
+            self._scores[player] = (finds, solves)
+        else:
+            self._scores.pop(player, None)
     
     def __getitem__(self, key):
         """
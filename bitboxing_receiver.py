@@ -1,12 +1,19 @@
-from bbdb import CacheDatabase 
+from bbdb import CacheDatabase, FindStats
 import bbtp
 import json
+import os
+import shutil
+import threading
 import time
 
+SNAPSHOT_EVERY = 1000
+
 class BitboxingReceiver:
     def __init__(self, version, path):
         self._version = version
         self._path = path
+        self._journal_path = path + ".journal"
+        self._snapshot_thread = None
         
         try:
             with open(self._path, 'r') as f:
@@ -20,6 +27,17 @@ class BitboxingReceiver:
             print("Launching with default data...")
             self._db = CacheDatabase()
             self.flush()
+        
+        replayed = self._replay(self._journal_path + ".old") + self._replay(self._journal_path)
+        if replayed > 0:
+            print(f"Replayed {replayed} journal entries.")
+            if self.flush():
+                for x in [self._journal_path + ".old", self._journal_path]:
+                    if os.path.exists(x):
+                        os.remove(x)
+        
+        self._journal = open(self._journal_path, 'a')
+        self._journal_size = 0
     
     def supports(self, version):
         return version == self._version
@@ -39,7 +57,7 @@ class BitboxingReceiver:
             return bbtp.format_response(bbtp.STATUS_WITHOUT_CHANGE, msg)
         else:
             self._db[cache].find(sender, time.time_ns())
-            self.flush()
+            self._log(cache, sender)
             msg = self._db[cache].puzzle().question()
             return bbtp.format_response(bbtp.STATUS_OK, msg)
     
@@ -59,7 +77,7 @@ class BitboxingReceiver:
             return self.handle_error(sender, bbtp.STATUS_OUT_OF_ORDER)
         else:
             is_correct = self._db[cache].try_to_solve(sender, guess, time.time_ns())
-            self.flush()
+            self._log(cache, sender)
             return bbtp.format_response(bbtp.STATUS_OK if is_correct else bbtp.STATUS_INCORRECT)
     
     def handle_stats(self, sender, player):
@@ -90,14 +108,92 @@ class BitboxingReceiver:
                 return self.handle_error(sender, bbtp.STATUS_EXCEPTION, repr(ex))
     
     def flush(self):
+        return BitboxingReceiver._write_snapshot(self._path, self._db.to_dict())
+    
+    def snapshot(self):
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        
+        data = self._db.to_dict()
+        old_path = self._journal_path + ".old"
+        self._journal.close()
+        
+        if os.path.exists(old_path):
+            # The last snapshot failed, so the old journal still holds entries only it has
+            with open(self._journal_path, 'r') as src, open(old_path, 'a') as dst:
+                shutil.copyfileobj(src, dst)
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.remove(self._journal_path)
+        else:
+            os.replace(self._journal_path, old_path)
+        
+        self._journal = open(self._journal_path, 'a')
+        self._journal_size = 0
+        
+        self._snapshot_thread = threading.Thread(target=self._finish_snapshot, args=(data,), daemon=True)
+        self._snapshot_thread.start()
+    
+    def _finish_snapshot(self, data):
+        if BitboxingReceiver._write_snapshot(self._path, data):
+            os.remove(self._journal_path + ".old")
+    
+    def close(self):
+        if self._snapshot_thread is not None:
+            self._snapshot_thread.join()
+        
+        self._journal.close()
+    
+    def _log(self, cache, player):
+        entry = {'cache': cache, 'player': player, 'stats': self._db[cache].stats(player).to_dict()}
+        # Flushed, not fsynced: an entry survives the server crashing, but may
+        # be lost or torn if the machine does (snapshots are fsynced)
+        self._journal.write(json.dumps(entry) + "\n")
+        self._journal.flush()
+        self._journal_size += 1
+        
+        if self._journal_size >= SNAPSHOT_EVERY:
+            self.snapshot()
+    
+    def _replay(self, path):
+        if not os.path.exists(path):
+            return 0
+        
+        n = 0
+        end = 0
+        
+        with open(path, 'r+b') as f:
+            for line in f:
+                try:
+                    if not line.endswith(b"\n"):
+                        raise ValueError("Missing newline")
+                    entry = json.loads(line)
+                except ValueError:
+                    # Cut the torn entry off so new entries aren't appended to it
+                    print(f"Dropping incomplete journal entry in '{path}'.")
+                    f.truncate(end)
+                    break
+                end += len(line)
+                if self._db.is_valid_cache(entry['cache']):
+                    self._db[entry['cache']].set_stats(entry['player'], FindStats.from_dict(entry['stats']))
+                    n += 1
+        
+        return n
+    
+    @staticmethod
+    def _write_snapshot(path, data):
         try:
-            with open(self._path, 'w') as f:
-                data = self._db.to_dict()
-                s = BitboxingReceiver._to_json(data)
-                f.write(s)
-        except:
-            print(f"Failed to write to '{self._path}'!")
-            print("Exiting without saving data...")
+            temp_path = path + ".tmp"
+            with open(temp_path, 'w') as f:
+                f.write(BitboxingReceiver._to_json(data))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, path)
+            return True
+        except Exception as ex:
+            print(f"Error: '{repr(ex)}'!")
+            print(f"Failed to write to '{path}'!")
+            return False
     
     @staticmethod
     def _to_json(data):
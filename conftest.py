@@ -0,0 +1,3 @@
+# release/ is a separate program whose modules share names with these ones,
+# so its tests are run from inside release/
+collect_ignore = ["release"]
@@ -1,6 +1,20 @@
+import json
+import struct
+
 DELIM_INLINE = "|"
 DELIM_ENDLINE = "\r\n"
 
+VERSIONS = ["0.1", "0.2", "0.3"]
+
+BUFFER_SIZE = 2048
+FRAME_TEXT = b"\x00"
+FRAME_BINARY = b"\x01"
+FRAME_SIZE = struct.Struct("!I")
+FRAME_HEADER_SIZE = 1 + FRAME_SIZE.size
+MAX_FRAME_SIZE = 1 << 24
+MAX_BATCH_SIZE = 32
+IDEMPOTENT_METHODS = {"LOGIN", "FIND", "HINT", "SCORE", "LEADERBOARD", "CACHE_LEADERBOARD", "RANK", "LEADERBOARD_AROUND"}
+
 STATUS_BAD_REQUEST = "Bad Request"
 STATUS_EXCEPTION = "Exception"
 STATUS_INCORRECT = "Incorrect"
@@ -13,17 +27,18 @@ STATUS_VERSION_NOT_SUPPORTED = "Version Not Supported"
 STATUS_WITHOUT_CHANGE = "Without Change"
 STATUS_WRONG_NUM_OF_PARAMS = "Wrong Number of Parameters"
 
-def format_header(sender, version):
+def format_header(sender, version, token=""):
     """
     Formats a BBTP header.
-    <sender> | version
+    <sender> | version [| token]
 
     @param {str} sender  Username
     @param {str} version BBTP version (e.g. 0.1)
+    @param {str} token   Session token from LOGIN (optional)
     @return {str}
     """
 
-    return sender + DELIM_INLINE + version
+    return sender + DELIM_INLINE + version + ("" if token == "" else DELIM_INLINE + token)
 
 def format_command(method, *args):
     """
@@ -38,21 +53,22 @@ def format_command(method, *args):
     return method if args == None or len(args) == 0 else \
         method + DELIM_INLINE + DELIM_INLINE.join([x.replace(DELIM_ENDLINE, "\n") for x in args])
 
-def format_request(sender, version, method, *args):
+def format_request(sender, version, method, *args, token=""):
     """
     Formats a BBTP request.
     
-    <sender> | version \r\n
+    <sender> | version [| token] \r\n
     <method> | <arg0> | <arg1> | ... \r\n
     
     @param {str} sender  Username
     @param {str} version BBTP version (e.g. 0.1)
     @param {str} method  BBTP method (e.g. FIND)
     @param {list} *args  Method arguments
+    @param {str} token   Session token from LOGIN (optional)
     @return {str}
     """
 
-    return format_header(sender, version) + DELIM_ENDLINE \
+    return format_header(sender, version, token) + DELIM_ENDLINE \
         + format_command(method, *args) + DELIM_ENDLINE
 
 def format_response(status_code, msg=""):
@@ -62,17 +78,53 @@ def format_response(status_code, msg=""):
     return status_code + DELIM_ENDLINE \
         + ("" if msg == "" else msg.replace(DELIM_ENDLINE, "\n") + DELIM_ENDLINE)
 
+def format_batch(sender, version, requests, token=""):
+    """
+    Formats a BBTP BATCH request carrying several requests from the same
+    sender. The body is a JSON list of each request's command line.
+
+    <sender> | version [| token] \r\n
+    BATCH \r\n
+    ["<method> | <arg0> | ...", ...] \r\n
+
+    @param {str}         sender   Username
+    @param {str}         version  BBTP version (e.g. 0.2)
+    @param {list of str} requests BBTP requests to batch
+    @param {str}         token    Session token from LOGIN (optional)
+    @return {str}
+    """
+
+    commands = [x.split(DELIM_ENDLINE)[1] for x in requests]
+
+    return format_request(sender, version, "BATCH", token=token) + json.dumps(commands) + DELIM_ENDLINE
+
+def format_batch_response(responses):
+    """
+    Formats the body of a BATCH response: a JSON list of each response's
+    status code and body, in request order.
+
+    @param  {list of str} responses BBTP responses
+    @return {str}
+    """
+
+    return json.dumps([list(parse_response(x)) for x in responses])
+
 def parse_header(line):
     """
     Parses a BBTP header, splitting into tokens.
 
     @param {str} line BBTP header
-    @return {tuple (str, str)} (sender, version)
+    @return {tuple (str, str, str)} (sender, version, session token or empty)
     """
 
     tokens = line.split(DELIM_INLINE)
     
-    return (tokens[0], tokens[1]) if len(tokens) == 2 else ("", "")
+    if len(tokens) == 2:
+        return (tokens[0], tokens[1], "")
+    elif len(tokens) == 3:
+        return (tokens[0], tokens[1], tokens[2])
+    else:
+        return ("", "", "")
 
 def parse_command(line):
     """
@@ -91,16 +143,16 @@ def parse_request(msg):
     Parses a BBTP request, splitting into tokens.
 
     @param {str} msg BBTP request
-    @return {tuple (str, str, str, list of str, str)} (sender, version, method, args, body)
+    @return {tuple (str, str, str, list of str, str, str)} (sender, version, method, args, body, session token)
     """
 
     lines = msg.split(DELIM_ENDLINE)
     
-    sender, version = parse_header(lines[0])
+    sender, version, token = parse_header(lines[0])
     method, args = parse_command(lines[1] if len(lines) > 0 else "")
     body = lines[2] if len(lines) > 1 else ""
     
-    return (sender, version, method, args, body)
+    return (sender, version, method, args, body, token)
 
 def parse_response(msg):
     """
@@ -114,34 +166,206 @@ def parse_response(msg):
     
     return (lines[0], lines[1] if len(lines) > 1 else "")
 
-def is_valid_method(s):
+def parse_batch(body):
     """
-    Checks if a method name is valid.
+    Parses the body of a BATCH request.
 
-    @param {str} s Method name to check
-    @return {bool} True if s is supported.
+    @param  {str}         body BATCH request body
+    @return {list of str}      BBTP command lines
     """
 
-    methods = {"REGISTER", "LOGIN", "FIND", "HINT", "SOLVE", "SCORE", "LEADERBOARD", "CACHE_LEADERBOARD"}
+    commands = json.loads(body)
+
+    if not isinstance(commands, list) or not all(isinstance(x, str) for x in commands):
+        raise ValueError("BATCH body must be a list of commands")
     
-    return s in methods
+    return commands
+
+def parse_batch_response(body):
+    """
+    Parses the body of a BATCH response.
+
+    @param  {str}                     body BATCH response body
+    @return {list of tuple (str, str)}     (status code, body) for each batched request
+    """
+
+    return [(x[0], x[1]) for x in json.loads(body)]
+
+def is_idempotent(method):
+    """
+    Checks if repeating a request has no further effect, so a client can
+    safely send it again when it can't tell whether the server got it.
+    BATCH requests depend on the commands they carry, so aren't covered.
+
+    @param  {str}  method BBTP method
+    @return {bool} True if the method is in IDEMPOTENT_METHODS
+    """
+
+    return method in IDEMPOTENT_METHODS
+
+def is_framed(version):
+    """
+    Checks if a BBTP version sends length-prefixed messages. Version 0.1 sends
+    each message as a single unframed packet of up to 2048 bytes; later
+    versions prefix each message with a marker byte and its length, so bodies
+    can be any size.
+
+    @param  {str}  version BBTP version
+    @return {bool} True if messages of this version are framed
+    """
+
+    return version in VERSIONS and version != VERSIONS[0]
+
+def frame(msg):
+    """
+    Encodes a message as a BBTP frame.
+    <marker> <length> <message>
+
+    @param  {str or bytes} msg Text message, or binary message (see bbtp_binary)
+    @return {bytes}            Marker byte, 4-byte big-endian length, message
+    """
+
+    if isinstance(msg, bytes):
+        data, marker = msg, FRAME_BINARY
+    else:
+        data, marker = msg.encode(), FRAME_TEXT
+
+    if len(data) > MAX_FRAME_SIZE:
+        raise ValueError(f"Message of {len(data)} bytes exceeds max frame size")
+    
+    return marker + FRAME_SIZE.pack(len(data)) + data
+
+def is_frame(marker):
+    """
+    Checks if a message starts with a frame marker.
+
+    @param  {bytes} marker First byte of a message
+    @return {bool}         True if marker is FRAME_TEXT or FRAME_BINARY
+    """
+
+    return marker == FRAME_TEXT or marker == FRAME_BINARY
+
+def frame_size(header):
+    """
+    Reads the message length from a BBTP frame header.
+
+    @param  {bytes} header At least FRAME_HEADER_SIZE bytes, starting with the marker byte
+    @return {int}          Length of the message following the header
+    """
+
+    size = FRAME_SIZE.unpack_from(header, 1)[0]
+
+    if size > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame of {size} bytes exceeds max frame size")
+    
+    return size
+
+class MessageReader:
+    """
+    Reads BBTP messages from a socket, framed or unframed. Bytes received past
+    the end of a framed message are kept for the next read.
+    """
+
+    def __init__(self, socket):
+        """
+        Constructor.
+
+        @param {Socket} socket Open socket
+        """
+
+        self._socket = socket
+        self._buffer = bytearray()
+    
+    def read(self):
+        """
+        Reads the next message. A message starting with a frame marker is
+        read until its full length has arrived. Anything else is treated as a
+        version 0.1 message and returned as received.
+
+        @return {tuple (str, bool)} (message, framed), message is empty if the connection closed,
+                                    or bytes if it was a binary frame
+        """
+
+        if not self._fill(1):
+            return ("", False)
+        
+        marker = self._buffer[:1]
+
+        if not is_frame(marker):
+            msg = self._buffer.decode()
+            self._buffer.clear()
+            return (msg, False)
+        
+        if not self._fill(FRAME_HEADER_SIZE):
+            raise ConnectionError("Connection closed in frame header")
+        
+        end = FRAME_HEADER_SIZE + frame_size(self._buffer)
+
+        if not self._fill(end):
+            raise ConnectionError("Connection closed in frame body")
+        
+        msg = bytes(self._buffer[FRAME_HEADER_SIZE:end])
+        del self._buffer[:end]
+
+        if marker == FRAME_TEXT:
+            msg = msg.decode()
+
+        return (msg, True)
+    
+    def pending(self):
+        """
+        Checks if bytes of a further message have already been received, so
+        the next read won't wait on the socket for it to start.
+
+        @return {bool}
+        """
+
+        return len(self._buffer) > 0
+    
+    def _fill(self, n):
+        """
+        Receives from the socket until at least n bytes are buffered.
+
+        @param  {int}  n Number of bytes needed
+        @return {bool}   False if the connection closed first
+        """
+
+        while len(self._buffer) < n:
+            chunk = self._socket.recv(max(BUFFER_SIZE, n - len(self._buffer)))
+            if not chunk:
+                return False
+            self._buffer += chunk
+        
+        return True
 
 def receive_msg(socket):
     """
     Receives a message through TCP.
 
     @param {Socket} socket Open socket
-    @return {str}          Message of up to 2048 bytes
+    @return {str}          Framed message of any size, or unframed message of up to 2048 bytes
     """
     
-    return socket.recv(2048).decode()
+    return MessageReader(socket).read()[0]
     
-def send_msg(socket, msg):
+def send_msg(socket, msg, framed=False):
     """
     Sends a message through TCP.
 
-    @param {Socket} socket Open socket
-    @param {str}    msg    Message of up to 2048 bytes
+    @param {Socket}       socket Open socket
+    @param {str or bytes} msg    Text message, or binary message (always framed)
+    @param {bool}         framed True to send as a BBTP frame (see is_framed)
+    """
+
+    socket.sendall(frame(msg) if framed or isinstance(msg, bytes) else msg.encode())
+
+def send_msgs(socket, msgs):
+    """
+    Sends several framed messages through TCP at once, without waiting for
+    responses in between (pipelining).
+
+    @param {Socket}               socket Open socket
+    @param {list of str or bytes} msgs   Text or binary messages
     """
 
-    socket.send(msg.encode())
\ No newline at end of file
+    socket.sendall(b"".join(frame(x) for x in msgs))
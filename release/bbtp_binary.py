@@ -0,0 +1,350 @@
+import bbtp
+from bitboxing_data import PlayerScore
+import struct
+
+VERSION = "0.3"
+
+METHODS = ["", "REGISTER", "LOGIN", "FIND", "HINT", "SOLVE", "SCORE", "LEADERBOARD", "CACHE_LEADERBOARD", "BATCH", "RANK", "LEADERBOARD_AROUND"]
+STATUSES = [
+    "",
+    bbtp.STATUS_BAD_REQUEST,
+    bbtp.STATUS_EXCEPTION,
+    bbtp.STATUS_INCORRECT,
+    bbtp.STATUS_NOT_FOUND,
+    bbtp.STATUS_OK,
+    bbtp.STATUS_OUT_OF_ORDER,
+    bbtp.STATUS_UNAUTHENTICATED,
+    bbtp.STATUS_UNRECOGNIZED_METHOD,
+    bbtp.STATUS_VERSION_NOT_SUPPORTED,
+    bbtp.STATUS_WITHOUT_CHANGE,
+    bbtp.STATUS_WRONG_NUM_OF_PARAMS,
+]
+
+PAYLOAD_EMPTY = 0
+PAYLOAD_TEXT = 1
+PAYLOAD_SCORE = 2
+PAYLOAD_SCORES = 3
+PAYLOAD_NAMES = 4
+PAYLOAD_BATCH = 5
+PAYLOAD_RANK = 6
+PAYLOAD_RANKS = 7
+
+HEADER = struct.Struct("!BB")
+
+_METHOD_CODES = {x: i for i, x in enumerate(METHODS)}
+_STATUS_CODES = {x: i for i, x in enumerate(STATUSES)}
+
+def is_binary(version):
+    """
+    Checks if a BBTP version uses the binary encoding.
+
+    @param  {str}  version BBTP version
+    @return {bool} True if messages of this version are binary
+    """
+
+    return version == VERSION
+
+def encode_request(sender, version, method, *args, body="", token=""):
+    """
+    Encodes a BBTP request.
+    <method code> <arg count> <sender> <version> [<method>] <arg0> <arg1> ... <body> [<token>]
+
+    Codes and counts are single bytes. Strings are UTF-8 prefixed with their
+    length as a varint. The method name is only written out if it has no code,
+    and the session token only if there is one.
+
+    @param  {str}   sender  Username
+    @param  {str}   version BBTP version
+    @param  {str}   method  BBTP method (e.g. FIND)
+    @param  {list}  *args   Method arguments
+    @param  {str}   body    Request body (e.g. for BATCH)
+    @param  {str}   token   Session token from LOGIN (optional)
+    @return {bytes}
+    """
+
+    code = _METHOD_CODES.get(method, 0)
+    buffer = bytearray(HEADER.pack(code, len(args)))
+
+    _write_str(buffer, sender)
+    _write_str(buffer, version)
+    if code == 0:
+        _write_str(buffer, method)
+    for x in args:
+        _write_str(buffer, x)
+    _write_str(buffer, body)
+    if token != "":
+        _write_str(buffer, token)
+
+    return bytes(buffer)
+
+def decode_request(data):
+    """
+    Decodes a BBTP request.
+
+    @param  {bytes} data Encoded request
+    @return {tuple (str, str, str, list of str, str, str)} (sender, version, method, args, body, session token)
+    """
+
+    code = data[0]
+    argc = data[1]
+    fields = []
+    i = HEADER.size
+    end = len(data)
+
+    # Every field after the header is a string, so read them all in one loop
+    while i < end:
+        n = data[i]
+        if n < 0x80:
+            i += 1
+        else:
+            n, i = _read_varint(data, i)
+        fields.append(data[i:i + n].decode())
+        i += n
+
+    if code == 0:
+        method = fields.pop(2)
+    else:
+        method = METHODS[code]
+    
+    if len(fields) == argc + 4:
+        token = fields.pop()
+    elif len(fields) == argc + 3:
+        token = ""
+    else:
+        raise ValueError(f"Expected {argc} arguments")
+
+    return (fields[0], fields[1], method, fields[2:-1], fields[-1], token)
+
+def encode_payload(status, method, data):
+    """
+    Encodes a binary response directly from response data, in the compact
+    form chosen by the method (e.g. varints for a PlayerScore's counts).
+
+    @param  {str}   status BBTP status code
+    @param  {str}   method BBTP method of the request
+    @param  {any}   data   Response data, as it would be before JSON formatting,
+                           or for BATCH a list of encoded responses
+    @return {bytes}
+    """
+
+    buffer = bytearray()
+    _write_payload(buffer, status, _payload_type(method, status), data)
+
+    return bytes(buffer)
+
+def decode_response(data):
+    """
+    Decodes a binary BBTP response.
+
+    @param  {bytes}              data Encoded response
+    @return {tuple (str, any)}        (status code, body), where body is
+                                      str for text,
+                                      PlayerScore for SCORE,
+                                      list of PlayerScore for LEADERBOARD,
+                                      list of str for CACHE_LEADERBOARD,
+                                      tuple (int, PlayerScore) for RANK,
+                                      list of tuple (int, PlayerScore) for LEADERBOARD_AROUND,
+                                      list of (status code, body) for BATCH
+    """
+
+    return _read_response(data, 0)[0]
+
+def _payload_type(method, status):
+    """
+    Chooses how to encode a response body.
+
+    @param  {str} method BBTP method of the request
+    @param  {str} status BBTP status code
+    @return {int}        PAYLOAD_* constant
+    """
+
+    if status != bbtp.STATUS_OK:
+        return PAYLOAD_TEXT
+    elif method == "SCORE":
+        return PAYLOAD_SCORE
+    elif method == "LEADERBOARD":
+        return PAYLOAD_SCORES
+    elif method == "CACHE_LEADERBOARD":
+        return PAYLOAD_NAMES
+    elif method == "BATCH":
+        return PAYLOAD_BATCH
+    elif method == "RANK":
+        return PAYLOAD_RANK
+    elif method == "LEADERBOARD_AROUND":
+        return PAYLOAD_RANKS
+    else:
+        return PAYLOAD_TEXT
+
+def _write_payload(buffer, status, payload_type, data):
+    """
+    Appends an encoded status and body to a buffer.
+    <status code> <payload type> [<status>] <payload>
+    """
+
+    code = _STATUS_CODES.get(status, 0)
+
+    if data is None or data == "":
+        payload_type = PAYLOAD_EMPTY
+
+    buffer += HEADER.pack(code, payload_type)
+    if code == 0:
+        _write_str(buffer, status)
+
+    if payload_type == PAYLOAD_TEXT:
+        _write_str(buffer, data)
+    elif payload_type == PAYLOAD_SCORE:
+        _write_score(buffer, data)
+    elif payload_type == PAYLOAD_SCORES:
+        _write_varint(buffer, len(data))
+        for x in data:
+            _write_score(buffer, x)
+    elif payload_type == PAYLOAD_NAMES:
+        _write_varint(buffer, len(data))
+        for x in data:
+            _write_str(buffer, x)
+    elif payload_type == PAYLOAD_BATCH:
+        _write_varint(buffer, len(data))
+        for x in data:
+            buffer += x
+    elif payload_type == PAYLOAD_RANK:
+        _write_varint(buffer, data['rank'])
+        _write_score(buffer, data)
+    elif payload_type == PAYLOAD_RANKS:
+        _write_varint(buffer, len(data))
+        for x in data:
+            _write_varint(buffer, x['rank'])
+            _write_score(buffer, x)
+
+def _read_response(data, i):
+    """
+    Reads an encoded response starting at index i.
+
+    @return {tuple ((str, any), int)} ((status code, body), index after response)
+    """
+
+    code, payload_type = HEADER.unpack_from(data, i)
+    i += HEADER.size
+
+    if code == 0:
+        status, i = _read_str(data, i)
+    else:
+        status = STATUSES[code]
+
+    if payload_type == PAYLOAD_EMPTY:
+        body = ""
+    elif payload_type == PAYLOAD_TEXT:
+        body, i = _read_str(data, i)
+    elif payload_type == PAYLOAD_SCORE:
+        body, i = _read_score(data, i)
+    elif payload_type == PAYLOAD_SCORES:
+        n, i = _read_varint(data, i)
+        body = []
+        for k in range(n):
+            x, i = _read_score(data, i)
+            body.append(x)
+    elif payload_type == PAYLOAD_NAMES:
+        n, i = _read_varint(data, i)
+        body = []
+        for k in range(n):
+            x, i = _read_str(data, i)
+            body.append(x)
+    elif payload_type == PAYLOAD_BATCH:
+        n, i = _read_varint(data, i)
+        body = []
+        for k in range(n):
+            x, i = _read_response(data, i)
+            body.append(x)
+    elif payload_type == PAYLOAD_RANK:
+        rank, i = _read_varint(data, i)
+        score, i = _read_score(data, i)
+        body = (rank, score)
+    elif payload_type == PAYLOAD_RANKS:
+        n, i = _read_varint(data, i)
+        body = []
+        for k in range(n):
+            rank, i = _read_varint(data, i)
+            score, i = _read_score(data, i)
+            body.append((rank, score))
+    else:
+        raise ValueError(f"Unknown payload type {payload_type}")
+
+    return ((status, body), i)
+
+def _write_score(buffer, d):
+    """
+    Appends an encoded PlayerScore dictionary to a buffer.
+    <player> <finds> <solves>
+    """
+
+    _write_str(buffer, d['player'])
+    _write_varint(buffer, d['finds'])
+    _write_varint(buffer, d['solves'])
+
+def _read_score(data, i):
+    """
+    Reads an encoded PlayerScore starting at index i.
+
+    @return {tuple (PlayerScore, int)} (score, index after score)
+    """
+
+    n, i = _read_varint(data, i)
+    player = data[i:i + n].decode()
+    i += n
+    finds, i = _read_varint(data, i)
+    solves, i = _read_varint(data, i)
+
+    return (PlayerScore(player, finds, solves), i)
+
+def _write_str(buffer, s):
+    """
+    Appends a varint length and UTF-8 string to a buffer.
+    """
+
+    data = s.encode()
+    _write_varint(buffer, len(data))
+    buffer += data
+
+def _read_str(data, i):
+    """
+    Reads a varint-length-prefixed UTF-8 string starting at index i.
+
+    @return {tuple (str, int)} (string, index after string)
+    """
+
+    n, i = _read_varint(data, i)
+
+    return (data[i:i + n].decode(), i + n)
+
+def _write_varint(buffer, n):
+    """
+    Appends an unsigned integer as a varint: 7 bits per byte, least significant
+    first, high bit set on every byte but the last.
+    """
+
+    while n > 0x7F:
+        buffer.append((n & 0x7F) | 0x80)
+        n >>= 7
+    buffer.append(n)
+
+def _read_varint(data, i):
+    """
+    Reads a varint starting at index i.
+
+    @return {tuple (int, int)} (value, index after varint)
+    """
+
+    b = data[i]
+    if b < 0x80:
+        return (b, i + 1)
+
+    n = b & 0x7F
+    shift = 7
+    i += 1
+
+    while True:
+        b = data[i]
+        i += 1
+        n |= (b & 0x7F) << shift
+        if b < 0x80:
+            return (n, i)
+        shift += 7
@@ -0,0 +1,116 @@
+from bitboxing_receiver import BitboxingReceiver
+from bitboxing_server import handle_binary_request, handle_request, IDLE_TIMEOUT, PORT
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import bbtp
+import bbtp_binary
+
+WORKERS = 8
+
+async def read_msg(reader):
+    """
+    Reads a BBTP message from a client stream, framed or unframed.
+    See bbtp.MessageReader.
+
+    @param  {StreamReader}      reader Client stream reader
+    @return {tuple (str, bool)}        (message, framed), message is empty if the stream closed,
+                                       or bytes if it was a binary frame
+    """
+
+    first = await reader.read(1)
+
+    if first == b"":
+        return ("", False)
+    elif not bbtp.is_frame(first):
+        rest = await reader.read(bbtp.BUFFER_SIZE - 1)
+        return ((first + rest).decode(), False)
+    
+    header = first + await reader.readexactly(bbtp.FRAME_SIZE.size)
+    data = await reader.readexactly(bbtp.frame_size(header))
+
+    return (data.decode() if first == bbtp.FRAME_TEXT else data, True)
+
+async def respond(reader, writer, receiver, executor):
+    """
+    Responds to requests from a client stream, then closes the stream. Framed
+    streams are kept alive until the client closes them or they sit idle for
+    IDLE_TIMEOUT seconds; an idle stream costs no thread while it waits.
+    Requests are handled on the executor, since BitboxingReceiver makes
+    blocking SQLite calls.
+
+    @param {StreamReader}       reader   Client stream reader
+    @param {StreamWriter}       writer   Client stream writer
+    @param {BitboxingReceiver}  receiver Database
+    @param {ThreadPoolExecutor} executor Threads for blocking database calls
+    """
+
+    loop = asyncio.get_running_loop()
+
+    try:
+        while True:
+            request, framed = await asyncio.wait_for(read_msg(reader), IDLE_TIMEOUT)
+            if len(request) == 0:
+                break
+            
+            handle = handle_binary_request if isinstance(request, bytes) else handle_request
+            response = await loop.run_in_executor(executor, handle, request, receiver)
+
+            writer.write(bbtp.frame(response) if framed else response.encode())
+            await writer.drain()
+
+            if not framed:
+                break
+    except asyncio.TimeoutError:
+        pass
+    except Exception as ex:
+        print(f"Error: '{repr(ex)}'!")
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except OSError:
+            pass
+
+async def listen(receiver, workers, port):
+    """
+    Accepts client connections on the running event loop until cancelled.
+
+    @param {BitboxingReceiver} receiver
+    @param {int}               workers  Number of threads for blocking database calls
+    @param {int}               port     Port to listen on
+    """
+
+    with ThreadPoolExecutor(workers) as executor:
+        server = await asyncio.start_server(
+            lambda reader, writer: respond(reader, writer, receiver, executor),
+            port=port,
+            backlog=100
+        )
+
+        print(f"Server is listening to port {port} with {workers} workers...")
+
+        async with server:
+            await server.serve_forever()
+
+def serve(receiver, workers=WORKERS, port=PORT):
+    """
+    Launches the server on an asyncio event loop. Idle connections only cost
+    the loop a stream each, instead of a thread each.
+
+    @param {BitboxingReceiver} receiver
+    @param {int}               workers  Number of threads for blocking database calls
+    @param {int}               port     Port to listen on
+    """
+
+    try:
+        asyncio.run(listen(receiver, workers, port))
+    except Exception as ex:
+        print(f"Error: '{repr(ex)}'!")
+        print("Server going offline...")
+
+if __name__ == "__main__":
+    version = bbtp_binary.VERSION
+    path = "bitboxing.db"
+    receiver = BitboxingReceiver(version, path)
+
+    serve(receiver)
@@ -0,0 +1,669 @@
+from bitboxing_connection import BitboxingConnection
+from bitboxing_data import FindStatus, PlayerScore
+from bitboxing_ranking import ScoreRanking
+from bitboxing_receiver import BitboxingReceiver
+from bitboxing_sender import BitboxingSender
+from bitboxing_sql import BitboxingSql, SYNCHRONOUS
+from bitboxing_writer import BitboxingWriter
+import bitboxing_async_server
+import bitboxing_server
+import bbtp
+import bbtp_binary
+import contextlib
+import heapq
+from functools import cmp_to_key
+import gc
+import json
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+VERSION = "0.2"
+PORT = 9950
+CLIENTS = 50
+REQUESTS = 20
+
+class UnpooledSql(BitboxingSql):
+    """
+    BitboxingSql that opens a new connection for every query, for comparison.
+    """
+
+    def connection(self):
+        """
+        Opens a new SQLite connection.
+
+        @return {Connection}
+        """
+
+        return self.connect()
+
+class ChainedFindStatus(FindStatus):
+    """
+    FindStatus compared through its accessors instead of its sort key, as it
+    was before sort_key, for comparison.
+    """
+
+    def __lt__(self, other):
+        """
+        < operator
+
+        @param  {FindStatus} other
+        @return {bool}       True if this object's stats beat other object's
+        """
+
+        if self.found() != other.found():
+            return self.found()
+        elif self.solved() != other.solved():
+            return self.solved()
+        elif self.solved() and self.how_long() != other.how_long():
+            return self.how_long() < other.how_long()
+        elif self.attempts() != other.attempts():
+            return self.attempts() < other.attempts()
+        else:
+            return self.found() and self.time_found() < other.time_found()
+
+@contextlib.contextmanager
+def quiet():
+    """
+    Silences server logging while a benchmark runs.
+
+    @return {context manager}
+    """
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+def make_receiver(players):
+    """
+    Creates a receiver backed by a fresh database in a temporary directory,
+    with registered players who have each found the first cache.
+
+    @param  {int} players Number of players to register
+    @return {BitboxingReceiver}
+    """
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    receiver = BitboxingReceiver(VERSION, path)
+
+    for i in range(players):
+        receiver.handle_register(f"player{i}", "password")
+        receiver.handle_find(f"player{i}", "TDQXO")
+    
+    return receiver
+
+def populate(players, caches=None):
+    """
+    Creates a fresh database in a temporary directory and bulk-inserts
+    registered players with random finds and solves.
+
+    @param  {int}         players Number of players
+    @param  {list of str} caches  Puzzle IDs to find (default all)
+    @return {str}                 Database file path
+    """
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    sql = BitboxingSql(path)
+
+    with quiet():
+        sql.setup()
+    
+    caches = caches if caches else [x[0] for x in BitboxingSql._get_puzzle_data()]
+    rng = random.Random(0)
+    users = []
+    finds = []
+
+    for i in range(players):
+        player = f"player{i}"
+        users.append((player, "password"))
+        for cache in rng.sample(caches, rng.randint(0, len(caches))):
+            found = rng.randrange(10 ** 12)
+            solved = found + rng.randrange(10 ** 10) if rng.random() < 0.5 else None
+            finds.append((player, cache, found, solved, rng.randint(0, 5)))
+    
+    connection = sql.connection()
+    with connection:
+        connection.executemany("INSERT INTO Users(username, password) VALUES(?, ?)", users)
+        connection.executemany("INSERT INTO Finds(player, cache, time_found, time_solved, attempts) VALUES(?, ?, ?, ?, ?)", finds)
+    sql.close()
+
+    return path
+
+def make_request(port, msg):
+    """
+    Sends a request to a local server and fetches a response.
+
+    @param  {int} port Server port
+    @param  {str} msg  BBTP request
+    @return {tuple (str, str)} (status code, body)
+    """
+
+    s = socket.create_connection(("127.0.0.1", port))
+
+    bbtp.send_msg(s, msg, bbtp.is_framed(VERSION))
+    msg = bbtp.receive_msg(s)
+
+    s.close()
+
+    return bbtp.parse_response(msg)
+
+def run_clients(port, clients, requests):
+    """
+    Runs concurrent clients against a server, each making a series of
+    FIND, SCORE, and LEADERBOARD requests.
+
+    @param  {int} port     Server port
+    @param  {int} clients  Number of concurrent clients
+    @param  {int} requests Number of requests per client
+    @return {float}        Requests per second
+    """
+
+    def client(i):
+        sender = BitboxingSender(f"player{i}", VERSION)
+        msgs = [sender.handle_find("MVMKB"), sender.handle_score(sender.id()), sender.handle_leaderboard(10)]
+        for j in range(requests):
+            make_request(port, msgs[j % len(msgs)])
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    return clients * requests / elapsed
+
+def bench_servers():
+    """
+    Compares the single-threaded loop, the worker pool, and the asyncio server.
+    """
+
+    servers = [
+        ("loop", lambda receiver, port: bitboxing_server.serve(receiver, port=port)),
+        ("pool", lambda receiver, port: bitboxing_server.serve_pool(receiver, port=port)),
+        ("asyncio", lambda receiver, port: bitboxing_async_server.serve(receiver, port=port)),
+    ]
+
+    print(f"Servers: {CLIENTS} clients x {REQUESTS} requests")
+    for i, (name, serve) in enumerate(servers):
+        port = PORT + i
+
+        with quiet():
+            receiver = make_receiver(CLIENTS)
+            threading.Thread(target=serve, args=(receiver, port), daemon=True).start()
+            time.sleep(0.5)
+            rate = run_clients(port, CLIENTS, REQUESTS)
+
+        print(f"{name.ljust(10)}{rate:10.0f} requests/s")
+
+def bench_keep_alive():
+    """
+    Compares a new connection per request against one kept-alive connection,
+    then times the kept-alive connection again while more idle kept-alive
+    connections are open than the pool has workers.
+    """
+
+    sender = BitboxingSender("player0", VERSION)
+    msg = sender.handle_score(sender.id())
+    n = CLIENTS * REQUESTS
+    port = PORT + 10
+
+    with quiet():
+        receiver = make_receiver(1)
+        threading.Thread(target=bitboxing_server.serve_pool, args=(receiver,), kwargs={"port": port}, daemon=True).start()
+        time.sleep(0.5)
+
+        start = time.perf_counter()
+        for i in range(n):
+            make_request(port, msg)
+        per_request = time.perf_counter() - start
+
+        connection = BitboxingConnection("127.0.0.1", port, VERSION)
+        start = time.perf_counter()
+        for i in range(n):
+            connection.request(msg)
+        kept_alive = time.perf_counter() - start
+
+        # Clients that stay connected without sending anything mustn't hold up workers
+        idle = [BitboxingConnection("127.0.0.1", port, VERSION) for i in range(bitboxing_server.WORKERS * 2)]
+        for x in idle:
+            x.request(msg)
+        start = time.perf_counter()
+        for i in range(n):
+            connection.request(msg)
+        beside_idle = time.perf_counter() - start
+
+        for x in idle + [connection]:
+            x.close()
+
+    print(f"Keep-alive: {n} sequential SCORE requests")
+    print(f"{'new'.ljust(10)}{per_request / n * 1e6:10.0f} us/request")
+    print(f"{'reused'.ljust(10)}{kept_alive / n * 1e6:10.0f} us/request")
+    print(f"{'idle x' + str(len(idle))}".ljust(10) + f"{beside_idle / n * 1e6:10.0f} us/request")
+
+def timed(f, n):
+    """
+    Times repeated calls to a function.
+
+    @param  {function} f Function with no parameters
+    @param  {int}      n Number of calls
+    @return {float}      Microseconds per call
+    """
+
+    start = time.perf_counter()
+    for i in range(n):
+        f()
+    
+    return (time.perf_counter() - start) / n * 1e6
+
+def bench_codec():
+    """
+    Compares the text and binary BBTP encodings of a SOLVE request and a
+    1001-player LEADERBOARD_AROUND response. Responses are timed end to end
+    through the server's request handlers (handle_request and
+    handle_binary_request) against the same receiver, and parsed as the
+    client would.
+    """
+
+    n = 200
+    text_request = bbtp.format_request("player0", VERSION, "SOLVE", "XRUZD", "042")
+    binary_request = bbtp_binary.encode_request("player0", bbtp_binary.VERSION, "SOLVE", "XRUZD", "042")
+
+    with quiet():
+        receiver = BitboxingReceiver(bbtp_binary.VERSION, populate(1000))
+
+    text_around = bbtp.format_request("player0", VERSION, "LEADERBOARD_AROUND", "player500", "500")
+    binary_around = bbtp_binary.encode_request("player0", bbtp_binary.VERSION, "LEADERBOARD_AROUND", "player500", "500")
+    handle_text = lambda: bbtp.frame(bitboxing_server.handle_request(text_around, receiver))
+    handle_binary = lambda: bbtp.frame(bitboxing_server.handle_binary_request(binary_around, receiver))
+
+    with quiet():
+        text_response = handle_text()
+        binary_response = handle_binary()
+        text_handled = timed(handle_text, n)
+        binary_handled = timed(handle_binary, n)
+
+    def decode_text():
+        body = bbtp.parse_response(text_response[bbtp.FRAME_HEADER_SIZE:].decode())[1]
+        return [(x['rank'], PlayerScore(x['player'], x['finds'], x['solves'])) for x in json.loads(body)]
+
+    decode_binary = lambda: bbtp_binary.decode_response(binary_response[bbtp.FRAME_HEADER_SIZE:])
+
+    print("Codec: SOLVE request")
+    print(f"{'text'.ljust(10)}{len(bbtp.frame(text_request)):10} bytes{timed(lambda: bbtp.parse_request(text_request), n * 100):10.2f} us to parse")
+    print(f"{'binary'.ljust(10)}{len(bbtp.frame(binary_request)):10} bytes{timed(lambda: bbtp_binary.decode_request(binary_request), n * 100):10.2f} us to parse")
+    print("Codec: 1001-player LEADERBOARD_AROUND response")
+    print(f"{'text'.ljust(10)}{len(text_response):10} bytes{text_handled:10.0f} us to handle{timed(decode_text, n):10.0f} us to parse")
+    print(f"{'binary'.ljust(10)}{len(binary_response):10} bytes{binary_handled:10.0f} us to handle{timed(decode_binary, n):10.0f} us to parse")
+
+def bench_sql_pool():
+    """
+    Compares the queries behind one HINT request with a new connection per
+    query against the calling thread's long-lived connection.
+    """
+
+    n = 2000
+
+    with quiet():
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        BitboxingReceiver(VERSION, path).handle_find("player0", "TDQXO")
+
+    def hint(sql):
+        sql.is_valid_user("player0")
+        sql.is_valid_cache("TDQXO")
+        sql.find_status("player0", "TDQXO")
+        sql.find_status("player0", "TDQXO")
+        sql.puzzle("TDQXO")
+
+    unpooled = UnpooledSql(path)
+    pooled = BitboxingSql(path)
+
+    print("SQL connections: queries for one HINT request")
+    print(f"{'new'.ljust(10)}{timed(lambda: hint(unpooled), n):10.0f} us/request")
+    print(f"{'reused'.ljust(10)}{timed(lambda: hint(pooled), n):10.0f} us/request")
+
+class DictPlayerScore:
+    """
+    PlayerScore fields kept in an instance dictionary, as they were before
+    __slots__, for comparison.
+    """
+
+    def __init__(self, player, finds = 0, solves = 0):
+        """
+        Constructor.
+
+        @param {str} player
+        @param {int} finds
+        @param {int} solves
+        """
+
+        self._player = player
+        self._finds = finds
+        self._solves = solves
+
+class DictFindStatus:
+    """
+    FindStatus fields kept in an instance dictionary, as they were before
+    __slots__, for comparison.
+    """
+
+    def __init__(self, time_found, time_solved = None, attempts = 0):
+        """
+        Constructor.
+
+        @param {int} time_found
+        @param {int} time_solved
+        @param {int} attempts
+        """
+
+        self._time_found = time_found
+        self._time_solved = time_solved
+        self._attempts = attempts
+
+def bench_leaderboard():
+    """
+    Compares fetching a top-10 LEADERBOARD for 20000 players with one score
+    query per player against the ranking query.
+    """
+
+    path = populate(20000)
+    sql = BitboxingSql(path)
+
+    def per_player():
+        leaderboard = [sql.score(p) for p in sql.players()]
+        leaderboard.sort(key=cmp_to_key(BitboxingSql.compare_scores))
+        return leaderboard[:10]
+
+    print("Leaderboard: top 10 of 20000 players")
+    print(f"{'per-player'.ljust(10)}{timed(per_player, 3) / 1000:10.1f} ms/request")
+    print(f"{'query'.ljust(10)}{timed(lambda: sql.leaderboard(10), 3) / 1000:10.1f} ms/request")
+
+def bench_ranking():
+    """
+    Compares a top-10 LEADERBOARD from the in-memory ranking against the
+    ranking query, and times ranking updates. See test_ranking for checks
+    that the ranking matches compare_scores.
+    """
+
+    n = 1000
+    path = populate(20000)
+    sql = BitboxingSql(path)
+    ranking = ScoreRanking()
+    ranking.load(sql.leaderboard())
+    rng = random.Random(0)
+
+    print("Ranking: top 10 of 20000 players")
+    print(f"{'query'.ljust(10)}{timed(lambda: sql.leaderboard(10), n):10.0f} us/request")
+    print(f"{'memory'.ljust(10)}{timed(lambda: ranking.top(10), n):10.0f} us/request")
+    print(f"{'around'.ljust(10)}{timed(lambda: ranking.around(f'player{rng.randrange(20000)}', 5), n):10.0f} us/request")
+    print(f"{'update'.ljust(10)}{timed(lambda: ranking.add(f'player{rng.randrange(20000)}', 1, 0), n):10.0f} us/update")
+
+def bench_cache_leaderboard():
+    """
+    Compares ways of ranking 100000 finds of one popular cache, then times
+    the full top-10 CACHE_LEADERBOARD query. See test_data for checks that
+    they agree.
+    """
+
+    n = 100000
+    rng = random.Random(0)
+    rows = []
+    for i in range(n):
+        found = rng.randrange(10 ** 12)
+        solved = found + rng.randrange(10 ** 10) if rng.random() < 0.5 else None
+        rows.append((f"player{i}", found, solved, rng.randint(0, 5)))
+    
+    chained = [{'player': x[0], 'status': ChainedFindStatus(*x[1:])} for x in rows]
+    keyed = [{'player': x[0], 'status': FindStatus(*x[1:])} for x in rows]
+    key = lambda x: x['status'].sort_key()
+
+    path = populate(2 * n, ["TDQXO"])
+    sql = BitboxingSql(path)
+
+    print(f"Cache leaderboard: top 10 of {n} finds")
+    print(f"{'chained'.ljust(10)}{timed(lambda: sorted(chained, key=lambda x: x['status'])[:10], 3) / 1000:10.1f} ms/request")
+    print(f"{'key'.ljust(10)}{timed(lambda: sorted(keyed, key=key)[:10], 3) / 1000:10.1f} ms/request")
+    print(f"{'nsmallest'.ljust(10)}{timed(lambda: heapq.nsmallest(10, keyed, key=key), 3) / 1000:10.1f} ms/request")
+    print(f"{'query'.ljust(10)}{timed(lambda: sql.cache_leaderboard('TDQXO', 10), 3) / 1000:10.1f} ms/request ({len(sql.cache_leaderboard('TDQXO'))} finds)")
+
+def bench_writes():
+    """
+    Compares FIND writes from many threads, each committing its own writes,
+    against the same writes committed in groups by a BitboxingWriter. Every
+    commit is synced to disk (SYNCHRONOUS), which is what grouping saves.
+    Threads committing their own writes either wait on SQLite's busy timeout
+    ("each") or take turns on a lock ("locked"). Also times a single thread,
+    where there is nothing to group and the writer only adds its handoff.
+    """
+
+    caches = [x[0] for x in BitboxingSql._get_puzzle_data()]
+
+    def run(find, threads):
+        path = populate(1600, caches=[])
+        players = [f"player{i}" for i in range(1600)]
+        writes = [(p, c) for p in players for c in caches]
+        find, close = find(path)
+
+        def writer(i):
+            for p, c in writes[i::threads]:
+                find(p, c)
+
+        workers = [threading.Thread(target=writer, args=(i,)) for i in range(threads)]
+        start = time.perf_counter()
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        elapsed = time.perf_counter() - start
+        close()
+
+        assert BitboxingSql(path).score("player0").finds() == len(caches)
+        return len(writes) / elapsed
+
+    def each(path, lock=contextlib.nullcontext()):
+        local = threading.local()
+        def find(player, cache):
+            if not hasattr(local, "sql"):
+                local.sql = BitboxingSql(path)
+            with lock:
+                local.sql.find(player, cache, time.time_ns())
+        return find, lambda: None
+
+    def locked(path):
+        return each(path, threading.Lock())
+
+    def grouped(path):
+        writer = BitboxingWriter(path)
+        return lambda player, cache: writer.find(player, cache, time.time_ns()), writer.close
+
+    print("Writes: FIND, synchronous=" + SYNCHRONOUS)
+    print(f"{''.ljust(10)}{'1 thread':>14}{'16 threads':>14}")
+    for name, find in [("each", each), ("locked", locked), ("grouped", grouped)]:
+        print(f"{name.ljust(10)}{run(find, 1):9.0f} w/s{run(find, 16):9.0f} w/s")
+
+def bench_wal():
+    """
+    Times SOLVE writes while another thread keeps scanning the Finds table,
+    with the rollback journal and in WAL mode. With the rollback journal a
+    commit has to wait for the scan in progress to finish.
+    """
+
+    n = 200
+
+    def run(mode):
+        path = populate(5000)
+        connection = BitboxingSql(path).connect()
+        connection.execute(f"PRAGMA journal_mode={mode}")
+        unsolved = connection.execute("SELECT player, cache FROM Finds WHERE time_solved IS NULL LIMIT ?", (n,)).fetchall()
+        connection.close()
+
+        writer = BitboxingWriter(path)
+        reader = BitboxingSql(path, read_only=True)
+        scanning = True
+
+        def scan():
+            while scanning:
+                for row in reader.connection().execute("SELECT * FROM Finds"):
+                    pass
+            reader.close()
+
+        thread = threading.Thread(target=scan)
+        thread.start()
+        
+        latencies = []
+        for player, cache in unsolved:
+            start = time.perf_counter()
+            writer.try_to_solve(player, cache, "guess", time.time_ns(), "guess")
+            latencies.append(time.perf_counter() - start)
+            time.sleep(0.001)
+        
+        scanning = False
+        thread.join()
+        writer.close()
+        latencies.sort()
+
+        return latencies[n // 2] * 10 ** 6, latencies[-1] * 10 ** 6
+
+    print("SOLVE latency during Finds scans")
+    print(f"{''.ljust(10)}{'median us':>12}{'max us':>12}")
+    for mode in ["DELETE", "WAL"]:
+        median, worst = run(mode)
+        print(f"{mode.ljust(10)}{median:12.0f}{worst:12.0f}")
+
+def bench_memory():
+    """
+    Measures memory allocated building a full leaderboard of 100000 players,
+    and 100000 find statuses, with dictionary-backed and slotted objects.
+    """
+
+    n = 100000
+    rng = random.Random(0)
+    scores = [(f"player{i}", rng.randint(0, 5), rng.randint(0, 5)) for i in range(n)]
+    finds = [(rng.randrange(10 ** 12), rng.randrange(10 ** 12, 2 * 10 ** 12), rng.randint(0, 5)) for i in range(n)]
+
+    def allocated(build):
+        gc.collect()
+        tracemalloc.start()
+        start = time.perf_counter()
+        objects = build()
+        elapsed = time.perf_counter() - start
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        del objects
+        return size / n, elapsed * 1000
+
+    print(f"Memory: {n} objects")
+    print(f"{''.ljust(20)}{'bytes each':>12}{'build ms':>10}")
+    for name, build in [
+        ("dict PlayerScore", lambda: [DictPlayerScore(*x) for x in scores]),
+        ("PlayerScore", lambda: [PlayerScore(*x) for x in scores]),
+        ("dict FindStatus", lambda: [DictFindStatus(*x) for x in finds]),
+        ("FindStatus", lambda: [FindStatus(*x) for x in finds]),
+    ]:
+        size, elapsed = allocated(build)
+        print(f"{name.ljust(20)}{size:12.0f}{elapsed:10.1f}")
+    
+    ranking = ScoreRanking()
+    ranking.load(PlayerScore(*x) for x in scores)
+    size, elapsed = allocated(lambda: ranking.top())
+    print(f"{'ranking.top()'.ljust(20)}{size:12.0f}{elapsed:10.1f}")
+
+def bench_stats():
+    """
+    Compares a full post-event leaderboard built from one score query per
+    player against one built from the NumPy columns. Needs NumPy. See
+    test_stats for checks that the columns match the database.
+    """
+
+    from bitboxing_stats import FindColumns
+
+    path = populate(20000)
+    sql = BitboxingSql(path)
+    columns = FindColumns.load(sql)
+
+    def per_player():
+        leaderboard = [sql.score(p) for p in sql.players()]
+        leaderboard.sort(key=cmp_to_key(BitboxingSql.compare_scores))
+        return leaderboard
+
+    def columnar():
+        columns = FindColumns.load(sql)
+        columns.report()
+        return columns.leaderboard()
+
+    print("Stats: full leaderboard of 20000 players")
+    print(f"{'per-player'.ljust(10)}{timed(per_player, 3) / 1000:10.1f} ms/report")
+    print(f"{'columns'.ljust(10)}{timed(columnar, 3) / 1000:10.1f} ms/report (with cache stats)")
+    print(f"{'sort only'.ljust(10)}{timed(lambda: columns.leaderboard(), 3) / 1000:10.1f} ms/report")
+
+def bench_responses():
+    """
+    Compares LEADERBOARD and CACHE_LEADERBOARD responses served from the
+    response cache against ones rebuilt for every request, then reports the
+    hit rate for a mix of mostly reads. See test_responses for checks that
+    writes invalidate them.
+    """
+
+    n = 1000
+    path = populate(20000)
+    with quiet():
+        receiver = BitboxingReceiver(VERSION, path)
+    responses = receiver.response_cache()
+    caches = [x[0] for x in BitboxingSql._get_puzzle_data()]
+
+    def rebuilt(scope, request):
+        def f():
+            responses.bump(scope)
+            request()
+        return f
+
+    leaderboard = lambda: receiver.handle_leaderboard("player0")
+    cache_leaderboard = lambda: receiver.handle_cache_leaderboard("player0", "TDQXO")
+
+    print("Responses: top 10 of 20000 players")
+    print(f"{'LEADERBOARD rebuilt'.ljust(30)}{timed(rebuilt(None, leaderboard), n):10.1f} us/request")
+    print(f"{'LEADERBOARD cached'.ljust(30)}{timed(leaderboard, n):10.1f} us/request")
+    print(f"{'CACHE_LEADERBOARD rebuilt'.ljust(30)}{timed(rebuilt('TDQXO', cache_leaderboard), n):10.1f} us/request")
+    print(f"{'CACHE_LEADERBOARD cached'.ljust(30)}{timed(cache_leaderboard, n):10.1f} us/request")
+
+    rng = random.Random(0)
+    start = responses.stats()
+    with quiet():
+        for i in range(n):
+            if rng.random() < 0.05:
+                receiver.handle_find(f"player{rng.randrange(20000)}", rng.choice(caches))
+            elif rng.random() < 0.5:
+                receiver.handle_leaderboard("player0")
+            else:
+                receiver.handle_cache_leaderboard("player0", rng.choice(caches))
+    stats = responses.stats()
+    hits = stats['hits'] - start['hits']
+    misses = stats['misses'] - start['misses']
+    print(f"Hit rate with 5% FINDs: {hits / (hits + misses):.0%} ({hits} hits, {misses} misses)")
+
+BENCHMARKS = {
+    "servers": bench_servers,
+    "keep_alive": bench_keep_alive,
+    "codec": bench_codec,
+    "sql_pool": bench_sql_pool,
+    "leaderboard": bench_leaderboard,
+    "ranking": bench_ranking,
+    "cache_leaderboard": bench_cache_leaderboard,
+    "writes": bench_writes,
+    "wal": bench_wal,
+    "memory": bench_memory,
+    "stats": bench_stats,
+    "responses": bench_responses,
+}
+
+if __name__ == "__main__":
+    names = sys.argv[1:] if len(sys.argv) > 1 else BENCHMARKS.keys()
+
+    for name in names:
+        BENCHMARKS[name]()
@@ -1,31 +1,46 @@
 import bbtp
+from bitboxing_connection import BitboxingConnection
 from bitboxing_sender import BitboxingSender
 from bitboxing_data import FindStatus, PlayerScore
-import socket
 import json
 
 IP = "127.0.0.1"
 PORT = 9999
-VERSION = "0.1"
+VERSION = "0.2"
 MENU_WIDTH = 80
 
+connection = BitboxingConnection(IP, PORT, VERSION)
+
 def make_request(msg):
     """
-    Sends a request to the server and fetches a response.
+    Sends a request to the server and fetches a response, reusing the open
+    server connection. If the server can't be reached, the response is an
+    exception status with the connection error as its body.
 
     @param {str} msg BBTP request
     @return {str}    BBTP response
     """
 
-    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    s.connect((IP, PORT))
-    
-    bbtp.send_msg(s, msg)
-    msg = bbtp.receive_msg(s)
-    
-    s.close()
+    try:
+        return connection.request(msg)
+    except OSError as ex:
+        connection.close()
+        return (bbtp.STATUS_EXCEPTION, f"Could not reach the server: {repr(ex)}")
 
-    return bbtp.parse_response(msg)
+def make_batch_request(sender, *msgs):
+    """
+    Sends several requests to the server in one BATCH request and fetches
+    their responses.
+
+    @param {BitboxingSender} sender BBTP sender
+    @param {list of str}     *msgs  BBTP requests from sender
+    @return {list of tuple (str, str)} (status code, body) for each request,
+                                       or just the BATCH response if it failed
+    """
+
+    response = make_request(sender.handle_batch(*msgs))
+
+    return bbtp.parse_batch_response(response[1]) if response[0] == bbtp.STATUS_OK else [response]
 
 def print_main_options():
     """
@@ -38,6 +53,7 @@ def print_main_options():
     print("P\tEnter a puzzle code")
     print("S\tSee your score")
     print("T\tSee the top-scoring players")
+    print("R\tSee the players ranked around you")
     print("L\tLog out")
     print("Q\tQuit")
 
@@ -105,13 +121,15 @@ def print_already_solved():
 
 def print_score(msg):
     """
-    Prints a BBTP SCORE response payload.
+    Prints a BBTP RANK response payload.
     
-    @param {str} msg JSON object containing score data
+    @param {str} msg JSON object containing score data and rank
     """
     
-    score = PlayerScore.from_dict(json.loads(msg))
+    data = json.loads(msg)
+    score = PlayerScore.from_dict(data)
 
+    print(f"Rank:   {data['rank']}")
     print(f"Finds:  {score.finds()}")
     print(f"solves: {score.solves()}")
 
@@ -129,6 +147,19 @@ def print_leaderboard(msg):
         x = leaderboard[i]
         print(str(i + 1).ljust(4) + "  " + x.player().ljust(40) + "  " + str(x.finds()).ljust(6) + "  " + str(x.solves()).ljust(6))
 
+def print_leaderboard_around(msg):
+    """
+    Prints a BBTP LEADERBOARD_AROUND response payload.
+    
+    @param {str} msg List of PlayerScore objects with ranks as JSON-formatted string
+    """
+
+    leaderboard = json.loads(msg)
+
+    print("".ljust(4) + "  " + "Player".ljust(40) + "  " + "Finds".ljust(6) + "  " + "Solves".ljust(6))
+    for x in leaderboard:
+        print(str(x['rank']).ljust(4) + "  " + x['player'].ljust(40) + "  " + str(x['finds']).ljust(6) + "  " + str(x['solves']).ljust(6))
+
 def print_cache_leaderboard(msg):
     """
     Prints a BBTP CACHE_LEADERBOARD response payload.
@@ -144,6 +175,9 @@ def print_cache_leaderboard(msg):
 def login():
     """"
     Validates a user's login info. Creates the user if it does not already exist.
+    Registering and logging in are sent together in one BATCH request; if the
+    user already exists, the REGISTER part is simply refused. The session
+    token from LOGIN is sent with every later request.
     @return {BitboxingSender} Authenticated BBTP sender, None if login failed
     """
     
@@ -155,19 +189,17 @@ def login():
     
     sender = BitboxingSender(username, VERSION)
 
-    response = make_request(sender.handle_login(password))
-    
-    if response[0] == bbtp.STATUS_UNAUTHENTICATED:
-        response = make_request(sender.handle_register(password))
-
-        if response[0] == bbtp.STATUS_OK:
-            response = make_request(sender.handle_login(password))
+    response = make_batch_request(sender, sender.handle_register(password), sender.handle_login(password))[-1]
     
     if response[0] == bbtp.STATUS_OK:
+        sender.set_token(response[1])
         return sender
     elif response[0] == bbtp.STATUS_INCORRECT:
         print("Incorrect password!")
         return None
+    elif response[0] == bbtp.STATUS_EXCEPTION:
+        print_error(response[1])
+        return None
     else:
         print_unknown_error()
         return None
@@ -258,12 +290,12 @@ def handle_solve(sender, code):
 
 def handle_score(sender):
     """
-    Fetches a player score.
+    Fetches a player's score and rank.
 
     @param {BitboxingSender} sender Authenticated BBTP sender
     """
 
-    response = make_request(sender.handle_score(sender.id()))
+    response = make_request(sender.handle_rank(sender.id()))
 
     if response[0] == bbtp.STATUS_OK:
         print_score(response[1])
@@ -288,6 +320,22 @@ def handle_leaderboard(sender):
     else:
         print_unknown_error()
         
+def handle_leaderboard_around(sender):
+    """
+    Fetches the part of the game leaderboard around the player.
+
+    @param {BitboxingSender} sender Authenticated BBTP sender
+    """
+    
+    response = make_request(sender.handle_leaderboard_around(sender.id()))
+
+    if response[0] == bbtp.STATUS_OK:
+        print_leaderboard_around(response[1])
+    elif response[0] == bbtp.STATUS_EXCEPTION:
+        print_error(response[1])
+    else:
+        print_unknown_error()
+        
 def handle_cache_leaderboard(sender, code):
     """
     Fetches a cache leaderboard.
@@ -313,6 +361,7 @@ def main_menu(sender):
     - Enter a puzzle code
     - Display player score
     - Display top scorers
+    - Display players ranked around the player
     - Log out
     - Quit
 
@@ -330,6 +379,8 @@ def main_menu(sender):
             handle_score(sender)
         elif command == "t":
             handle_leaderboard(sender)
+        elif command == "r":
+            handle_leaderboard_around(sender)
         else:
             print_invalid_command()
         command = get_command()
@@ -366,6 +417,8 @@ def puzzle_menu(sender):
             command = get_command()
     elif response[0] == bbtp.STATUS_NOT_FOUND:
         print_invalid_code(code)
+    elif response[0] == bbtp.STATUS_EXCEPTION:
+        print_error(response[1])
     else:
         print_unknown_error()
 
@@ -387,4 +440,6 @@ if __name__ == "__main__":
                 break
         
         if sender:
-            done = main_menu(sender)
\ No newline at end of file
+            done = main_menu(sender)
+    
+    connection.close()
\ No newline at end of file
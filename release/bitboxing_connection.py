@@ -0,0 +1,188 @@
+import bbtp
+import bbtp_binary
+import socket
+
+class BitboxingConnection:
+    """
+    Client connection to a Bitboxing server. With a framed BBTP version, one
+    TCP connection is kept alive and reused for every request. Version 0.1
+    opens a new connection for each request. With the binary version (see
+    bbtp_binary), requests are encoded on the way out and response bodies come
+    back already decoded.
+    """
+
+    def __init__(self, ip, port, version):
+        """
+        Constructor.
+
+        @param {str} ip      Server IP address
+        @param {int} port    Server port
+        @param {str} version BBTP version
+        """
+
+        self._ip = ip
+        self._port = port
+        self._version = version
+        self._socket = None
+        self._reader = None
+
+    def request(self, msg):
+        """
+        Sends a request to the server and fetches a response.
+
+        @param  {str}               msg BBTP request
+        @return {tuple (str, str)}      (status code, body)
+        """
+
+        return self.pipeline([msg])[0]
+
+    def pipeline(self, msgs):
+        """
+        Sends several requests to the server before reading any of the
+        responses. A kept-alive connection the server has already closed (e.g.
+        after its idle timeout) is replaced before anything is sent on it. If
+        the server closes it while the requests are in flight, before any
+        response arrived, and every request is idempotent (see
+        bbtp.is_idempotent), the requests are sent once more on a new
+        connection. Otherwise the server may have acted on a request before
+        closing, so the error is raised.
+
+        @param  {list of str}               msgs BBTP requests
+        @return {list of tuple (str, str)}       (status code, body) for each request, in order
+                                                 (see bbtp_binary.decode_response for binary bodies)
+        """
+
+        if not bbtp.is_framed(self._version):
+            return [self._request_once(x) for x in msgs]
+
+        if self._socket is not None and self._closed_by_server():
+            self.close()
+
+        reused = self._socket is not None
+        responses = []
+
+        try:
+            self._exchange(msgs, responses)
+        except OSError:
+            self.close()
+            if not reused or len(responses) > 0 or not all(BitboxingConnection._is_idempotent(x) for x in msgs):
+                raise
+            self._exchange(msgs, responses)
+
+        return responses
+
+    def close(self):
+        """
+        Closes the kept-alive connection, if one is open.
+        """
+
+        if self._socket is not None:
+            self._socket.close()
+
+        self._socket = None
+        self._reader = None
+
+    def _open(self):
+        """
+        Opens a new kept-alive connection.
+        """
+
+        s = socket.create_connection((self._ip, self._port))
+        s.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        self._socket = s
+        self._reader = bbtp.MessageReader(s)
+
+    def _closed_by_server(self):
+        """
+        Checks, without blocking, if the server has closed the kept-alive
+        connection.
+
+        @return {bool}
+        """
+
+        try:
+            self._socket.setblocking(False)
+            try:
+                return len(self._socket.recv(1, socket.MSG_PEEK)) == 0
+            finally:
+                self._socket.setblocking(True)
+        except BlockingIOError:
+            return False
+        except OSError:
+            return True
+
+    def _exchange(self, msgs, responses):
+        """
+        Sends requests over the kept-alive connection and reads the responses,
+        opening the connection first if needed.
+
+        @param {list of str}               msgs      BBTP requests
+        @param {list of tuple (str, str)}  responses Parsed responses are appended here as they arrive
+        """
+
+        binary = bbtp_binary.is_binary(self._version)
+
+        if binary:
+            msgs = [BitboxingConnection._encode(x) for x in msgs]
+
+        if self._socket is None:
+            self._open()
+
+        bbtp.send_msgs(self._socket, msgs)
+
+        for i in range(len(msgs)):
+            response, framed = self._reader.read()
+
+            if len(response) == 0:
+                raise ConnectionError("Connection closed by server")
+
+            responses.append(bbtp_binary.decode_response(response) if binary else bbtp.parse_response(response))
+
+    def _request_once(self, msg):
+        """
+        Sends a request over a new connection and closes it after the response.
+
+        @param  {str}               msg BBTP request
+        @return {tuple (str, str)}      (status code, body)
+        """
+
+        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        s.connect((self._ip, self._port))
+
+        bbtp.send_msg(s, msg)
+        msg = bbtp.receive_msg(s)
+
+        s.close()
+
+        return bbtp.parse_response(msg)
+
+    @staticmethod
+    def _is_idempotent(msg):
+        """
+        Checks if a request can safely be sent again. A BATCH request can if
+        every command in it can.
+
+        @param  {str}  msg BBTP request
+        @return {bool}
+        """
+
+        sender, version, method, args, body, token = bbtp.parse_request(msg)
+
+        if method == "BATCH":
+            return all(bbtp.is_idempotent(bbtp.parse_command(x)[0]) for x in bbtp.parse_batch(body))
+        else:
+            return bbtp.is_idempotent(method)
+
+    @staticmethod
+    def _encode(msg):
+        """
+        Encodes a text request as a binary request.
+
+        @param  {str}   msg BBTP request
+        @return {bytes}
+        """
+
+        sender, version, method, args, body, token = bbtp.parse_request(msg)
+
+        return bbtp_binary.encode_request(sender, version, method, *args, body=body, token=token)
@@ -0,0 +1,70 @@
+class RequestContext:
+    """
+    Database lookups for one request, each made at most once. Whether the
+    sender is registered and their find status for the request's cache are
+    loaded together by one query (see BitboxingSql.lookup) the first time
+    either is needed.
+    """
+
+    def __init__(self, sql, sender, cache=None):
+        """
+        Constructor.
+
+        @param {BitboxingSql} sql    SQL executor for the calling thread
+        @param {str}          sender Username
+        @param {str}          cache  Puzzle ID the request is about (optional)
+        """
+
+        self._sql = sql
+        self._sender = sender
+        self._cache = cache
+        self._is_user = None
+        self._statuses = {}
+
+    def sender(self):
+        """
+        Gets the username the context was created for.
+
+        @return {str}
+        """
+
+        return self._sender
+
+    def is_user(self):
+        """
+        Checks if the sender is registered.
+
+        @return {bool} True if the sender exists
+        """
+
+        if self._is_user is None:
+            if self._cache is None:
+                self._is_user = self._sql.is_valid_user(self._sender)
+            else:
+                self._load(self._cache)
+
+        return self._is_user
+
+    def find_status(self, cache):
+        """
+        Gets the sender's find status for a cache.
+
+        @param  {str}        cache Puzzle ID
+        @return {FindStatus}       Empty if the sender hasn't found it
+        """
+
+        if cache not in self._statuses:
+            self._load(cache)
+
+        return self._statuses[cache]
+
+    def _load(self, cache):
+        """
+        Loads whether the sender is registered and their find status for a
+        cache.
+        """
+
+        is_user, status = self._sql.lookup(self._sender, cache)
+
+        self._is_user = is_user
+        self._statuses[cache] = status
@@ -3,6 +3,8 @@ class Puzzle:
     Stores data relating to an individual puzzle.
     """
 
+    __slots__ = ("_question", "_answer", "_hint")
+
     def __init__(self, question, answer, hint):
         """
         Constructor.
@@ -87,6 +89,8 @@ class FindStatus:
     Stores data relating to when a cache was found and solved and how many attempts were used.
     """
 
+    __slots__ = ("_time_found", "_time_solved", "_attempts")
+
     def __init__(self, time_found, time_solved = None, attempts = 0):
         """
         Constructor.
@@ -154,6 +158,26 @@ class FindStatus:
 
         return self._attempts
     
+    def sort_key(self):
+        """
+        Gets a key that sorts the best stats first, based on the following:
+        1. Found before not found.
+        2. Solved before not solved.
+        3. If both solved, less time taken to solve first.
+        4. Fewer attempts first.
+        5. Found earlier first.
+
+        @return {tuple (bool, bool, int, int, int)} (not found, not solved, how long, attempts, time found)
+        """
+
+        return (
+            self._time_found is None,
+            self._time_solved is None,
+            self._time_solved - self._time_found if self._time_solved is not None else 0,
+            self._attempts,
+            self._time_found if self._time_found is not None else 0
+        )
+    
     def __eq__(self, other):
         """
         == operator
@@ -180,44 +204,14 @@ class FindStatus:
     def __lt__(self, other):
         """
         < operator
-        Checks if this object's stats are better than another object's based on the following:
-        1. If one has been found and another hasn't, the one that has been found wins.
-        2. If one has been solved and another hasn't, the one that has been solved wins.
-        4. If both have been found but not solved (tie for #1), prioritize attempts -> time found.
-        3. If both have been solved (tie for #2), prioritize how_long -> attempts -> time_found.
+        Checks if this object's stats are better than another object's, in the
+        order given by sort_key.
 
         @param  {FindStats} other
         @return {bool}      True if this object's stats beat other object's
         """
 
-        if self.found() and not other.found():
-            return True
-        elif self.found() and other.found():
-            if self.solved() and not other.solved():
-                return True
-            elif self.solved() and other.solved():
-                if self.how_long() < other.how_long():
-                    return True
-                elif self.how_long() == other.how_long():
-                    if self.attempts() < other.attempts():
-                        return True
-                    else:
-                        return self.attempts == other.attempts() \
-                            and self.time_found() < other.time_found()
-                else:
-                    return False
-            elif not self.solved() and not other.solved():
-                if self.attempts() < other.attempts():
-                    return True
-                else:
-                    return self.attempts() == other.attempts() \
-                        and self.time_found() < other.time_found()
-            else:
-                return False
-        elif not self.found() and not other.found():
-            return True
-        else:
-            return False
+        return self.sort_key() < other.sort_key()
     
     def __le__(self, other):
         """
@@ -305,6 +299,8 @@ class PlayerScore:
     Holds data relating to how many puzzle caches a player has found and solved.
     """
 
+    __slots__ = ("_player", "_finds", "_solves")
+
     def __init__(self, player, finds = 0, solves = 0):
         """
         Constructor.
@@ -1,18 +1,18 @@
 import bbtp
+from bitboxing_connection import BitboxingConnection
 import bitboxing_data as bbdata
 from bitboxing_sender import BitboxingSender
 import cv2 as cv
 import json
 from PIL import Image, ImageTk
 import pyzbar.pyzbar as pyzbar
-import socket
 import tkinter as tk
 from tkinter import font as tkfont
 import tkinter.messagebox as messagebox
 
 IP = "127.0.0.1"
 PORT = 9999
-VERSION = "0.1"
+VERSION = "0.2"
 
 class Frame(tk.Frame):
     """
@@ -63,6 +63,7 @@ class BitboxingGui(tk.Tk):
         frames.grid_columnconfigure(0, weight=1)
         
         self.sender = None
+        self.connection = BitboxingConnection(IP, PORT, VERSION)
 
         self.frames = {}
         for F in [Login, MainMenu, Scanner, PuzzleMenu, MyScore, Leaderboard]:
@@ -90,21 +91,34 @@ class BitboxingGui(tk.Tk):
     
     def make_request(self, msg):
         """
-        Sends a request to the server and fetches a response.
+        Sends a request to the server and fetches a response, reusing the open
+        server connection. If the server can't be reached, the response is an
+        exception status with the connection error as its body.
 
         @param {str} msg BBTP request
         @return {str}    BBTP response
         """
 
-        s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        s.connect((IP, PORT))
-        
-        bbtp.send_msg(s, msg)
-        msg = bbtp.receive_msg(s)
-        
-        s.close()
+        try:
+            return self.connection.request(msg)
+        except OSError as ex:
+            self.connection.close()
+            return (bbtp.STATUS_EXCEPTION, f"Could not reach the server: {repr(ex)}")
+    
+    def make_batch_request(self, sender, *msgs):
+        """
+        Sends several requests to the server in one BATCH request and fetches
+        their responses.
+
+        @param {BitboxingSender} sender BBTP sender
+        @param {list of str}     *msgs  BBTP requests from sender
+        @return {list of tuple (str, str)} (status code, body) for each request,
+                                           or just the BATCH response if it failed
+        """
 
-        return bbtp.parse_response(msg)
+        response = self.make_request(sender.handle_batch(*msgs))
+
+        return bbtp.parse_batch_response(response[1]) if response[0] == bbtp.STATUS_OK else [response]
     
     def unknown_error(self):
         messagebox.showerror(title="Error", message="An unknown error has occurred.")
@@ -157,28 +171,24 @@ class Login(Frame):
     def login(self):
         """
         Validates a user's login info. Creates the user if it does not already exist.
+        Registering and logging in are sent together in one BATCH request; if the
+        user already exists, the REGISTER part is simply refused. The session
+        token from LOGIN is sent with every later request.
         """
         
         username = self.username.get()
         password = self.password.get()
         sender = BitboxingSender(username, VERSION)
-        response = self.controller.make_request(sender.handle_login(password))
-
-        if response[0] == bbtp.STATUS_UNAUTHENTICATED:
-            response = self.controller.make_request(sender.handle_register(password))
-
-            if response[0] == bbtp.STATUS_OK:
-                response = self.controller.make_request(sender.handle_login(password))
+        response = self.controller.make_batch_request(sender, sender.handle_register(password), sender.handle_login(password))[-1]
         
         if response[0] == bbtp.STATUS_OK:
+            sender.set_token(response[1])
             self.controller.sender = sender
             self.controller.load("MainMenu")
         elif response[0] == bbtp.STATUS_INCORRECT:
             messagebox.showerror(title="Login Error", message="Invalid password!")
-            self.controller.sender = None
         else:
             self.controller.unknown_error()
-            self.controller.sender = None
 
 class MainMenu(Frame):
     def __init__(self, parent, controller):
@@ -264,6 +274,7 @@ class Scanner(Frame):
         """
         Goes to PuzzleMenu frame if a Bitboxing QR code is successfully scanned.
         Displays an error message if an invalid code was scanned.
+        The puzzle's leaderboard is fetched in the same BATCH request as the puzzle.
 
         Side effects: code is set to an empty string if an invalid code was scanned.
         """
@@ -271,10 +282,11 @@ class Scanner(Frame):
         self.scanner.configure(image="")
 
         sender = self.controller.sender
-        response = self.controller.make_request(sender.handle_find(self.code))
+        responses = self.controller.make_batch_request(sender, sender.handle_find(self.code), sender.handle_cache_leaderboard(self.code))
+        response = responses[0]
 
         if response[0] == bbtp.STATUS_OK or response[0] == bbtp.STATUS_WITHOUT_CHANGE:
-            self.controller.load("PuzzleMenu", self.code, response[1])
+            self.controller.load("PuzzleMenu", self.code, response[1], responses[1])
         elif response[0] == bbtp.STATUS_NOT_FOUND:
             self.code = ""
             messagebox.showwarning("QR Scanner Error", "Invalid QR code.")
@@ -335,12 +347,13 @@ class PuzzleMenu(Frame):
     
     def on_load(self, *args):
         """
-        Shows the puzzle question and clears the hint, guess, and leaderboard.
+        Shows the puzzle question and leaderboard and clears the hint and guess.
 
         Side effects: code is modified
 
-        @param {str} args[0] Puzzle ID
-        @param {str} args[1] Puzzle question
+        @param {str}              args[0] Puzzle ID
+        @param {str}              args[1] Puzzle question
+        @param {tuple (str, str)} args[2] CACHE_LEADERBOARD response (optional)
         """
 
         self.question["text"] = ""
@@ -350,6 +363,9 @@ class PuzzleMenu(Frame):
 
         self.code = args[0]
         self.question["text"] = args[1]
+
+        if len(args) > 2 and args[2][0] == bbtp.STATUS_OK:
+            self.leaderboard["text"] = self.format_leaderboard(args[2][1])
     
     def show_hint(self):
         """
@@ -494,15 +510,20 @@ class MyScore(Frame):
     
     def on_load(self, *args):
         """
-        Shows the player' score or an error message if something goes wrong.
+        Shows the player's score and rank, and the players ranked around them,
+        or an error message if something goes wrong. Both are fetched in one
+        BATCH request.
         """
         
         self.response["text"] = ""
         sender = self.controller.sender
-        response = self.controller.make_request(sender.handle_score(sender.id()))
+        responses = self.controller.make_batch_request(sender, sender.handle_rank(sender.id()), sender.handle_leaderboard_around(sender.id()))
+        response = responses[0]
 
         if response[0] == bbtp.STATUS_OK:
             self.response["text"] = self.format_my_score(response[1])
+            if len(responses) > 1 and responses[1][0] == bbtp.STATUS_OK:
+                self.response["text"] += "\n" + self.format_leaderboard_around(responses[1][1])
         elif response[0] == bbtp.STATUS_EXCEPTION:
             messagebox.showerror("My Score Error", response[1])
         else:
@@ -510,19 +531,37 @@ class MyScore(Frame):
 
     def format_my_score(self, msg):
         """
-        Formats a SCORE response payload into a readable string.
+        Formats a RANK response payload into a readable string.
 
-        @param {str} msg JSON object containing score data
+        @param {str} msg JSON object containing score data and rank
         @return {str}
         """
         
-        score = bbdata.PlayerScore.from_dict(json.loads(msg))
+        data = json.loads(msg)
+        score = bbdata.PlayerScore.from_dict(data)
         
-        s = f"Finds:  {score.finds()}\n" + \
+        s = f"Rank:   {data['rank']}\n" + \
+            f"Finds:  {score.finds()}\n" + \
             f"Solves: {score.solves()}\n"
         
         return s
     
+    def format_leaderboard_around(self, msg):
+        """
+        Formats a LEADERBOARD_AROUND response payload into a readable string.
+
+        @param  {str} msg List of PlayerScore objects with ranks as JSON-formatted string
+        @return {str}
+        """
+
+        leaderboard = json.loads(msg)
+
+        s = "".ljust(4) + "  " + "Player".ljust(40) + "  " + "Finds".ljust(6) + "  " + "Solves".ljust(6) + "\n"
+        for x in leaderboard:
+            s += str(x['rank']).ljust(4) + "  " + x['player'].ljust(40) + "  " + str(x['finds']).ljust(6) + "  " + str(x['solves']).ljust(6) + "\n"
+        
+        return s
+    
 if __name__ == "__main__":
     app = BitboxingGui(800, 600)
     app.mainloop()
\ No newline at end of file
@@ -0,0 +1,283 @@
+from bitboxing_data import PlayerScore
+import random
+import threading
+
+MAX_LEVEL = 24
+
+class _Node:
+    """
+    Skip list node. width[i] is how many places down the list next[i] is.
+    """
+
+    def __init__(self, key, level):
+        """
+        Constructor.
+
+        @param {tuple} key   (-solves, -finds, player), or None for the head
+        @param {int}   level Number of lists the node is linked into
+        """
+
+        self.key = key
+        self.next = [None] * level
+        self.width = [1] * level
+
+class ScoreRanking:
+    """
+    Players ranked by score in memory, ordered as in
+    BitboxingSql.compare_scores with ties broken by name. Kept in an indexable
+    skip list, so updating a score or finding a player's rank takes O(log n)
+    and reading the top N players takes O(N). Safe to share between threads.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._clear()
+
+    def load(self, scores):
+        """
+        Replaces every ranked player.
+
+        @param {list of PlayerScore} scores
+        """
+
+        with self._lock:
+            self._clear()
+            for x in scores:
+                self._set(x.player(), x.finds(), x.solves())
+
+    def set(self, score):
+        """
+        Sets a player's score, adding the player if they aren't ranked yet.
+
+        @param {PlayerScore} score
+        """
+
+        with self._lock:
+            self._set(score.player(), score.finds(), score.solves())
+
+    def add(self, player, finds=0, solves=0):
+        """
+        Adds to a player's score, adding the player if they aren't ranked yet.
+
+        @param {str} player Username
+        @param {int} finds  Number of new finds
+        @param {int} solves Number of new solves
+        """
+
+        with self._lock:
+            old_finds, old_solves = self._scores.get(player, (0, 0))
+            self._set(player, old_finds + finds, old_solves + solves)
+
+    def score(self, player):
+        """
+        Gets a player's score.
+
+        @param  {str}         player Username
+        @return {PlayerScore}        0 finds and 0 solves if not ranked
+        """
+
+        with self._lock:
+            finds, solves = self._scores.get(player, (0, 0))
+
+        return PlayerScore(player, finds, solves)
+
+    def rank(self, player):
+        """
+        Gets a player's place in the ranking.
+
+        @param  {str} player Username
+        @return {int}        1 for the best player, or None if not ranked
+        """
+
+        with self._lock:
+            if player not in self._scores:
+                return None
+
+            return self._rank(player)
+
+    def around(self, player, count):
+        """
+        Gets a player and their neighbours in the ranking.
+
+        @param  {str}                               player Username
+        @param  {int}                               count  Max number of players to fetch above and below
+        @return {list of tuple (int, PlayerScore)}         (rank, score) for up to 2 * count + 1 players,
+                                                           best first, or an empty list if not ranked
+        """
+
+        with self._lock:
+            if player not in self._scores:
+                return []
+
+            i = self._rank(player)
+            first = max(1, i - count)
+            last = min(self._size, i + count)
+            node = self._node_at(first)
+            window = []
+
+            for rank in range(first, last + 1):
+                solves, finds, name = node.key
+                window.append((rank, PlayerScore(name, -finds, -solves)))
+                node = node.next[0]
+
+        return window
+
+    def top(self, count=0):
+        """
+        Gets the best-performing players.
+
+        @param  {int}                 count Max number of players to fetch (all if count <= 0)
+        @return {list of PlayerScore}       Up to count number of objects, best first
+        """
+
+        with self._lock:
+            n = self._size if count <= 0 else min(count, self._size)
+            leaderboard = []
+            node = self._head.next[0]
+
+            for i in range(n):
+                solves, finds, player = node.key
+                leaderboard.append(PlayerScore(player, -finds, -solves))
+                node = node.next[0]
+
+        return leaderboard
+
+    def __len__(self):
+        """
+        Gets the number of ranked players.
+
+        @return {int}
+        """
+
+        return self._size
+
+    def _clear(self):
+        """
+        Removes every ranked player.
+        """
+
+        self._head = _Node(None, MAX_LEVEL)
+        self._size = 0
+        self._scores = {}
+
+    def _rank(self, player):
+        """
+        Finds a ranked player's place in the ranking.
+
+        @param  {str} player Username
+        @return {int}        1 for the best player
+        """
+
+        key = ScoreRanking._key(player, *self._scores[player])
+        node = self._head
+        i = 0
+
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key <= key:
+                i += node.width[level]
+                node = node.next[level]
+
+        return i
+
+    def _node_at(self, rank):
+        """
+        Finds the node at a place in the ranking.
+
+        @param  {int}   rank 1 for the best player
+        @return {_Node}
+        """
+
+        node = self._head
+
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.width[level] <= rank:
+                rank -= node.width[level]
+                node = node.next[level]
+
+        return node
+
+    def _set(self, player, finds, solves):
+        """
+        Moves a player to the place for a new score.
+        """
+
+        if player in self._scores:
+            self._remove(ScoreRanking._key(player, *self._scores[player]))
+
+        self._scores[player] = (finds, solves)
+        self._insert(ScoreRanking._key(player, finds, solves))
+
+    def _insert(self, key):
+        """
+        Links a new node into the skip list.
+        """
+
+        chain = [None] * MAX_LEVEL
+        steps = [0] * MAX_LEVEL
+        node = self._head
+
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key < key:
+                steps[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        height = 1
+        while height < MAX_LEVEL and self._random.random() < 0.5:
+            height += 1
+
+        new = _Node(key, height)
+        distance = 0
+
+        for level in range(height):
+            prev = chain[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - distance
+            prev.width[level] = distance + 1
+            distance += steps[level]
+
+        for level in range(height, MAX_LEVEL):
+            chain[level].width[level] += 1
+
+        self._size += 1
+
+    def _remove(self, key):
+        """
+        Unlinks the node with a key from the skip list.
+        """
+
+        chain = [None] * MAX_LEVEL
+        node = self._head
+
+        for level in reversed(range(MAX_LEVEL)):
+            while node.next[level] is not None and node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+
+        old = chain[0].next[0]
+
+        for level in range(len(old.next)):
+            prev = chain[level]
+            prev.width[level] += old.width[level] - 1
+            prev.next[level] = old.next[level]
+
+        for level in range(len(old.next), MAX_LEVEL):
+            chain[level].width[level] -= 1
+
+        self._size -= 1
+
+    @staticmethod
+    def _key(player, finds, solves):
+        """
+        Gets the sort key for a score, smallest first.
+
+        @return {tuple (int, int, str)} (-solves, -finds, player)
+        """
+
+        return (-solves, -finds, player)
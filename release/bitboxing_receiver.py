@@ -1,45 +1,171 @@
 import bbtp
+import bbtp_binary
+from bitboxing_context import RequestContext
+from bitboxing_ranking import ScoreRanking
+from bitboxing_responses import ResponseCache
+from bitboxing_sessions import SessionTable
 from bitboxing_sql import BitboxingSql 
+from bitboxing_writer import BitboxingWriter
 import json
+import sqlite3 as sqlite
+import threading
 import time
+import types
 
 class BitboxingReceiver:
     """
-    Responds to BBTP requests using SQLite database.
+    Responds to BBTP requests using SQLite database. Player scores are also
+    ranked in memory, so the game leaderboard never has to query the database.
+    Puzzles never change while the server runs, so they are loaded once and
+    only looked up in memory after that (see reload_puzzles). Server threads
+    read through read-only connections; REGISTER, FIND and SOLVE writes go
+    through a BitboxingWriter, which commits them in groups. LEADERBOARD and
+    CACHE_LEADERBOARD responses are cached until a write changes them (see
+    ResponseCache). Handlers respond in the encoding of the request being
+    handled (see respond), so a binary response is written straight from the
+    data rather than converted from text.
     """
     
     def __init__(self, version, path):
         """
         Constructor.
         
-        @param {str} version BBTP version
+        @param {str} version Newest BBTP version to support
         @param {str} path    File path of SQLite database
         """
 
         self._version = version
+        self._versions = set(bbtp.VERSIONS[:bbtp.VERSIONS.index(version) + 1])
         self._path = path
+        self._local = threading.local()
+        self._ranking = ScoreRanking()
+        self._puzzles = types.MappingProxyType({})
+        self._sessions = SessionTable()
+        self._responses = ResponseCache()
         
         sql = BitboxingSql(path)
         sql.setup()
-        self._sql = sql
+        sql.close()
+
+        self._ranking.load(self._sql().leaderboard())
+        self.reload_puzzles()
+        self._writer = BitboxingWriter(path)
+    
+    def close(self):
+        """
+        Waits for writes in progress, then closes the writer's connection.
+        """
+
+        self._writer.close()
+    
+    def response_cache(self):
+        """
+        Gets the leaderboard response cache, e.g. to check its hit rate.
+
+        @return {ResponseCache}
+        """
+
+        return self._responses
     
     def supports(self, version):
         """
-        Checks if the receiver supports a given BBTP version.
+        Checks if the receiver supports a given BBTP version. A receiver
+        supports its own version and every older one.
         
         @param {str} version BBTP version
         """
-        return version == self._version
+        return version in self._versions
+    
+    def reload_puzzles(self):
+        """
+        Reloads every puzzle from the database, for after an admin has edited
+        the Puzzles table. Responses to FIND are formatted here once per
+        puzzle. The new puzzles replace the old ones all at once, so requests
+        being handled meanwhile see either the old set or the new one.
+        """
+
+        puzzles = {}
+
+        for cache, puzzle in self._sql().puzzles().items():
+            responses = {}
+            for status in (bbtp.STATUS_OK, bbtp.STATUS_WITHOUT_CHANGE):
+                responses[(status, False)] = bbtp.format_response(status, puzzle.question())
+                responses[(status, True)] = bbtp_binary.encode_payload(status, "FIND", puzzle.question())
+            puzzles[cache] = (puzzle, types.MappingProxyType(responses))
+
+        self._puzzles = types.MappingProxyType(puzzles)
+        print(f"Loaded {len(puzzles)} puzzles.")
+    
+    def begin_request(self, sender, cache=None, binary=False):
+        """
+        Starts a request context for the calling thread, so database lookups
+        made while handling the request are shared (see RequestContext).
+        Requests can be nested (e.g. each request in a BATCH); ending one
+        returns to the request around it.
+
+        @param {str}  sender Username
+        @param {str}  cache  Puzzle ID the request is about (optional)
+        @param {bool} binary True to respond in the binary encoding (see bbtp_binary)
+        """
+
+        self._requests().append((RequestContext(self._sql(), sender, cache), binary))
+    
+    def end_request(self):
+        """
+        Ends the calling thread's innermost request context.
+        """
+
+        self._requests().pop()
+    
+    def is_binary(self):
+        """
+        Checks if the calling thread's request is answered in the binary
+        encoding.
+
+        @return {bool} False if no request is in progress
+        """
+
+        requests = self._requests()
+        return len(requests) > 0 and requests[-1][1]
+    
+    def respond(self, method, status, data=None):
+        """
+        Formats a response in the encoding of the calling thread's request.
+        Binary responses are encoded directly from the data; text responses
+        carry it as a JSON-formatted body.
+
+        @param  {str}          method BBTP method of the request
+        @param  {str}          status BBTP status code
+        @param  {any}          data   Response body: None for none, str as is, list of responses for BATCH,
+                                      otherwise JSON-serializable data
+        @return {str or bytes}        BBTP response, bytes if binary
+        """
+
+        if self.is_binary():
+            return bbtp_binary.encode_payload(status, method, data)
+        elif data is None:
+            return bbtp.format_response(status)
+        elif isinstance(data, str):
+            return bbtp.format_response(status, data)
+        elif method == "BATCH":
+            return bbtp.format_response(status, bbtp.format_batch_response(data))
+        else:
+            return bbtp.format_response(status, BitboxingReceiver._to_json(data))
     
-    def is_authenticated(self, sender):
+    def is_authenticated(self, sender, token=""):
         """
-        Checks if a user is registered.
+        Checks if a user is registered. A valid session token from LOGIN is
+        checked in memory; without one, the user is looked up in the database.
 
         @param {str} sender Username
+        @param {str} token  Session token (optional)
         @return {bool} True if user with username matching sender exists.
         """
 
-        return self._sql.is_valid_user(sender)
+        if token != "" and self._sessions.check(sender, token):
+            return True
+
+        return self._context(sender).is_user()
     
     def handle_error(self, sender, error_code, msg=""):
         """
@@ -54,7 +180,7 @@ class BitboxingReceiver:
         print(f"Request from '{sender}' generated error '{error_code}'.")
         if msg != "":
             print(msg)
-        return bbtp.format_response(error_code, "")
+        return self.respond("", error_code)
     
     def handle_register(self, sender, password):
         """
@@ -67,13 +193,21 @@ class BitboxingReceiver:
                                STATUS_OK if user was created
         """
 
-        if self._sql.is_valid_user(sender):
+        if self._sql().is_valid_user(sender):
+            print(f"User '{sender} already exists!")
+            return self.handle_error(sender, bbtp.STATUS_OUT_OF_ORDER)
+
+        try:
+            self._writer.register(sender, password)
+        except sqlite.IntegrityError:
+            # Registered by another request since the check above
             print(f"User '{sender} already exists!")
             return self.handle_error(sender, bbtp.STATUS_OUT_OF_ORDER)
         else:
-            self._sql.register(sender, password)
+            self._ranking.add(sender)
+            self._responses.bump(None)
             print(f"Created user '{sender}' with password '{password}'.")
-            return bbtp.format_response(bbtp.STATUS_OK)
+            return self.respond("REGISTER", bbtp.STATUS_OK)
     
     def handle_login(self, sender, password):
         """
@@ -83,14 +217,15 @@ class BitboxingReceiver:
         @param  {str} password Password attempt
         @return {str}          BBTP response with
                                STATUS_INCORRECT if password is wrong,
-                               STATUS_OK if login successful
+                               STATUS_OK if login successful,
+                               body containing a session token for later requests
         """
         
-        if not self._sql.is_valid_password(sender, password):
+        if not self._sql().is_valid_password(sender, password):
             print(f"User '{sender} attempted an invalid password!")
             return self.handle_error(sender, bbtp.STATUS_INCORRECT)
         else:
-            return bbtp.format_response(bbtp.STATUS_OK)
+            return self.respond("LOGIN", bbtp.STATUS_OK, self._sessions.create(sender))
     
     def handle_find(self, sender, cache):
         """
@@ -104,15 +239,17 @@ class BitboxingReceiver:
                              STATUS_OK if cache found successfully
         """
         
-        if not self._sql.is_valid_cache(cache):
+        if cache not in self._puzzles:
             return self.handle_error(sender, bbtp.STATUS_NOT_FOUND)
-        elif self._sql.find_status(sender, cache).found():
-            msg = self._sql.puzzle(cache).question()
-            return bbtp.format_response(bbtp.STATUS_WITHOUT_CHANGE, msg)
+        
+        responses = self._puzzles[cache][1]
+
+        if self._writer.find(sender, cache, time.time_ns()):
+            self._ranking.add(sender, finds=1)
+            self._responses.bump(None, cache)
+            return responses[(bbtp.STATUS_OK, self.is_binary())]
         else:
-            self._sql.find(sender, cache, time.time_ns())
-            msg = self._sql.puzzle(cache).question()
-            return bbtp.format_response(bbtp.STATUS_OK, msg)
+            return responses[(bbtp.STATUS_WITHOUT_CHANGE, self.is_binary())]
     
     def handle_hint(self, sender, cache):
         """
@@ -127,34 +264,45 @@ class BitboxingReceiver:
                              body containing puzzle question as simple string
         """
         
-        if not self._sql.is_valid_cache(cache):
+        if cache not in self._puzzles:
             return self.handle_error(sender, bbtp.STATUS_NOT_FOUND)
-        elif not self._sql.find_status(sender, cache).found() or self._sql.find_status(sender, cache).solved():
+        
+        status = self._context(sender).find_status(cache)
+
+        if not status.found() or status.solved():
             return self.handle_error(sender, bbtp.STATUS_OUT_OF_ORDER)
         else:
-            msg = self._sql.puzzle(cache).hint()
-            return bbtp.format_response(bbtp.STATUS_OK, msg)
+            return self.respond("HINT", bbtp.STATUS_OK, self._puzzles[cache][0].hint())
     
     def handle_solve(self, sender, cache, guess):
         """
-        Records that a player has found a cache.
+        Records that a player has tried to solve a cache.
 
         @param  {str} sender Authenticated username
         @param  {str} cache  Puzzle ID
         @param  {str} guess  Player's guess for the puzzle solution
         @return {str}        BBTP response with status code
                              STATUS_NOT_FOUND if cache is invalid,
-                             STATUS_WITHOUT_CHANGE if sender hasn't found cache or already solved,
+                             STATUS_OUT_OF_ORDER if sender hasn't found cache or already solved,
+                             STATUS_INCORRECT if guess was wrong,
                              STATUS_OK if solved
         """
         
-        if not self._sql.is_valid_cache(cache):
+        if cache not in self._puzzles:
             return self.handle_error(sender, bbtp.STATUS_NOT_FOUND)
-        elif not self._sql.find_status(sender, cache).found() or self._sql.find_status(sender, cache).solved():
+        
+        answer = self._puzzles[cache][0].answer()
+        status = self._writer.try_to_solve(sender, cache, guess, time.time_ns(), answer)
+
+        if status is None:
             return self.handle_error(sender, bbtp.STATUS_OUT_OF_ORDER)
+        elif status.solved():
+            self._ranking.add(sender, solves=1)
+            self._responses.bump(None, cache)
+            return self.respond("SOLVE", bbtp.STATUS_OK)
         else:
-            is_correct = self._sql.try_to_solve(sender, cache, guess, time.time_ns())
-            return bbtp.format_response(bbtp.STATUS_OK if is_correct else bbtp.STATUS_INCORRECT)
+            self._responses.bump(cache)
+            return self.respond("SOLVE", bbtp.STATUS_INCORRECT)
     
     def handle_score(self, sender, player):
         """
@@ -169,11 +317,9 @@ class BitboxingReceiver:
                              body containing PlayerScore as JSON-formatted string
         """
         
-        data = self._sql.score(player).to_dict()
-        msg = BitboxingReceiver._to_json(data)
-        return bbtp.format_response(bbtp.STATUS_OK, msg)
+        return self.respond("SCORE", bbtp.STATUS_OK, self._sql().score(player).to_dict())
     
-    def handle_leaderboard(self, sender, count):
+    def handle_leaderboard(self, sender, count="-1"):
         """
         Fetches leaderboard containing the top-scoring players for the game overall.
 
@@ -184,11 +330,55 @@ class BitboxingReceiver:
         """
         
         n = 10 if int(count) < 0 else int(count)
-        data = [x.to_dict() for x in self._sql.leaderboard(n)]
-        msg = BitboxingReceiver._to_json(data)
-        return bbtp.format_response(bbtp.STATUS_OK, msg)
+
+        def build():
+            return self.respond("LEADERBOARD", bbtp.STATUS_OK, [x.to_dict() for x in self._ranking.top(n)])
+        
+        return self._responses.get(None, n, build, self.is_binary())
+    
+    def handle_rank(self, sender, player):
+        """
+        Fetches a player's place on the game leaderboard.
+
+        @param  {str} sender Authenticated username
+        @param  {str} player Username
+        @return {str}        BBTP response with status code
+                             STATUS_NOT_FOUND if player does not exist,
+                             STATUS_OK if rank was fetched successfully,
+                             body containing PlayerScore with rank as JSON-formatted string
+        """
+        
+        rank = self._ranking.rank(player)
+
+        if rank is None:
+            return self.handle_error(sender, bbtp.STATUS_NOT_FOUND)
+        else:
+            data = BitboxingReceiver._ranked(rank, self._ranking.score(player))
+            return self.respond("RANK", bbtp.STATUS_OK, data)
+    
+    def handle_leaderboard_around(self, sender, player, count="-1"):
+        """
+        Fetches the part of the game leaderboard around a player.
+
+        @param  {str} sender Authenticated username
+        @param  {str} player Username
+        @param  {str} count  Max number of players to fetch above and below player (default 2 if count < 0)
+        @return {str}        BBTP response with status code
+                             STATUS_NOT_FOUND if player does not exist,
+                             STATUS_OK if leaderboard was fetched successfully,
+                             body containing list of PlayerScore objects with ranks as JSON-formatted string
+        """
+        
+        n = 2 if int(count) < 0 else int(count)
+        window = self._ranking.around(player, n)
+
+        if len(window) == 0:
+            return self.handle_error(sender, bbtp.STATUS_NOT_FOUND)
+        else:
+            data = [BitboxingReceiver._ranked(rank, score) for rank, score in window]
+            return self.respond("LEADERBOARD_AROUND", bbtp.STATUS_OK, data)
     
-    def handle_cache_leaderboard(self, sender, cache, count):
+    def handle_cache_leaderboard(self, sender, cache, count="-1"):
         """
         Fetches the leaderboard containing the top-scoring playres for a given cache.
 
@@ -199,13 +389,73 @@ class BitboxingReceiver:
                              body containing list of player names as JSON-formatted string
         """
         
-        if not self._sql.is_valid_cache(cache):
+        if cache not in self._puzzles:
             return self.handle_error(sender, bbtp.STATUS_NOT_FOUND)
         else:
             n = 10 if int(count) < 0 else int(count)
-            data = [x['player'] for x in self._sql.cache_leaderboard(cache, n)]
-            msg = BitboxingReceiver._to_json(data)
-            return bbtp.format_response(bbtp.STATUS_OK, msg)
+
+            def build():
+                data = [x['player'] for x in self._sql().cache_leaderboard(cache, n)]
+                return self.respond("CACHE_LEADERBOARD", bbtp.STATUS_OK, data)
+            
+            return self._responses.get(cache, n, build, self.is_binary())
+    
+    def _context(self, sender):
+        """
+        Gets the calling thread's request context, or a new one if no request
+        from sender is in progress (e.g. when a handler is called directly).
+
+        @param  {str}            sender Username
+        @return {RequestContext}
+        """
+
+        requests = self._requests()
+        if len(requests) == 0 or requests[-1][0].sender() != sender:
+            return RequestContext(self._sql(), sender)
+        return requests[-1][0]
+    
+    def _requests(self):
+        """
+        Gets the calling thread's requests in progress, innermost last.
+
+        @return {list of tuple (RequestContext, bool)} (context, binary) for each request
+        """
+
+        requests = getattr(self._local, "requests", None)
+        if requests is None:
+            requests = []
+            self._local.requests = requests
+        return requests
+    
+    def _sql(self):
+        """
+        Gets the read-only SQL executor for the calling thread. Each server
+        thread gets its own BitboxingSql, so worker threads never share a
+        connection.
+
+        @return {BitboxingSql}
+        """
+
+        sql = getattr(self._local, "sql", None)
+        if sql is None:
+            sql = BitboxingSql(self._path, read_only=True)
+            self._local.sql = sql
+        return sql
+    
+    @staticmethod
+    def _ranked(rank, score):
+        """
+        Converts a player's score and rank to a Python dictionary.
+
+        @param  {int}         rank  Place on the game leaderboard
+        @param  {PlayerScore} score
+        @return {dict}              'rank': rank, plus PlayerScore fields
+        """
+
+        data = {'rank': rank}
+        data.update(score.to_dict())
+        
+        return data
     
     @staticmethod
     def _to_json(data):
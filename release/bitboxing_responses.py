@@ -0,0 +1,89 @@
+import threading
+
+MAX_COUNT = 100
+
+class ResponseCache:
+    """
+    Serialized leaderboard responses, reused until the data behind them
+    changes. Each scope (None for the game leaderboard, or a puzzle ID) has a
+    version number that writes bump. A response is cached under its scope,
+    player count and variant (e.g. text or binary encoding) along with the
+    version it was built from, and only served while that version is current.
+    Safe to share between threads.
+    """
+
+    def __init__(self, max_count=MAX_COUNT):
+        """
+        Constructor.
+
+        @param {int} max_count Largest player count to cache responses for (responses for
+                               every player, count 0, are never cached)
+        """
+
+        self._max_count = max_count
+        self._lock = threading.Lock()
+        self._versions = {}
+        self._responses = {}
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, scope, count, build, variant=None):
+        """
+        Gets a response, building it if there's no response for the current
+        version of its scope.
+
+        @param  {str}      scope   Puzzle ID, or None for the game leaderboard
+        @param  {int}      count   Number of players in the response
+        @param  {function} build   Called with no arguments to build the response
+        @param  {any}      variant Distinguishes responses to the same request built differently (optional)
+        @return {any}              BBTP response
+        """
+
+        key = (scope, count, variant)
+
+        with self._lock:
+            version = self._versions.get(scope, 0)
+            cached = self._responses.get(key)
+
+            if cached is not None and cached[0] == version:
+                self._hits += 1
+                return cached[1]
+
+            self._misses += 1
+
+        response = build()
+
+        if 0 < count <= self._max_count:
+            with self._lock:
+                self._responses[key] = (version, response)
+
+        return response
+
+    def bump(self, *scopes):
+        """
+        Marks the responses for scopes out of date. Call after the change is
+        visible to readers, so a response built before it is never cached as
+        current.
+
+        @param {list of str} *scopes Puzzle IDs, or None for the game leaderboard
+        """
+
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def stats(self):
+        """
+        Gets how often cached responses were reused.
+
+        @return {dict} 'hits', 'misses', and 'hit_rate' (0 if nothing was requested)
+        """
+
+        with self._lock:
+            total = self._hits + self._misses
+
+            return {
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': self._hits / total if total > 0 else 0,
+            }
@@ -15,6 +15,7 @@ class BitboxingSender:
         
         self._id = sender_id
         self._version = version
+        self._token = ""
     
     def id(self):
         """
@@ -34,6 +35,25 @@ class BitboxingSender:
 
         return self._version
     
+    def token(self):
+        """
+        Gets the session token sent with each request.
+
+        @return {str} Session token, empty if not logged in
+        """
+
+        return self._token
+    
+    def set_token(self, token):
+        """
+        Sets the session token from a LOGIN response, to be sent with each
+        later request.
+
+        @param {str} token Session token
+        """
+
+        self._token = token
+    
     def handle_register(self, password):
         """
         Generates a BBTP REGISTER request.
@@ -59,7 +79,7 @@ class BitboxingSender:
         @param {str} cache Puzzle ID
         """
 
-        return bbtp.format_request(self._id, self._version, "FIND", cache)
+        return bbtp.format_request(self._id, self._version, "FIND", cache, token=self._token)
     
     def handle_hint(self, cache):
         """
@@ -68,7 +88,7 @@ class BitboxingSender:
         @param {str} cache Puzzle ID
         """
 
-        return bbtp.format_request(self._id, self._version, "HINT", cache)
+        return bbtp.format_request(self._id, self._version, "HINT", cache, token=self._token)
     
     def handle_solve(self, cache, guess):
         """
@@ -78,7 +98,7 @@ class BitboxingSender:
         @param {str} guess Player's guess for the puzzle solution
         """
 
-        return bbtp.format_request(self._id, self._version, "SOLVE", cache, guess)
+        return bbtp.format_request(self._id, self._version, "SOLVE", cache, guess, token=self._token)
     
     def handle_score(self, player):
         """
@@ -87,7 +107,7 @@ class BitboxingSender:
         @param {str} player Username
         """
 
-        return bbtp.format_request(self._id, self._version, "SCORE", player)
+        return bbtp.format_request(self._id, self._version, "SCORE", player, token=self._token)
     
     def handle_leaderboard(self, count=-1):
         """
@@ -96,7 +116,7 @@ class BitboxingSender:
         @param {int} count Max number of players to show (default lets the receiver decide)
         """
 
-        return bbtp.format_request(self._id, self._version, "LEADERBOARD", str(count))
+        return bbtp.format_request(self._id, self._version, "LEADERBOARD", str(count), token=self._token)
         
     def handle_cache_leaderboard(self, cache, count=-1):
         """
@@ -106,4 +126,32 @@ class BitboxingSender:
         @param {int} count Max number of players to show (default lets the receiver decide)
         """
 
-        return bbtp.format_request(self._id, self._version, "CACHE_LEADERBOARD", cache, str(count))
\ No newline at end of file
+        return bbtp.format_request(self._id, self._version, "CACHE_LEADERBOARD", cache, str(count), token=self._token)
+    
+    def handle_rank(self, player):
+        """
+        Generates a BBTP RANK request.
+
+        @param {str} player Username
+        """
+
+        return bbtp.format_request(self._id, self._version, "RANK", player, token=self._token)
+    
+    def handle_leaderboard_around(self, player, count=-1):
+        """
+        Generates a BBTP LEADERBOARD_AROUND request.
+
+        @param {str} player Username
+        @param {int} count  Max number of players to show above and below player (default lets the receiver decide)
+        """
+
+        return bbtp.format_request(self._id, self._version, "LEADERBOARD_AROUND", player, str(count), token=self._token)
+    
+    def handle_batch(self, *requests):
+        """
+        Generates a BBTP BATCH request.
+
+        @param {list of str} *requests BBTP requests from this sender to handle in order
+        """
+
+        return bbtp.format_batch(self._id, self._version, requests, self._token)
\ No newline at end of file
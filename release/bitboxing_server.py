@@ -1,8 +1,98 @@
 from bitboxing_receiver import BitboxingReceiver
 import bbtp
+import bbtp_binary
+import queue
+import selectors
 import socket
+import threading
+import time
 
 PORT = 9999
+IDLE_TIMEOUT = 15
+WORKERS = 8
+QUEUE_SIZE = 100
+
+class MethodSpec:
+    """
+    Describes how the server handles a BBTP method.
+    """
+
+    def __init__(self, handler, arities, auth=True, raw=False, cache_arg=None):
+        """
+        Constructor.
+
+        @param {function}    handler    Called as handler(receiver, sender, *args),
+                                        or handler(receiver, sender, version, token, body, *args) if raw
+        @param {set of int}  arities    Accepted numbers of arguments
+        @param {bool}        auth       True if the sender must be a registered user
+        @param {bool}        raw        True if the handler needs the request version, session token and body
+        @param {int}         cache_arg  Index of the argument holding a puzzle ID, if any, so the sender's
+                                        find status is loaded by the same query as the auth check
+        """
+
+        self._handler = handler
+        self._arities = arities
+        self._auth = auth
+        self._raw = raw
+        self._cache_arg = cache_arg
+    
+    def accepts(self, args):
+        """
+        Checks if a request has an accepted number of arguments.
+
+        @param  {list of str} args Method arguments
+        @return {bool}
+        """
+
+        return len(args) in self._arities
+    
+    def requires_auth(self):
+        """
+        Gets whether the sender must be a registered user.
+
+        @return {bool}
+        """
+
+        return self._auth
+    
+    def cache(self, args):
+        """
+        Gets the puzzle ID a request is about.
+
+        @param  {list of str} args Method arguments
+        @return {str}              Puzzle ID, None if the method isn't about a cache
+        """
+
+        return None if self._cache_arg is None else args[self._cache_arg]
+    
+    def handle(self, receiver, sender, version, token, args, body):
+        """
+        Calls the handler.
+
+        @param  {BitboxingReceiver} receiver Database
+        @param  {str}               sender   Username
+        @param  {str}               version  BBTP version
+        @param  {str}               token    Session token
+        @param  {list of str}       args     Method arguments
+        @param  {str}               body     Request body
+        @return {str}                        BBTP response
+        """
+
+        if self._raw:
+            return self._handler(receiver, sender, version, token, body, *args)
+        else:
+            return self._handler(receiver, sender, *args)
+
+METHODS = {}
+
+def register_method(method, handler, arities, auth=True, raw=False, cache_arg=None):
+    """
+    Adds a BBTP method to the server. See MethodSpec.
+
+    @param {str} method BBTP method (e.g. FIND)
+    """
+
+    METHODS[method] = MethodSpec(handler, set(arities), auth, raw, cache_arg)
 
 def handle_request(msg, receiver):
     """
@@ -12,74 +102,370 @@ def handle_request(msg, receiver):
     @param {BitboxingReceiver} receiver Database
     @return {str}                       BBTP response
     """
-    sender, version, method, args, body = bbtp.parse_request(msg)
+
+    sender, version, method, args, body, token = bbtp.parse_request(msg)
+
+    return dispatch(sender, version, method, args, body, receiver, token)
+
+def dispatch(sender, version, method, args, body, receiver, token="", binary=False):
+    """
+    Responds to a parsed client request. Every check that doesn't need the
+    database runs before the sender is authenticated. Database lookups are
+    shared between the auth check and the handler through the receiver's
+    request context, which also holds the encoding to respond in.
+
+    @param {str}               sender   Username
+    @param {str}               version  BBTP version
+    @param {str}               method   BBTP method
+    @param {list of str}       args     Method arguments
+    @param {str}               body     Request body
+    @param {BitboxingReceiver} receiver Database
+    @param {str}               token    Session token from LOGIN (optional)
+    @param {bool}              binary   True to respond in the binary encoding (see bbtp_binary)
+    @return {str}                       BBTP response, bytes if binary
+    """
 
     print(f"Server received request from '{sender}':")
     print(f"{method} {args}")
 
+    spec = METHODS.get(method)
+    cache = spec.cache(args) if spec is not None and spec.accepts(args) else None
+
+    receiver.begin_request(sender, cache, binary)
+
     try:
         if sender == "" or version == "" or method == "":
             return receiver.handle_error(sender, bbtp.STATUS_BAD_REQUEST)
         elif not receiver.supports(version):
             return receiver.handle_error(sender, bbtp.STATUS_VERSION_NOT_SUPPORTED)
-        elif method != "REGISTER" and not receiver.is_authenticated(sender):
-            return receiver.handle_error(sender, bbtp.STATUS_UNAUTHENTICATED)
-        elif not bbtp.is_valid_method(method):
+        elif spec is None:
             return receiver.handle_error(sender, bbtp.STATUS_UNRECOGNIZED_METHOD)
-        elif method == "REGISTER" and len(args) == 1:
-            return receiver.handle_register(sender, args[0])
-        elif method == "LOGIN" and len(args) == 1:
-            return receiver.handle_login(sender, args[0])
-        elif method == "FIND" and len(args) == 1:
-            return receiver.handle_find(sender, args[0])
-        elif method == "HINT" and len(args) == 1:
-            return receiver.handle_hint(sender, args[0])
-        elif method == "SOLVE" and len(args) == 2:
-            return receiver.handle_solve(sender, args[0], args[1])
-        elif method == "SCORE" and len(args) == 1:
-            return receiver.handle_score(sender, args[0])
-        elif method == "LEADERBOARD" and len(args) == 0:
-            return receiver.handle_leaderboard(sender)
-        elif method == "LEADERBOARD" and len(args) == 1:
-            return receiver.handle_leaderboard(sender, args[0])
-        elif method == "CACHE_LEADERBOARD" and len(args) == 1:
-            return receiver.handle_cache_leaderboard(sender, args[0])
-        elif method == "CACHE_LEADERBOARD" and len(args) == 2:
-            return receiver.handle_cache_leaderboard(sender, args[0], args[1])
-        else:
+        elif not spec.accepts(args):
             return receiver.handle_error(sender, bbtp.STATUS_WRONG_NUM_OF_PARAMS)
+        elif spec.requires_auth() and not receiver.is_authenticated(sender, token):
+            return receiver.handle_error(sender, bbtp.STATUS_UNAUTHENTICATED)
+        else:
+            return spec.handle(receiver, sender, version, token, args, body)
     except Exception as ex:
             return receiver.handle_error(sender, bbtp.STATUS_EXCEPTION, repr(Exception) + ": " + repr(ex))
+    finally:
+        receiver.end_request()
+
+def handle_binary_request(data, receiver):
+    """
+    Responds to binary client requests (see bbtp_binary).
+
+    @param {bytes}             data     Binary BBTP request
+    @param {BitboxingReceiver} receiver Database
+    @return {bytes}                     Binary BBTP response
+    """
+
+    try:
+        sender, version, method, args, body, token = bbtp_binary.decode_request(data)
+    except Exception as ex:
+        receiver.handle_error("", bbtp.STATUS_BAD_REQUEST, repr(ex))
+        return bbtp_binary.encode_payload(bbtp.STATUS_BAD_REQUEST, "", None)
+    
+    return dispatch(sender, version, method, args, body, receiver, token, True)
+
+def handle_batch(receiver, sender, version, token, body):
+    """
+    Responds to each request in a BATCH request, in order. Each batched
+    request is authenticated and handled as if it had been sent on its own,
+    and answered in the same encoding as the BATCH request.
+
+    @param {BitboxingReceiver} receiver Database
+    @param {str}               sender   Username
+    @param {str}               version  BBTP version
+    @param {str}               token    Session token
+    @param {str}               body     BATCH request body
+    @return {str}                       BBTP response, body containing the batched responses
+    """
+
+    try:
+        commands = bbtp.parse_batch(body)
+    except ValueError as ex:
+        return receiver.handle_error(sender, bbtp.STATUS_BAD_REQUEST, repr(ex))
+
+    binary = receiver.is_binary()
+
+    if len(commands) > bbtp.MAX_BATCH_SIZE:
+        return receiver.handle_error(sender, bbtp.STATUS_BAD_REQUEST)
+    
+    responses = []
+
+    for command in commands:
+        method, args = bbtp.parse_command(command)
+
+        if method == "BATCH":
+            responses.append(receiver.handle_error(sender, bbtp.STATUS_BAD_REQUEST))
+        else:
+            responses.append(dispatch(sender, version, method, args, "", receiver, token, binary))
+    
+    return receiver.respond("BATCH", bbtp.STATUS_OK, responses)
+
+register_method("REGISTER", BitboxingReceiver.handle_register, [1], auth=False)
+register_method("LOGIN", BitboxingReceiver.handle_login, [1])
+register_method("FIND", BitboxingReceiver.handle_find, [1])
+register_method("HINT", BitboxingReceiver.handle_hint, [1], cache_arg=0)
+register_method("SOLVE", BitboxingReceiver.handle_solve, [2])
+register_method("SCORE", BitboxingReceiver.handle_score, [1])
+register_method("LEADERBOARD", BitboxingReceiver.handle_leaderboard, [0, 1])
+register_method("CACHE_LEADERBOARD", BitboxingReceiver.handle_cache_leaderboard, [1, 2])
+register_method("RANK", BitboxingReceiver.handle_rank, [1])
+register_method("LEADERBOARD_AROUND", BitboxingReceiver.handle_leaderboard_around, [1, 2])
+register_method("BATCH", handle_batch, [0], auth=False, raw=True)
+
+class IdleConnections:
+    """
+    Kept-alive client connections waiting for their next request, watched by
+    a single thread with a selector so that they don't hold up a worker. A
+    connection goes back on the worker queue as soon as it has something to
+    read, and is closed once it has sat idle for IDLE_TIMEOUT seconds.
+    """
+
+    def __init__(self, connections, timeout=IDLE_TIMEOUT):
+        """
+        Constructor.
 
-def serve(receiver):
+        @param {Queue} connections Worker queue of (socket, MessageReader) to hand connections back to
+        @param {float} timeout     Seconds a connection may sit idle before it's closed
+        """
+
+        self._connections = connections
+        self._timeout = timeout
+        self._selector = selectors.DefaultSelector()
+        self._lock = threading.Lock()
+        self._added = []
+        self._wake, self._waker = socket.socketpair()
+        self._wake.setblocking(False)
+        self._selector.register(self._wake, selectors.EVENT_READ)
+
+    def add(self, cs, reader):
+        """
+        Parks a connection until its client sends another request. Safe to
+        call from any thread.
+
+        @param {Socket}        cs     Client socket
+        @param {MessageReader} reader Reader for the socket, with nothing buffered
+        """
+
+        with self._lock:
+            self._added.append((cs, reader))
+
+        self._waker.send(b"\0")
+
+    def watch(self):
+        """
+        Watcher thread loop.
+        """
+
+        while True:
+            deadlines = [x.data[1] for x in self._selector.get_map().values() if x.data is not None]
+            timeout = max(0, min(deadlines) - time.monotonic()) if len(deadlines) > 0 else None
+
+            for key, mask in self._selector.select(timeout):
+                if key.fileobj is self._wake:
+                    self._register()
+                else:
+                    self._selector.unregister(key.fileobj)
+                    self._connections.put((key.fileobj, key.data[0]))
+
+            now = time.monotonic()
+
+            for key in list(self._selector.get_map().values()):
+                if key.data is not None and key.data[1] <= now:
+                    self._selector.unregister(key.fileobj)
+                    key.fileobj.close()
+
+    def _register(self):
+        """
+        Starts watching connections parked since the last call.
+        """
+
+        try:
+            self._wake.recv(bbtp.BUFFER_SIZE)
+        except BlockingIOError:
+            pass
+
+        with self._lock:
+            added = self._added
+            self._added = []
+
+        deadline = time.monotonic() + self._timeout
+
+        for cs, reader in added:
+            self._selector.register(cs, selectors.EVENT_READ, (reader, deadline))
+
+def handle_message(request, receiver):
+    """
+    Responds to a client request of any BBTP version.
+
+    @param  {str}               request  Text BBTP request, or bytes if binary
+    @param  {BitboxingReceiver} receiver Database
+    @return {str}                        BBTP response, or bytes if binary
+    """
+
+    if isinstance(request, bytes):
+        return handle_binary_request(request, receiver)
+    else:
+        return handle_request(request, receiver)
+
+def open_connection(cs):
+    """
+    Prepares an accepted client socket.
+
+    @param  {Socket}        cs Client socket
+    @return {MessageReader}    Reader for the socket
+    """
+
+    cs.settimeout(IDLE_TIMEOUT)
+    cs.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    return bbtp.MessageReader(cs)
+
+def respond_available(cs, reader, receiver):
+    """
+    Responds to a request from a client connection, and to any further
+    requests the client has already pipelined behind it.
+
+    @param  {Socket}            cs       Client socket
+    @param  {MessageReader}     reader   Reader for the socket
+    @param  {BitboxingReceiver} receiver Database
+    @return {bool}                       True if the connection should be kept alive for more requests
+    """
+
+    while True:
+        request, framed = reader.read()
+        if len(request) == 0:
+            return False
+        
+        bbtp.send_msg(cs, handle_message(request, receiver), framed)
+        
+        if not framed:
+            return False
+
+        if not reader.pending():
+            return True
+
+def respond(cs, receiver):
+    """
+    Responds to a single request from a client connection, then closes the
+    connection.
+
+    @param {Socket}            cs       Client socket
+    @param {BitboxingReceiver} receiver Database
+    """
+
+    reader = open_connection(cs)
+
+    try:
+        request, framed = reader.read()
+        if len(request) > 0:
+            bbtp.send_msg(cs, handle_message(request, receiver), framed)
+    except socket.timeout:
+        pass
+    finally:
+        cs.close()
+
+def work(connections, receiver, idle):
     """
-    Launches the server.
+    Worker thread loop. Takes connections off the queue, either newly accepted
+    or with a request waiting, and responds to what has arrived. A framed
+    connection is then parked until its next request, rather than holding the
+    worker while the client is idle.
+
+    @param {Queue}             connections (socket, MessageReader) tuples, reader None if newly accepted
+    @param {BitboxingReceiver} receiver    Database
+    @param {IdleConnections}   idle        Where kept-alive connections wait between requests
+    """
+
+    while True:
+        cs, reader = connections.get()
+        keep_alive = False
+        
+        try:
+            if reader is None:
+                reader = open_connection(cs)
+            keep_alive = respond_available(cs, reader, receiver)
+        except socket.timeout:
+            pass
+        except Exception as ex:
+            print(f"Error: '{repr(ex)}'!")
+        finally:
+            if keep_alive:
+                idle.add(cs, reader)
+            else:
+                cs.close()
+            connections.task_done()
+
+def serve(receiver, port=PORT):
+    """
+    Launches the server. Connections are closed after one request, since a
+    kept-alive connection would hold up every other client.
 
     @param {BitboxingReceiver} receiver
+    @param {int}               port     Port to listen on
     """
 
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     
-    s.bind(("", PORT))
+    s.bind(("", port))
+    s.listen(100)
+    
+    print(f"Server is listening to port {port}...")
+    
+    try:
+        while True:
+            cs, address = s.accept()
+            respond(cs, receiver)
+    except Exception as ex:
+        print(f"Error: '{repr(ex)}'!")
+        print("Server going offline...")
+
+def serve_pool(receiver, workers=WORKERS, queue_size=QUEUE_SIZE, port=PORT):
+    """
+    Launches the server with a pool of worker threads, so that a slow client or
+    a slow database call only holds up one worker. Accepted connections wait in
+    a bounded queue; once it is full, the accept loop blocks until a worker
+    frees up. A kept-alive connection only holds a worker while a request is
+    being handled; in between, it's watched by IdleConnections and queued
+    again when the next request arrives.
+
+    @param {BitboxingReceiver} receiver
+    @param {int}               workers    Number of worker threads
+    @param {int}               queue_size Max number of accepted connections waiting for a worker
+    @param {int}               port       Port to listen on
+    """
+
+    connections = queue.Queue(queue_size)
+    idle = IdleConnections(connections)
+    
+    threading.Thread(target=idle.watch, daemon=True).start()
+    for i in range(workers):
+        threading.Thread(target=work, args=(connections, receiver, idle), daemon=True).start()
+
+    s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    
+    s.bind(("", port))
     s.listen(100)
     
-    print(f"Server is listening to port {PORT}...")
+    print(f"Server is listening to port {port} with {workers} workers...")
     
     try:
         while True:
             cs, address = s.accept()
-            
-            request = bbtp.receive_msg(cs)
-            response = handle_request(request, receiver)
-            
-            bbtp.send_msg(cs, response)
+            connections.put((cs, None))
     except Exception as ex:
         print(f"Error: '{repr(ex)}'!")
         print("Server going offline...")
 
 if __name__ == "__main__":
-    version = "0.1"
+    version = bbtp_binary.VERSION
     path = "bitboxing.db"
     receiver = BitboxingReceiver(version, path)
     
-    serve(receiver)
\ No newline at end of file
+    if WORKERS > 0:
+        serve_pool(receiver)
+    else:
+        serve(receiver)
\ No newline at end of file
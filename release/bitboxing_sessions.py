@@ -0,0 +1,87 @@
+import secrets
+import threading
+import time
+
+SESSION_TIMEOUT = 30 * 60
+
+class SessionTable:
+    """
+    Logged-in players, keyed by session token. A session expires once it
+    goes unused for SESSION_TIMEOUT seconds; every request that uses it
+    pushes the expiry back. Safe to share between threads.
+    """
+
+    def __init__(self, timeout=SESSION_TIMEOUT, clock=time.monotonic):
+        """
+        Constructor.
+
+        @param {float}    timeout Seconds a session lasts without being used
+        @param {function} clock   Gets the current time in seconds (e.g. a fake clock in tests)
+        """
+
+        self._timeout = timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._last_sweep = clock()
+
+    def create(self, player):
+        """
+        Starts a new session for a player.
+
+        @param  {str} player Username
+        @return {str}        Session token
+        """
+
+        token = secrets.token_hex(16)
+        now = self._clock()
+
+        with self._lock:
+            if now - self._last_sweep > self._timeout:
+                self._sweep(now)
+            self._sessions[token] = [player, now + self._timeout]
+
+        return token
+
+    def check(self, player, token):
+        """
+        Checks if a token belongs to a player's unexpired session, and if so
+        extends the session.
+
+        @param  {str}  player Username
+        @param  {str}  token  Session token
+        @return {bool}        True if the session is valid
+        """
+
+        now = self._clock()
+
+        with self._lock:
+            session = self._sessions.get(token)
+
+            if session is None or session[0] != player:
+                return False
+            elif session[1] < now:
+                del self._sessions[token]
+                return False
+
+            session[1] = now + self._timeout
+            return True
+
+    def __len__(self):
+        """
+        Gets the number of sessions, including expired ones not yet removed.
+
+        @return {int}
+        """
+
+        return len(self._sessions)
+
+    def _sweep(self, now):
+        """
+        Removes every expired session.
+
+        @param {float} now Current time
+        """
+
+        self._sessions = {k: v for k, v in self._sessions.items() if v[1] >= now}
+        self._last_sweep = now
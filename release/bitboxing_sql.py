@@ -1,41 +1,105 @@
 import bitboxing_data as bbdata
-from functools import cmp_to_key
+import contextlib
 import sqlite3 as sqlite
+import sys
+import threading
+import types
 
 DEBUG = False
+TRACE = None
+JOURNAL_MODE = "WAL"
+SYNCHRONOUS = "FULL"
+READER_SYNCHRONOUS = "NORMAL"
+BUSY_TIMEOUT = 5.0
+CACHE_SIZE = -16384
 
 class BitboxingSql:
     """
     Executes SQLite commands for BBTP requests.
+    Each thread keeps one long-lived connection, reused for all of its queries.
+    Writes run inside "with connection" so a failed write is rolled back
+    instead of leaving a transaction open on the shared connection.
+
+    setup() puts the database in JOURNAL_MODE. In WAL mode readers see the
+    last commit and never block the writer, nor does the writer block them,
+    so a long leaderboard scan can't hold up a SOLVE. A read-only executor's
+    connections refuse writes, so only the one writer ever takes the write
+    lock.
     """
 
-    def __init__(self, path):
+    def __init__(self, path, read_only=False, shared=False):
         """
         Constructor
         
-        @param {str} path Database file path
+        @param {str}  path      Database file path
+        @param {bool} read_only True to open connections that refuse writes
+        @param {bool} shared    True to share one connection between all threads,
+                                which must then take turns using it (see BitboxingWriter)
         """
 
         self._path = path
+        self._read_only = read_only
+        self._shared = shared
+        self._local = types.SimpleNamespace() if shared else threading.local()
     
     def connect(self):
         """
-        Opens a SQLite connection.
+        Opens a SQLite connection. A connection waits up to BUSY_TIMEOUT
+        seconds for a lock instead of failing with "database is locked".
+        Writable connections sync every commit to disk (SYNCHRONOUS), so a
+        write that has been answered survives a power loss. Read-only ones
+        never commit anything, so they use READER_SYNCHRONOUS. If TRACE is
+        set, it's called with every statement the connection runs afterwards
+        (e.g. to count queries in tests).
         
         @return {Connection}
         """
 
-        return sqlite.connect(self._path)
+        connection = sqlite.connect(self._path, timeout=BUSY_TIMEOUT, check_same_thread=not self._shared)
+        connection.execute(f"PRAGMA synchronous={READER_SYNCHRONOUS if self._read_only else SYNCHRONOUS}")
+        connection.execute(f"PRAGMA cache_size={CACHE_SIZE}")
+        if self._read_only:
+            connection.execute("PRAGMA query_only=ON")
+        if TRACE is not None:
+            connection.set_trace_callback(TRACE)
+
+        return connection
+    
+    def connection(self):
+        """
+        Gets the calling thread's connection (or the shared one), opening it on
+        first use.
+
+        @return {Connection}
+        """
+
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self.connect()
+            self._local.connection = connection
+        return connection
+    
+    def close(self):
+        """
+        Closes the calling thread's connection (or the shared one), if open.
+        """
+
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
     
     def setup(self):
         """
-        Sets up the database by creating tables if they do not exist.
+        Sets up the database by creating tables if they do not exist, and
+        sets the journal mode.
         """
 
         print("Setting up database...")
 
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={JOURNAL_MODE}")
         
         good = True
         for x in ["Users", "Puzzles", "Finds"]:
@@ -46,12 +110,22 @@ class BitboxingSql:
                 good = False
                 break
         
+        cursor.execute("SELECT * FROM sqlite_master WHERE type='table' AND name='PlayerScores'")
+        has_scores = cursor.fetchone() is not None
+        
+        cursor.close()
+        
         if not good or DEBUG:
             print("Creating database...")
             self.create()
         
-        connection.close()
-        
+        self.create_indexes()
+        self.create_scores()
+
+        if not good or DEBUG or not has_scores:
+            print("Building player scores...")
+            self.rebuild_scores()
+    
     def create(self):
         """
         Creates the database tables. Drops tables if they already exist.
@@ -74,93 +148,179 @@ class BitboxingSql:
         - attempts (int)
         """
         
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
         
-        cursor.execute("DROP TABLE IF EXISTS Users")
-        cursor.execute("CREATE TABLE Users(username TEXT NOT NULL, password TEXT NOT NULL, PRIMARY KEY(username))")
-        
-        cursor.execute("DROP TABLE IF EXISTS Puzzles")
-        cursor.execute("CREATE TABLE Puzzles(id TEXT NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL, hint TEXT NOT NULL, PRIMARY KEY(id))")
-        
-        for cache, question, answer, hint in BitboxingSql._get_puzzle_data():
-            cursor.execute("INSERT INTO PUZZLES VALUES(?, ?, ?, ?)", (cache, question, answer, hint,))
-        
-        cursor.execute("DROP TABLE IF EXISTS Finds")
-        cursor.execute("CREATE TABLE Finds(player TEXT NOT NULL, cache TEXT NOT NULL, time_found INTEGER, time_solved INTEGER, attempts INTEGER, PRIMARY KEY(player, cache), FOREIGN KEY(player) REFERENCES Users(username), FOREIGN KEY(cache) REFERENCES Puzzles(id))")
-        
-        connection.commit()
-        connection.close()
+        with connection:
+            cursor.execute("DROP TABLE IF EXISTS Users")
+            cursor.execute("CREATE TABLE Users(username TEXT NOT NULL, password TEXT NOT NULL, PRIMARY KEY(username))")
+            
+            cursor.execute("DROP TABLE IF EXISTS Puzzles")
+            cursor.execute("CREATE TABLE Puzzles(id TEXT NOT NULL, question TEXT NOT NULL, answer TEXT NOT NULL, hint TEXT NOT NULL, PRIMARY KEY(id))")
+            
+            for cache, question, answer, hint in BitboxingSql._get_puzzle_data():
+                cursor.execute("INSERT INTO PUZZLES VALUES(?, ?, ?, ?)", (cache, question, answer, hint,))
+            
+            cursor.execute("DROP TABLE IF EXISTS Finds")
+            cursor.execute("CREATE TABLE Finds(player TEXT NOT NULL, cache TEXT NOT NULL, time_found INTEGER, time_solved INTEGER, attempts INTEGER, PRIMARY KEY(player, cache), FOREIGN KEY(player) REFERENCES Users(username), FOREIGN KEY(cache) REFERENCES Puzzles(id))")
+
+            cursor.execute("DROP TABLE IF EXISTS PlayerScores")
+    
+    def create_indexes(self):
+        """
+        Creates the indexes that queries rely on, if they do not exist.
+
+        FindsByPlayer (player, time_solved)
+        - Covers counting a player's finds and solves
+
+        FindsByCacheRank (cache, time_solved IS NULL, time_solved - time_found, attempts, time_found, player, time_solved)
+        - Covers a cache leaderboard, already in FindStatus.sort_key order
+        """
+
+        connection = self.connection()
+        cursor = connection.cursor()
+
+        with connection:
+            cursor.execute("CREATE INDEX IF NOT EXISTS FindsByPlayer ON Finds(player, time_solved)")
+            cursor.execute("CREATE INDEX IF NOT EXISTS FindsByCacheRank ON Finds(cache, time_solved IS NULL, time_solved - time_found, attempts, time_found, player, time_solved)")
+    
+    def create_scores(self):
+        """
+        Creates the PlayerScores table, its index, and the triggers that keep it
+        up to date, if they do not exist. Scores change in the same transaction
+        as the Users or Finds row that changes them.
+
+        PlayerScores
+        - player (str) pk, fk Users(username)
+        - finds (int)
+        - solves (int)
+
+        PlayerScoresByRank (solves DESC, finds DESC, player)
+        - Serves the leaderboard in order
+
+        ScoreOnRegister: new user starts at 0 finds, 0 solves
+        ScoreOnFind:     new Finds row adds a find (and a solve if already solved)
+        ScoreOnSolve:    time_solved going from NULL to a time adds a solve
+        """
+
+        connection = self.connection()
+        cursor = connection.cursor()
+
+        with connection:
+            cursor.execute("CREATE TABLE IF NOT EXISTS PlayerScores(player TEXT NOT NULL, finds INTEGER NOT NULL DEFAULT 0, solves INTEGER NOT NULL DEFAULT 0, PRIMARY KEY(player), FOREIGN KEY(player) REFERENCES Users(username))")
+            cursor.execute("CREATE INDEX IF NOT EXISTS PlayerScoresByRank ON PlayerScores(solves DESC, finds DESC, player)")
+            cursor.execute(
+                "CREATE TRIGGER IF NOT EXISTS ScoreOnRegister AFTER INSERT ON Users BEGIN "
+                "INSERT OR IGNORE INTO PlayerScores(player, finds, solves) VALUES(new.username, 0, 0); "
+                "END"
+            )
+            cursor.execute(
+                "CREATE TRIGGER IF NOT EXISTS ScoreOnFind AFTER INSERT ON Finds BEGIN "
+                "INSERT INTO PlayerScores(player, finds, solves) VALUES(new.player, 1, new.time_solved IS NOT NULL) "
+                "ON CONFLICT(player) DO UPDATE SET finds=finds+1, solves=solves+excluded.solves; "
+                "END"
+            )
+            cursor.execute(
+                "CREATE TRIGGER IF NOT EXISTS ScoreOnSolve AFTER UPDATE OF time_solved ON Finds "
+                "WHEN old.time_solved IS NULL AND new.time_solved IS NOT NULL BEGIN "
+                "UPDATE PlayerScores SET solves=solves+1 WHERE player=new.player; "
+                "END"
+            )
+    
+    def rebuild_scores(self):
+        """
+        Recounts every player's score from Users and Finds. Needed once for
+        databases created before PlayerScores existed.
+        """
+
+        connection = self.connection()
+        cursor = connection.cursor()
+
+        with connection:
+            cursor.execute("DELETE FROM PlayerScores")
+            cursor.execute(
+                "INSERT INTO PlayerScores(player, finds, solves) "
+                "SELECT Users.username, COUNT(Finds.player), COUNT(Finds.time_solved) "
+                "FROM Users LEFT JOIN Finds ON Finds.player=Users.username "
+                "GROUP BY Users.username"
+            )
     
-    def register(self, username, password):
+    def register(self, username, password, commit=True):
         """
         Registers a new user with the given username and password.
 
-        @param {str} username
-        @param {str} password
+        @param {str}  username
+        @param {str}  password
+        @param {bool} commit   False to leave the change in the open transaction
+                               for the caller to commit (see BitboxingWriter)
         """
 
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
         
-        cursor.execute("INSERT INTO Users(username, password) VALUES(?, ?)", (username, password))
-        
-        connection.commit()
-        connection.close()
+        with connection if commit else contextlib.nullcontext():
+            cursor.execute("INSERT INTO Users(username, password) VALUES(?, ?)", (username, password))
     
-    def find(self, player, cache, when):
+    def find(self, player, cache, when, commit=True):
         """
-        Records that a player has found a cache and sets the time found.
+        Records that a player has found a cache and sets the time found, unless
+        they already found it.
 
-        @param {str} player Username
-        @param {str} cache  Puzzle ID
-        @param {int} when   Time in Unix nanoseconds
+        @param  {str}  player Username
+        @param  {str}  cache  Puzzle ID
+        @param  {int}  when   Time in Unix nanoseconds
+        @param  {bool} commit False to leave the change in the open transaction
+                              for the caller to commit (see BitboxingWriter)
+        @return {bool}        True if this is the player's first find of the cache
         """
 
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
         
-        cursor.execute(
-            "INSERT INTO Finds(player, cache, time_found, time_solved, attempts) VALUES(?, ?, ?, ?, ?)",
-            (player, cache, when, None, 0)
-        )
-
-        connection.commit()
-        connection.close()
+        with connection if commit else contextlib.nullcontext():
+            cursor.execute(
+                "INSERT INTO Finds(player, cache, time_found, time_solved, attempts) VALUES(?, ?, ?, ?, ?) "
+                "ON CONFLICT(player, cache) DO NOTHING",
+                (player, cache, when, None, 0)
+            )
+            
+            return cursor.rowcount == 1
     
-    def try_to_solve(self, player, cache, guess, when):
+    def try_to_solve(self, player, cache, guess, when, answer=None, commit=True):
         """
-        Allows a player to attempt to solve a puzzle. Increments the player's
-        number of attempts. If the guess is correct, sets the time the player
-        solved the puzzle.
+        Allows a player to attempt to solve a puzzle they have found and not
+        yet solved. Increments the player's number of attempts. If the guess is
+        correct, sets the time the player solved the puzzle. Both happen in one
+        UPDATE that only matches an unsolved find.
 
-        @param  {str}  player Name
-        @param  {str}  guess  Not case sensitive
-        @param  {int}  when   Time in Unix nanoseconds
-        @return {bool}        True if guess was correct
+        @param  {str}        player Name
+        @param  {str}        guess  Not case sensitive
+        @param  {int}        when   Time in Unix nanoseconds
+        @param  {str}        answer Puzzle answer, if already known (default looks it up)
+        @param  {bool}       commit False to leave the change in the open transaction
+                                    for the caller to commit (see BitboxingWriter)
+        @return {FindStatus}        Player's find status after the attempt,
+                                    None if they haven't found the cache or already solved it
         """
         
-        puzzle = self.puzzle(cache)
+        if answer is None:
+            answer = self.puzzle(cache).answer()
 
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
         
-        cursor.execute(
-            "UPDATE Finds SET attempts=attempts+1 WHERE player=? AND cache=?",
-            (player, cache)
-        )
-        is_correct = puzzle.answer().casefold() == guess.casefold()
+        is_correct = answer.casefold() == guess.casefold()
 
-        if is_correct:
+        with connection if commit else contextlib.nullcontext():
             cursor.execute(
-                "UPDATE Finds SET time_solved=? WHERE player=? AND cache=?",
-                (when, player, cache)
+                "UPDATE Finds SET attempts=attempts+1, time_solved=? "
+                "WHERE player=? AND cache=? AND time_solved IS NULL "
+                "RETURNING time_found, time_solved, attempts",
+                (when if is_correct else None, player, cache)
             )
+            found = cursor.fetchone()
         
-        connection.commit()
-        connection.close()
-        
-        return is_correct
+        return BitboxingSql._make_find_status(found) if found else None
     
     def is_valid_user(self, username):
         """
@@ -170,13 +330,11 @@ class BitboxingSql:
         @return {bool} True if user with username exists.
         """
 
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
         
         cursor.execute("SELECT * FROM Users WHERE username=?", (username,))
         found = cursor.fetchone()
-
-        connection.close()
         
         return found is not None
     
@@ -189,14 +347,12 @@ class BitboxingSql:
         @return {bool} True if user exists and password matches the database record.
         """
 
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
         
         cursor.execute("SELECT password FROM Users WHERE username=?", (username,))
         found = cursor.fetchone()
         
-        connection.close()
-        
         return found is not None and found[0] == password
     
     def is_valid_cache(self, cache):
@@ -207,14 +363,12 @@ class BitboxingSql:
         @return {bool}      True if cache exists
         """
 
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
 
         cursor.execute("SELECT * FROM Puzzles WHERE id=?", (cache,))
         found = cursor.fetchone()
 
-        connection.close()
-
         return found is not None
 
     
@@ -225,16 +379,30 @@ class BitboxingSql:
         @return {list of str} Player names
         """
 
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
 
         cursor.execute("SELECT username FROM Users")
         found = cursor.fetchall()
 
-        connection.close()
-
         return [x[0] for x in found] if found else []
     
+    def finds(self):
+        """
+        Gets every row of the Finds table, for bulk analysis
+        (see bitboxing_stats).
+
+        @return {list of tuple (str, str, int, int, int)} (player, cache, time_found, time_solved, attempts),
+                                                         time_solved None if unsolved
+        """
+
+        connection = self.connection()
+        cursor = connection.cursor()
+
+        cursor.execute("SELECT player, cache, time_found, time_solved, attempts FROM Finds")
+
+        return cursor.fetchall()
+    
     def puzzle(self, cache):
         """
         Gets a puzzle with a given puzzle ID.
@@ -242,16 +410,57 @@ class BitboxingSql:
         @return {Puzzle} Puzzle with matching ID, None if not found
         """
 
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
 
         cursor.execute("SELECT question, answer, hint FROM Puzzles WHERE id=?", (cache,))
         found = cursor.fetchone()
 
-        connection.close()
-
         return bbdata.Puzzle(found[0], found[1], found[2]) if found else None
     
+    def lookup(self, player, cache):
+        """
+        Checks if a user is registered and gets their find status for a cache,
+        in one query.
+
+        @param  {str}                      player Username
+        @param  {str}                      cache  Puzzle ID
+        @return {tuple (bool, FindStatus)}        (True if user exists, find status or empty)
+        """
+
+        connection = self.connection()
+        cursor = connection.cursor()
+
+        cursor.execute(
+            "SELECT Finds.time_found, Finds.time_solved, Finds.attempts FROM Users "
+            "LEFT JOIN Finds ON Finds.player=Users.username AND Finds.cache=? "
+            "WHERE Users.username=?",
+            (cache, player)
+        )
+        found = cursor.fetchone()
+
+        if found is None:
+            return (False, bbdata.FindStatus.empty())
+        elif found[0] is None:
+            return (True, bbdata.FindStatus.empty())
+        else:
+            return (True, BitboxingSql._make_find_status(found))
+    
+    def puzzles(self):
+        """
+        Gets every puzzle.
+
+        @return {dict} Puzzle ID (str): Puzzle
+        """
+
+        connection = self.connection()
+        cursor = connection.cursor()
+
+        cursor.execute("SELECT id, question, answer, hint FROM Puzzles")
+        found = cursor.fetchall()
+
+        return {f[0]: bbdata.Puzzle(f[1], f[2], f[3]) for f in found}
+    
     def find_status(self, player, cache):
         """
         Gets statistics for whether a player has found and solved this cache.
@@ -261,14 +470,12 @@ class BitboxingSql:
         @return {FindStatus} Player find stats for the cache, empty if player hasn't found it
         """
         
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
 
         cursor.execute("SELECT time_found, time_solved, attempts FROM Finds WHERE player=? AND cache=?", (player, cache,))
         found = cursor.fetchone()
 
-        connection.close()
-
         return BitboxingSql._make_find_status(found) if found else bbdata.FindStatus.empty()
 
     def history(self, player):
@@ -278,7 +485,7 @@ class BitboxingSql:
         @return {dict of str: FindStatus}
         """
         
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
 
         cursor.execute("SELECT cache, time_found, time_solved, attempts FROM Finds WHERE player=?", (player,))
@@ -289,8 +496,6 @@ class BitboxingSql:
         for f in found:
             d[f[0]] = BitboxingSql._make_find_status(f[1:])
         
-        connection.close()
-        
         return d
 
     def score(self, player):
@@ -301,51 +506,57 @@ class BitboxingSql:
         @return {PlayerScore}
         """
 
-        h = self.history(player)
-        finds = 0
-        solves = 0
-        
-        for v in h.values():
-            finds += 1
-            if v.solved():
-                solves += 1
-        
-        return bbdata.PlayerScore(player, finds, solves)
+        connection = self.connection()
+        cursor = connection.cursor()
+
+        cursor.execute("SELECT finds, solves FROM PlayerScores WHERE player=?", (player,))
+        found = cursor.fetchone()
+
+        return bbdata.PlayerScore(player, found[0], found[1]) if found else bbdata.PlayerScore(player)
 
     def leaderboard(self, count = 0):
         """
-        Gets the best-performing players for the game overall.
+        Gets the best-performing players for the game overall, ranked as in
+        compare_scores with ties broken by name. The top players are read in
+        order from the PlayerScoresByRank index.
 
         @param  {int} count           Max number of players to fetch
         @return {list of PlayerScore} Up to count number of objects
         """
 
-        leaderboard = [self.score(p) for p in self.players()]
-        leaderboard.sort(key=cmp_to_key(BitboxingSql.compare_scores))
-        
-        return leaderboard if count <= 0 else leaderboard[:count]
+        connection = self.connection()
+        cursor = connection.cursor()
+
+        cursor.execute(
+            "SELECT player, finds, solves FROM PlayerScores ORDER BY solves DESC, finds DESC, player LIMIT ?",
+            (count if count > 0 else -1,)
+        )
+        found = cursor.fetchall()
+
+        return [bbdata.PlayerScore(f[0], f[1], f[2]) for f in found]
     
     def cache_leaderboard(self, cache, count = 0):
         """
-        Gets the best-performing players for a cache.
+        Gets the best-performing players for a cache, ranked as in
+        FindStatus.sort_key with ties broken by name. Only the top rows of the
+        FindsByCacheRank index are read.
 
         @param  {str} cache    Puzzle ID
         @param  {int} count    Max number of players to fetch
         @return {list of dict} 'player': player, 'status': FindStatus
         """
 
-        connection = self.connect()
+        connection = self.connection()
         cursor = connection.cursor()
 
-        cursor.execute("SELECT player, time_found, time_solved, attempts FROM Finds WHERE cache=?", (cache,))
+        cursor.execute(
+            "SELECT player, time_found, time_solved, attempts FROM Finds WHERE cache=? "
+            "ORDER BY time_solved IS NULL, time_solved - time_found, attempts, time_found, player LIMIT ?",
+            (cache, count if count > 0 else -1)
+        )
         found = cursor.fetchall()
 
-        connection.close()
-
-        leaderboard = [{'player': f[0], 'status': BitboxingSql._make_find_status(f[1:])} for f in found]
-        leaderboard.sort(key=lambda x: x['status'])
-        
-        return leaderboard if count <= 0 else leaderboard[:count]
+        return [{'player': f[0], 'status': BitboxingSql._make_find_status(f[1:])} for f in found]
 
     @staticmethod
     def compare_scores(a, b):
@@ -431,4 +642,13 @@ class BitboxingSql:
         @param  {tuple (str, str, str)} (time_found, time_solved, attempts)
         @return {FindStatus}
         """
-        return bbdata.FindStatus(int(t[0]) if t[0] else None, int(t[1]) if t[1] else None, int(t[2]) if t[2] else 0)
\ No newline at end of file
+        return bbdata.FindStatus(int(t[0]) if t[0] else None, int(t[1]) if t[1] else None, int(t[2]) if t[2] else 0)
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "bitboxing.db"
+    sql = BitboxingSql(path)
+    
+    sql.setup()
+    sql.rebuild_scores()
+    
+    print(f"Rebuilt player scores in '{path}'.")
\ No newline at end of file
@@ -0,0 +1,262 @@
+from bitboxing_data import FindStatus, PlayerScore
+from bitboxing_sql import BitboxingSql
+import numpy as np
+import sys
+
+PERCENTILES = (50, 90, 99)
+
+class FindColumns:
+    """
+    Every find in the database held as NumPy columns, one entry per find, for
+    post-event reports. Leaderboards are ranked with lexsort and argpartition
+    instead of Python comparisons, in the same order as the server's:
+    players as in ScoreRanking, finds for a cache as in FindStatus.sort_key,
+    ties broken by name. Finds are ranked once, grouped by cache, so each
+    cache's leaderboard and report stats are read from its own slice.
+    """
+
+    def __init__(self, players, caches, rows):
+        """
+        Constructor.
+
+        @param {list of str}   players Every registered player
+        @param {list of str}   caches  Every puzzle ID
+        @param {list of tuple} rows    (player, cache, time_found, time_solved, attempts) for each find,
+                                       time_solved None if unsolved (see BitboxingSql.finds)
+        """
+
+        self._players = sorted(players)
+        self._caches = sorted(caches)
+        self._player_ids = {x: i for i, x in enumerate(self._players)}
+        self._cache_ids = {x: i for i, x in enumerate(self._caches)}
+
+        n = len(rows)
+        self._player = np.fromiter((self._player_ids[x[0]] for x in rows), np.int64, n)
+        self._cache = np.fromiter((self._cache_ids[x[1]] for x in rows), np.int64, n)
+        self._time_found = np.fromiter((x[2] for x in rows), np.int64, n)
+        self._solved = np.fromiter((x[3] is not None for x in rows), np.bool_, n)
+        self._time_solved = np.fromiter((x[3] if x[3] is not None else 0 for x in rows), np.int64, n)
+        self._attempts = np.fromiter((x[4] for x in rows), np.int64, n)
+        self._how_long = np.where(self._solved, self._time_solved - self._time_found, 0)
+
+        self._finds = np.bincount(self._player, minlength=len(self._players))
+        self._solves = np.bincount(self._player[self._solved], minlength=len(self._players))
+
+        # Rows grouped by cache and ranked within each, so a cache's
+        # leaderboard is the slice from its bound to the next cache's
+        self._ranked = np.lexsort((
+            self._player,
+            self._time_found,
+            self._attempts,
+            self._how_long,
+            ~self._solved,
+            self._cache,
+        ))
+        ids, starts = np.unique(self._cache[self._ranked], return_index=True)
+        bounds = np.full(len(self._caches) + 1, n, np.int64)
+        bounds[ids] = starts
+        self._bounds = np.minimum.accumulate(bounds[::-1])[::-1]
+
+    @staticmethod
+    def load(sql):
+        """
+        Loads every player, puzzle and find from the database.
+
+        @param  {BitboxingSql} sql
+        @return {FindColumns}
+        """
+
+        return FindColumns(sql.players(), sql.puzzles().keys(), sql.finds())
+
+    def caches(self):
+        """
+        Gets every puzzle ID.
+
+        @return {list of str}
+        """
+
+        return list(self._caches)
+
+    def score(self, player):
+        """
+        Gets a player's score.
+
+        @param  {str}         player Username
+        @return {PlayerScore}        0 finds and 0 solves if not registered
+        """
+
+        i = self._player_ids.get(player)
+
+        if i is None:
+            return PlayerScore(player, 0, 0)
+        else:
+            return PlayerScore(player, int(self._finds[i]), int(self._solves[i]))
+
+    def leaderboard(self, count=0):
+        """
+        Gets the best-performing players for the game overall.
+
+        @param  {int}                 count Max number of players to fetch (all if count <= 0)
+        @return {list of PlayerScore}       Up to count number of objects, best first
+        """
+
+        n = len(self._players)
+
+        if 0 < count < n:
+            # Player IDs follow name order, so one integer key covers every tie-break.
+            key = (-self._solves * (int(self._finds.max()) + 1) - self._finds) * n + np.arange(n)
+            top = np.argpartition(key, count - 1)[:count]
+            order = top[np.argsort(key[top])]
+        else:
+            order = np.lexsort((np.arange(n), -self._finds, -self._solves))
+
+        return [PlayerScore(self._players[i], int(self._finds[i]), int(self._solves[i])) for i in order]
+
+    def cache_leaderboard(self, cache, count=0):
+        """
+        Gets the best-performing players for a cache.
+
+        @param  {str}          cache Puzzle ID
+        @param  {int}          count Max number of players to fetch (all if count <= 0)
+        @return {list of dict}       'player': player, 'status': FindStatus, best first
+        """
+
+        rows = self._rows(cache)
+        rows = rows[:count] if count > 0 else rows
+
+        return [{'player': self._players[self._player[i]], 'status': self._status(i)} for i in rows]
+
+    def solve_times(self, cache, percentiles=PERCENTILES):
+        """
+        Gets percentiles of how long players took to solve a cache's puzzle.
+
+        @param  {str}          cache       Puzzle ID
+        @param  {list of int}  percentiles Percentiles to compute, 0 to 100
+        @return {dict of int: float}       Percentile to time in nanoseconds, empty if nobody solved it
+        """
+
+        rows = self._rows(cache)
+        how_long = self._how_long[rows[self._solved[rows]]]
+
+        if len(how_long) == 0:
+            return {}
+
+        return {p: float(x) for p, x in zip(percentiles, np.percentile(how_long, percentiles))}
+
+    def attempts(self, cache):
+        """
+        Gets how many attempts players have made at a cache's puzzle.
+
+        @param  {str}         cache Puzzle ID
+        @return {list of int}       Number of players at each attempt count (index 0 for no attempts)
+        """
+
+        return np.bincount(self._attempts[self._rows(cache)]).tolist()
+
+    def report(self, percentiles=PERCENTILES):
+        """
+        Gets statistics for every cache, computed for all caches at once.
+
+        @param  {list of int}       percentiles Solve time percentiles to compute, 0 to 100
+        @return {dict of str: dict} Puzzle ID to 'finds', 'solves', 'solve_times' (see solve_times)
+                                    and 'attempts' (see attempts)
+        """
+
+        finds = np.diff(self._bounds)
+        solves = np.bincount(self._cache[self._solved], minlength=len(self._caches))
+        solve_times = self._solve_times(solves, percentiles)
+        attempts, lengths = self._attempts_by_cache()
+
+        return {
+            cache: {
+                'finds': int(finds[i]),
+                'solves': int(solves[i]),
+                'solve_times': {p: float(x) for p, x in zip(percentiles, solve_times[i])} if solves[i] > 0 else {},
+                'attempts': attempts[i, :lengths[i]].tolist(),
+            }
+            for i, cache in enumerate(self._caches)
+        }
+
+    def _rows(self, cache):
+        """
+        Gets the finds of a cache, best first.
+
+        @param  {str}     cache Puzzle ID
+        @return {ndarray}       Row indexes, empty if the cache doesn't exist
+        """
+
+        i = self._cache_ids.get(cache)
+
+        if i is None:
+            return np.empty(0, np.int64)
+        else:
+            return self._ranked[self._bounds[i]:self._bounds[i + 1]]
+
+    def _solve_times(self, solves, percentiles):
+        """
+        Gets solve time percentiles for every cache, interpolated as
+        np.percentile does. A cache's solved finds come first in its slice of
+        the ranking, quickest first, so they're already in order.
+
+        @param  {ndarray}     solves      Number of solves of each cache
+        @param  {list of int} percentiles Percentiles to compute, 0 to 100
+        @return {ndarray}                 Caches by percentiles, in nanoseconds, 0 if nobody solved the cache
+        """
+
+        result = np.zeros((len(self._caches), len(percentiles)))
+        has = solves > 0
+        how_long = self._how_long[self._ranked].astype(np.float64)
+        starts = self._bounds[:-1][has, None]
+
+        position = (solves[has, None] - 1) * (np.asarray(percentiles, np.float64) / 100)
+        low = np.floor(position).astype(np.int64)
+        high = np.ceil(position).astype(np.int64)
+        below = how_long[starts + low]
+        above = how_long[starts + high]
+        result[has] = below + (above - below) * (position - low)
+
+        return result
+
+    def _attempts_by_cache(self):
+        """
+        Counts players at each attempt count for every cache.
+
+        @return {tuple (ndarray, ndarray)} (caches by attempt count, number of counts each cache's list runs to)
+        """
+
+        n = len(self._caches)
+        width = int(self._attempts.max()) + 1 if len(self._attempts) > 0 else 1
+        counts = np.bincount(self._cache * width + self._attempts, minlength=n * width).reshape(n, width)
+        lengths = np.zeros(n, np.int64)
+        np.maximum.at(lengths, self._cache, self._attempts + 1)
+
+        return (counts, lengths)
+
+    def _status(self, i):
+        """
+        Converts a row to a find status.
+
+        @param  {int}        i Row index
+        @return {FindStatus}
+        """
+
+        return FindStatus(
+            int(self._time_found[i]),
+            int(self._time_solved[i]) if self._solved[i] else None,
+            int(self._attempts[i])
+        )
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else "bitboxing.db"
+    columns = FindColumns.load(BitboxingSql(path, read_only=True))
+
+    print("Leaderboard")
+    for i, x in enumerate(columns.leaderboard(10)):
+        print(f"{i + 1:>4}. {x.player():<20}{x.solves():>6} solves{x.finds():>6} finds")
+
+    for cache, stats in columns.report().items():
+        print()
+        print(f"{cache}: {stats['finds']} finds, {stats['solves']} solves")
+        for p, t in stats['solve_times'].items():
+            print(f"    p{p:<3} solve time {t / 10 ** 9:10.1f} s")
+        print(f"    attempts {stats['attempts']}")
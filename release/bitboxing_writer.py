@@ -0,0 +1,151 @@
+from bitboxing_sql import BitboxingSql
+from concurrent.futures import Future
+import threading
+
+MAX_BATCH = 64
+
+class BitboxingWriter:
+    """
+    Makes every write for BBTP requests (REGISTER, FIND and SOLVE) through one
+    shared connection, the only one allowed to write, committing them in
+    groups. A writer queues its write; if no commit is in progress, it takes
+    every queued write, up to MAX_BATCH, and commits them in one transaction.
+    Otherwise it waits, and when the commit in progress finishes, one writer
+    whose write is still queued commits the next group. A lone write is
+    committed straight away by its own thread, with no handoff, while a burst
+    of players scanning the same cache shares one synced commit. Callers only
+    get a result once the commit that includes their write has finished, so
+    a result is never returned for a write that could still be rolled back.
+    """
+
+    def __init__(self, path, max_batch=MAX_BATCH):
+        """
+        Constructor.
+
+        @param {str} path      File path of SQLite database
+        @param {int} max_batch Most writes to commit together
+        """
+
+        self._sql = BitboxingSql(path, shared=True)
+        self._max_batch = max_batch
+        self._condition = threading.Condition()
+        self._committing = False
+        self._queue = []
+
+    def find(self, player, cache, when):
+        """
+        Records that a player has found a cache. See BitboxingSql.find.
+
+        @param  {str}  player Username
+        @param  {str}  cache  Puzzle ID
+        @param  {int}  when   Time in Unix nanoseconds
+        @return {bool}        True if this is the player's first find of the cache
+        """
+
+        return self._write(BitboxingSql.find, player, cache, when)
+
+    def register(self, username, password):
+        """
+        Registers a new user. See BitboxingSql.register.
+
+        @param {str} username
+        @param {str} password
+        """
+
+        self._write(BitboxingSql.register, username, password)
+
+    def try_to_solve(self, player, cache, guess, when, answer=None):
+        """
+        Records a player's attempt to solve a puzzle. See BitboxingSql.try_to_solve.
+
+        @param  {str}        player Name
+        @param  {str}        guess  Not case sensitive
+        @param  {int}        when   Time in Unix nanoseconds
+        @param  {str}        answer Puzzle answer, if already known (default looks it up)
+        @return {FindStatus}        Player's find status after the attempt,
+                                    None if they haven't found the cache or already solved it
+        """
+
+        return self._write(BitboxingSql.try_to_solve, player, cache, guess, when, answer)
+
+    def close(self):
+        """
+        Closes the shared connection once writes in progress have finished.
+        """
+
+        with self._condition:
+            while self._committing:
+                self._condition.wait()
+            self._sql.close()
+
+    def _write(self, write, *args):
+        """
+        Queues a write, then waits for it to be committed, committing the next
+        group itself if it's the first writer free to.
+
+        @param  {function} write BitboxingSql method taking commit=False
+        @param  {list}     *args Method arguments
+        @return {any}            The method's result
+        """
+
+        future = Future()
+
+        with self._condition:
+            self._queue.append((future, write, args))
+
+        while True:
+            with self._condition:
+                while self._committing and not future.done():
+                    self._condition.wait()
+
+                if future.done():
+                    return future.result()
+
+                self._committing = True
+                batch = self._queue[:self._max_batch]
+                del self._queue[:self._max_batch]
+
+            try:
+                self._commit(batch)
+            finally:
+                with self._condition:
+                    self._committing = False
+                    self._condition.notify_all()
+
+    def _commit(self, batch):
+        """
+        Makes a group of writes in one transaction. If any write fails, the
+        transaction is rolled back and each write is made again in its own
+        transaction, so one bad write doesn't fail the others. Futures are only
+        resolved after the commit, and every future in the group is resolved
+        even if the rollback fails.
+
+        @param {list of tuple (Future, function, list)} batch Queued writes
+        """
+
+        connection = None
+
+        try:
+            connection = self._sql.connection()
+            connection.execute("BEGIN IMMEDIATE")
+            results = [write(self._sql, *args, commit=False) for future, write, args in batch]
+            connection.commit()
+        except Exception as ex:
+            error = ex
+
+            try:
+                if connection is not None and connection.in_transaction:
+                    connection.rollback()
+                if len(batch) > 1:
+                    for x in batch:
+                        self._commit([x])
+            except Exception as ex:
+                error = ex
+
+            for future, write, args in batch:
+                if not future.done():
+                    future.set_exception(error)
+            return
+
+        for (future, write, args), result in zip(batch, results):
+            future.set_result(result)
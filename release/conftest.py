@@ -0,0 +1,26 @@
+from bitboxing_sql import BitboxingSql
+from functools import cmp_to_key
+import pytest
+
+def rank(scores):
+    """
+    Sorts scores with BitboxingSql.compare_scores, ties broken by name.
+
+    @param  {list of PlayerScore} scores
+    @return {list of dict}        PlayerScore dictionaries, best first
+    """
+
+    scores = sorted(scores, key=lambda x: x.player())
+    scores.sort(key=cmp_to_key(BitboxingSql.compare_scores))
+
+    return [x.to_dict() for x in scores]
+
+@pytest.fixture
+def ranked():
+    """
+    Ranks scores the way the game leaderboard should (see rank).
+
+    @return {function}
+    """
+
+    return rank
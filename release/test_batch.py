@@ -0,0 +1,146 @@
+from bitboxing_receiver import BitboxingReceiver
+from bitboxing_sender import BitboxingSender
+import bbtp
+import bbtp_binary
+import bitboxing_server
+import pytest
+
+VERSION = "0.2"
+
+@pytest.fixture
+def receiver(tmp_path):
+    """
+    A receiver with no players.
+
+    @return {BitboxingReceiver}
+    """
+
+    receiver = BitboxingReceiver(bbtp_binary.VERSION, str(tmp_path / "test.db"))
+    yield receiver
+    receiver.close()
+
+def batch(receiver, msg):
+    """
+    Sends a BATCH request.
+
+    @return {tuple (str, list of tuple (str, str))} (status code, batched responses or error body)
+    """
+
+    status, body = bbtp.parse_response(bitboxing_server.handle_request(msg, receiver))
+
+    return (status, bbtp.parse_batch_response(body) if status == bbtp.STATUS_OK else body)
+
+def statuses(responses):
+    """
+    Gets the status codes of batched responses.
+
+    @return {list of str}
+    """
+
+    return [x[0] for x in responses]
+
+@pytest.mark.parametrize("body", ["not json", '{"FIND": "MVMKB"}', "[1, 2]", ""])
+def test_malformed_body(receiver, body):
+    """
+    A BATCH body that isn't a list of commands is a bad request.
+    """
+
+    msg = bbtp.format_request("alice", VERSION, "BATCH") + body + bbtp.DELIM_ENDLINE
+
+    assert batch(receiver, msg)[0] == bbtp.STATUS_BAD_REQUEST
+
+def test_responses_in_order(receiver):
+    """
+    Each batched request is answered in order, seeing the writes made by the
+    ones before it.
+    """
+
+    sender = BitboxingSender("alice", VERSION)
+    status, responses = batch(receiver, sender.handle_batch(
+        sender.handle_register("password"),
+        sender.handle_find("MVMKB"),
+        sender.handle_find("MVMKB"),
+        sender.handle_solve("MVMKB", "G"),
+        sender.handle_score("alice"),
+    ))
+
+    assert status == bbtp.STATUS_OK
+    assert statuses(responses) == [bbtp.STATUS_OK, bbtp.STATUS_OK, bbtp.STATUS_WITHOUT_CHANGE, bbtp.STATUS_OK, bbtp.STATUS_OK]
+
+def test_each_request_authenticated(receiver):
+    """
+    The BATCH request itself needs no account, but each batched request is
+    authenticated on its own.
+    """
+
+    sender = BitboxingSender("alice", VERSION)
+    status, responses = batch(receiver, sender.handle_batch(
+        sender.handle_find("MVMKB"),
+        sender.handle_register("password"),
+        sender.handle_find("MVMKB"),
+    ))
+
+    assert statuses(responses) == [bbtp.STATUS_UNAUTHENTICATED, bbtp.STATUS_OK, bbtp.STATUS_OK]
+
+def test_token_passed_on(receiver):
+    """
+    The BATCH request's session token is checked for each batched request.
+    """
+
+    sender = BitboxingSender("alice", VERSION)
+    batch(receiver, sender.handle_batch(sender.handle_register("password")))
+    status, responses = batch(receiver, sender.handle_batch(sender.handle_login("password")))
+    sender.set_token(responses[0][1])
+
+    status, responses = batch(receiver, sender.handle_batch(sender.handle_find("MVMKB"), sender.handle_score("alice")))
+
+    assert statuses(responses) == [bbtp.STATUS_OK, bbtp.STATUS_OK]
+
+def test_nested_batch_refused(receiver):
+    """
+    A BATCH inside a BATCH is refused on its own, without failing the rest.
+    """
+
+    sender = BitboxingSender("alice", VERSION)
+    status, responses = batch(receiver, sender.handle_batch(
+        sender.handle_register("password"),
+        sender.handle_batch(sender.handle_find("MVMKB")),
+        sender.handle_find("MVMKB"),
+    ))
+
+    assert statuses(responses) == [bbtp.STATUS_OK, bbtp.STATUS_BAD_REQUEST, bbtp.STATUS_OK]
+
+def test_max_batch_size(receiver):
+    """
+    A BATCH of up to MAX_BATCH_SIZE requests is answered, and a larger one is
+    a bad request.
+    """
+
+    sender = BitboxingSender("alice", VERSION)
+    msgs = [sender.handle_leaderboard()] * bbtp.MAX_BATCH_SIZE
+
+    status, responses = batch(receiver, sender.handle_batch(*msgs))
+    assert status == bbtp.STATUS_OK
+    assert len(responses) == bbtp.MAX_BATCH_SIZE
+
+    assert batch(receiver, sender.handle_batch(*msgs, sender.handle_leaderboard()))[0] == bbtp.STATUS_BAD_REQUEST
+
+def test_binary_batch(receiver):
+    """
+    A binary BATCH is answered with each response in its binary encoding.
+    """
+
+    sender = BitboxingSender("alice", bbtp_binary.VERSION)
+    body = bbtp.parse_request(sender.handle_batch(sender.handle_register("password"), sender.handle_score("alice")))[4]
+    data = bbtp_binary.encode_request("alice", bbtp_binary.VERSION, "BATCH", body=body)
+
+    status, responses = bbtp_binary.decode_response(bitboxing_server.handle_binary_request(data, receiver))
+
+    assert status == bbtp.STATUS_OK
+    assert [(x[0], getattr(x[1], "to_dict", lambda: x[1])()) for x in responses] == [
+        (bbtp.STATUS_OK, ""),
+        (bbtp.STATUS_OK, {'player': "alice", 'finds': 0, 'solves': 0}),
+    ]
+
+    data = bbtp_binary.encode_request("alice", bbtp_binary.VERSION, "BATCH", body="not json")
+    assert bbtp_binary.decode_response(bitboxing_server.handle_binary_request(data, receiver))[0] == bbtp.STATUS_BAD_REQUEST
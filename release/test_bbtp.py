@@ -0,0 +1,121 @@
+import bbtp
+import pytest
+import socket
+
+class ChunkedSocket:
+    """
+    A socket that receives preset bytes a few at a time.
+    """
+
+    def __init__(self, data, chunk_size=1):
+        """
+        Constructor.
+
+        @param {bytes} data       Everything the peer sends before closing
+        @param {int}   chunk_size Most bytes returned by each recv
+        """
+
+        self._data = data
+        self._chunk_size = chunk_size
+        self.calls = 0
+
+    def recv(self, n):
+        """
+        Receives the next chunk, empty once everything has been received.
+
+        @return {bytes}
+        """
+
+        self.calls += 1
+        chunk = self._data[:min(n, self._chunk_size)]
+        self._data = self._data[len(chunk):]
+
+        return chunk
+
+def test_frames_split_across_recv():
+    """
+    Text and binary frames arriving a byte at a time, back to back, are read
+    whole and in order.
+    """
+
+    msgs = ["first|0.2\r\nFIND|MVMKB\r\n", b"\x03\x01binary", "é" * 3000]
+    cs = ChunkedSocket(b"".join(bbtp.frame(x) for x in msgs))
+    reader = bbtp.MessageReader(cs)
+
+    assert [reader.read() for x in msgs] == [(x, True) for x in msgs]
+    assert not reader.pending()
+    assert reader.read() == ("", False)
+
+def test_pipelined_frames_pending():
+    """
+    Frames received in one chunk are read one at a time, with the rest kept
+    for the next read.
+    """
+
+    reader = bbtp.MessageReader(ChunkedSocket(bbtp.frame("a") + bbtp.frame("b"), 1024))
+
+    assert reader.read() == ("a", True)
+    assert reader.pending()
+    assert reader.read() == ("b", True)
+    assert not reader.pending()
+
+def test_unframed_message():
+    """
+    A version 0.1 message is returned as it was received.
+    """
+
+    reader = bbtp.MessageReader(ChunkedSocket(b"alice|0.1\r\nFIND|MVMKB\r\n", 2048))
+
+    assert reader.read() == ("alice|0.1\r\nFIND|MVMKB\r\n", False)
+
+@pytest.mark.parametrize("cut", [3, bbtp.FRAME_HEADER_SIZE + 2])
+def test_closed_mid_frame(cut):
+    """
+    A connection closed partway through a frame's header or body is an
+    error rather than a short message.
+    """
+
+    reader = bbtp.MessageReader(ChunkedSocket(bbtp.frame("hello")[:cut]))
+
+    with pytest.raises(ConnectionError):
+        reader.read()
+
+def test_oversized_frame_rejected():
+    """
+    A frame claiming more than MAX_FRAME_SIZE bytes is rejected from its
+    header, before its body is read.
+    """
+
+    header = bbtp.FRAME_TEXT + bbtp.FRAME_SIZE.pack(bbtp.MAX_FRAME_SIZE + 1)
+    cs = ChunkedSocket(header + b"x" * 100, 1024)
+
+    with pytest.raises(ValueError):
+        bbtp.MessageReader(cs).read()
+    assert cs.calls == 1
+
+def test_oversized_message_not_framed(monkeypatch):
+    """
+    A message longer than MAX_FRAME_SIZE can't be framed for sending.
+    """
+
+    monkeypatch.setattr(bbtp, "MAX_FRAME_SIZE", 10)
+
+    assert bbtp.frame("x" * 10)
+    with pytest.raises(ValueError):
+        bbtp.frame("x" * 11)
+
+def test_send_msgs():
+    """
+    Pipelined messages sent together are read back one at a time.
+    """
+
+    a, b = socket.socketpair()
+    msgs = ["one", b"\x01\x02", "three"]
+
+    bbtp.send_msgs(a, msgs)
+    a.close()
+    reader = bbtp.MessageReader(b)
+
+    assert [reader.read() for x in msgs] == [(x, True) for x in msgs]
+    assert reader.read() == ("", False)
+    b.close()
@@ -0,0 +1,127 @@
+import bbtp
+import bbtp_binary
+import pytest
+
+VERSION = bbtp_binary.VERSION
+
+@pytest.mark.parametrize("method, args, body, token", [
+    ("FIND", ["MVMKB"], "", ""),
+    ("FIND", ["MVMKB"], "", "token"),
+    ("LEADERBOARD", [], "", ""),
+    ("SOLVE", ["MVMKB", "é" * 100], "", "t" * 200),
+    ("BATCH", [], "FIND|MVMKB\r\n" * 2000, "token"),
+    ("PING", ["a", ""], "", ""),
+    ("PING", [], "body", "token"),
+])
+def test_request_round_trip(method, args, body, token):
+    """
+    Requests decode to what was encoded, with or without a token, for methods
+    with and without a code, and with strings long enough for multi-byte
+    length varints.
+    """
+
+    data = bbtp_binary.encode_request("alice", VERSION, method, *args, body=body, token=token)
+
+    assert bbtp_binary.decode_request(data) == ("alice", VERSION, method, args, body, token)
+
+def test_unknown_method_written_out():
+    """
+    A method with no code is sent as code 0 followed by its name.
+    """
+
+    data = bbtp_binary.encode_request("alice", VERSION, "PING")
+
+    assert data[0] == 0
+    assert b"PING" in data
+    assert bbtp_binary.encode_request("alice", VERSION, "FIND", "MVMKB")[0] == bbtp_binary.METHODS.index("FIND")
+
+def test_request_wrong_field_count():
+    """
+    A request with fewer fields than its argument count needs is rejected.
+    """
+
+    data = bytearray(bbtp_binary.encode_request("alice", VERSION, "SOLVE", "MVMKB", "G"))
+    data[1] = 4
+
+    with pytest.raises(ValueError):
+        bbtp_binary.decode_request(bytes(data))
+
+@pytest.mark.parametrize("n", [0, 1, 0x7F, 0x80, 300, 0x3FFF, 0x4000, 70000, 1 << 35])
+def test_varint_round_trip(n):
+    """
+    Varints decode to what was encoded, across byte-length boundaries.
+    """
+
+    buffer = bytearray()
+    bbtp_binary._write_varint(buffer, n)
+
+    assert bbtp_binary._read_varint(bytes(buffer), 0) == (n, len(buffer))
+    assert len(buffer) == max(1, (n.bit_length() + 6) // 7)
+
+def score(player, finds, solves):
+    """
+    Makes a PlayerScore dictionary.
+
+    @return {dict}
+    """
+
+    return {'player': player, 'finds': finds, 'solves': solves}
+
+def plain(body):
+    """
+    Turns decoded PlayerScores into dictionaries so bodies can be compared.
+    """
+
+    if hasattr(body, "to_dict"):
+        return body.to_dict()
+    elif isinstance(body, tuple):
+        return tuple(plain(x) for x in body)
+    elif isinstance(body, list):
+        return [plain(x) for x in body]
+    else:
+        return body
+
+@pytest.mark.parametrize("status, method, data, expected", [
+    (bbtp.STATUS_OK, "FIND", None, ""),
+    (bbtp.STATUS_WITHOUT_CHANGE, "FIND", "", ""),
+    (bbtp.STATUS_OK, "HINT", "é" * 200, "é" * 200),
+    (bbtp.STATUS_NOT_FOUND, "SCORE", "No such player", "No such player"),
+    (bbtp.STATUS_OK, "SCORE", score("alice", 300, 70000), score("alice", 300, 70000)),
+    (bbtp.STATUS_OK, "LEADERBOARD", [score(f"p{i}", i, i // 2) for i in range(200)], [score(f"p{i}", i, i // 2) for i in range(200)]),
+    (bbtp.STATUS_OK, "LEADERBOARD", [], []),
+    (bbtp.STATUS_OK, "CACHE_LEADERBOARD", ["alice", "bob", "é"], ["alice", "bob", "é"]),
+    (bbtp.STATUS_OK, "RANK", dict(score("alice", 2, 1), rank=150), (150, score("alice", 2, 1))),
+    (bbtp.STATUS_OK, "LEADERBOARD_AROUND", [dict(score("bob", 1, 0), rank=1), dict(score("alice", 0, 0), rank=20000)], [(1, score("bob", 1, 0)), (20000, score("alice", 0, 0))]),
+    ("Teapot", "FIND", "Short and stout", "Short and stout"),
+])
+def test_payload_round_trip(status, method, data, expected):
+    """
+    Every payload type decodes to the body it was encoded from, including
+    statuses with no code and counts needing multi-byte varints.
+    """
+
+    assert plain(bbtp_binary.decode_response(bbtp_binary.encode_payload(status, method, data))) == (status, expected)
+
+def test_batch_payload_round_trip():
+    """
+    A BATCH payload holds each response in its own payload type.
+    """
+
+    responses = [
+        bbtp_binary.encode_payload(bbtp.STATUS_OK, "SCORE", score("alice", 1, 1)),
+        bbtp_binary.encode_payload(bbtp.STATUS_INCORRECT, "SOLVE", ""),
+        bbtp_binary.encode_payload(bbtp.STATUS_OK, "CACHE_LEADERBOARD", ["alice"]),
+    ]
+
+    status, body = bbtp_binary.decode_response(bbtp_binary.encode_payload(bbtp.STATUS_OK, "BATCH", responses))
+
+    assert status == bbtp.STATUS_OK
+    assert plain(body) == [(bbtp.STATUS_OK, score("alice", 1, 1)), (bbtp.STATUS_INCORRECT, ""), (bbtp.STATUS_OK, ["alice"])]
+
+def test_unknown_payload_type():
+    """
+    A payload type that doesn't exist is rejected.
+    """
+
+    with pytest.raises(ValueError):
+        bbtp_binary.decode_response(bbtp_binary.HEADER.pack(1, 99))
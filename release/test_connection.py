@@ -0,0 +1,75 @@
+from bitboxing_connection import BitboxingConnection
+from bitboxing_receiver import BitboxingReceiver
+from bitboxing_sender import BitboxingSender
+import bbtp
+import bitboxing_cli
+import bitboxing_server
+import pytest
+import socket
+import threading
+
+@pytest.fixture
+def server(tmp_path):
+    """
+    A server on a free local port that closes each connection after one
+    request, as serve() does.
+
+    @return {tuple (int, Semaphore)} (port, released after each connection is closed)
+    """
+
+    receiver = BitboxingReceiver("0.3", str(tmp_path / "test.db"))
+    s = socket.create_server(("127.0.0.1", 0))
+    closed = threading.Semaphore(0)
+
+    def accept():
+        while True:
+            try:
+                cs, address = s.accept()
+            except OSError:
+                return
+            bitboxing_server.respond(cs, receiver)
+            closed.release()
+
+    thread = threading.Thread(target=accept, daemon=True)
+    thread.start()
+
+    yield s.getsockname()[1], closed
+
+    s.shutdown(socket.SHUT_RDWR)
+    s.close()
+    thread.join(5)
+    receiver.close()
+
+@pytest.mark.parametrize("version", ["0.2", "0.3"])
+def test_reconnects_after_server_closes(server, version):
+    """
+    Requests that aren't safe to send twice still go through on a kept-alive
+    connection the server has closed since the last request.
+    """
+
+    port, closed = server
+    connection = BitboxingConnection("127.0.0.1", port, version)
+    sender = BitboxingSender("alice", version)
+
+    for msg in [sender.handle_register("password"), sender.handle_find("MVMKB"), sender.handle_solve("MVMKB", "?"), sender.handle_solve("MVMKB", "G")]:
+        status, body = connection.request(msg)
+        assert status in (bbtp.STATUS_OK, bbtp.STATUS_INCORRECT)
+        assert closed.acquire(timeout=5)
+
+    connection.close()
+
+def test_cli_reports_unreachable_server(monkeypatch):
+    """
+    The CLI gets an exception status instead of a connection error when the
+    server can't be reached.
+    """
+
+    s = socket.create_server(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+
+    monkeypatch.setattr(bitboxing_cli, "connection", BitboxingConnection("127.0.0.1", port, "0.2"))
+    status, body = bitboxing_cli.make_request(BitboxingSender("alice", "0.2").handle_find("MVMKB"))
+
+    assert status == bbtp.STATUS_EXCEPTION
+    assert "Could not reach the server" in body
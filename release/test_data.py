@@ -0,0 +1,102 @@
+from bitboxing_data import FindStatus
+from functools import cmp_to_key
+import heapq
+import random
+
+def beats(a, b):
+    """
+    Checks if one find status ranks before another, following each rule in
+    turn: found, solved, quickest solve, fewest attempts, found earliest.
+
+    @param  {FindStatus} a
+    @param  {FindStatus} b
+    @return {bool}
+    """
+
+    if a.found() != b.found():
+        return a.found()
+    elif a.solved() != b.solved():
+        return a.solved()
+    elif a.solved() and a.how_long() != b.how_long():
+        return a.how_long() < b.how_long()
+    elif a.attempts() != b.attempts():
+        return a.attempts() < b.attempts()
+    else:
+        return a.found() and a.time_found() < b.time_found()
+
+def compare(a, b):
+    """
+    Compares find statuses by the rules in beats.
+
+    @return {int}
+    """
+
+    return -1 if beats(a, b) else 1 if beats(b, a) else 0
+
+def random_finds(n, seed=0):
+    """
+    Generates a cache leaderboard's finds, with plenty of ties and some
+    players who haven't found the cache.
+
+    @return {list of dict} {'player', 'status'}
+    """
+
+    rng = random.Random(seed)
+    finds = []
+
+    for i in range(n):
+        found = rng.randrange(50) if rng.random() < 0.9 else None
+        solved = found + rng.randrange(10) if found is not None and rng.random() < 0.5 else None
+        finds.append({'player': f"player{i}", 'status': FindStatus(found, solved, rng.randint(0, 3))})
+
+    return finds
+
+def test_sort_key_matches_rules():
+    """
+    Sorting on sort_key, on __lt__ and with heapq.nsmallest all rank finds as
+    the rules do.
+    """
+
+    finds = random_finds(2000)
+    expected = [x['player'] for x in sorted(finds, key=cmp_to_key(lambda a, b: compare(a['status'], b['status'])))]
+    key = lambda x: x['status'].sort_key()
+
+    assert [x['player'] for x in sorted(finds, key=key)] == expected
+    assert [x['player'] for x in sorted(finds, key=lambda x: x['status'])] == expected
+    assert [x['player'] for x in heapq.nsmallest(10, finds, key=key)] == expected[:10]
+
+def test_solved_ties_broken_by_time_found():
+    """
+    Solves that took as long with as many attempts rank the earlier find
+    first. (Before sort_key, neither ranked before the other.)
+    """
+
+    early, late = FindStatus(10, 20, 1), FindStatus(30, 40, 1)
+
+    assert early < late
+    assert not late < early
+    assert late > early
+
+def test_not_found_never_before_not_found():
+    """
+    Of two players who haven't found a cache, neither ranks before the
+    other. (Before sort_key, each ranked before the other.)
+    """
+
+    a, b = FindStatus(None), FindStatus(None)
+
+    assert not a < b
+    assert not b < a
+    assert a <= b
+
+def test_rule_order():
+    """
+    Each rule only applies when the ones before it tie.
+    """
+
+    assert FindStatus(100) < FindStatus(None)
+    assert FindStatus(100, 200, 9) < FindStatus(0, None, 0)
+    assert FindStatus(50, 60, 9) < FindStatus(0, 20, 0)
+    assert FindStatus(50, 60, 1) < FindStatus(0, 10, 2)
+    assert FindStatus(50, None, 1) < FindStatus(0, None, 2)
+    assert FindStatus(0, None, 1) < FindStatus(50, None, 1)
@@ -0,0 +1,91 @@
+from bitboxing_receiver import BitboxingReceiver
+from bitboxing_sender import BitboxingSender
+import bbtp
+import bitboxing_server
+import bitboxing_sql
+import pytest
+
+VERSION = "0.2"
+
+# (name, request from a sender, max statements), in the order they're sent
+QUERY_BUDGETS = [
+    ("LOGIN", lambda x: x.handle_login("password"), 2),
+    ("FIND", lambda x: x.handle_find("MVMKB"), 2),
+    ("FIND again", lambda x: x.handle_find("MVMKB"), 2),
+    ("HINT", lambda x: x.handle_hint("MVMKB"), 1),
+    ("SOLVE wrong", lambda x: x.handle_solve("MVMKB", "?"), 2),
+    ("SOLVE right", lambda x: x.handle_solve("MVMKB", "G"), 2),
+    ("SOLVE again", lambda x: x.handle_solve("MVMKB", "G"), 2),
+    ("SCORE", lambda x: x.handle_score(x.id()), 2),
+    ("RANK", lambda x: x.handle_rank(x.id()), 1),
+    ("LEADERBOARD", lambda x: x.handle_leaderboard(), 1),
+    ("CACHE_LEADERBOARD", lambda x: x.handle_cache_leaderboard("MVMKB"), 2),
+]
+
+@pytest.fixture
+def traced(monkeypatch, tmp_path):
+    """
+    A receiver whose every connection, read-only or writer, reports the
+    statements it runs.
+
+    @return {tuple (BitboxingReceiver, list of str)} (receiver, statements run so far)
+    """
+
+    statements = []
+    monkeypatch.setattr(bitboxing_sql, "TRACE", statements.append)
+    receiver = BitboxingReceiver(VERSION, str(tmp_path / "test.db"))
+
+    for player in ["player0", "player1"]:
+        bitboxing_server.handle_request(BitboxingSender(player, VERSION).handle_register("password"), receiver)
+
+    yield receiver, statements
+    receiver.close()
+
+def count_queries(receiver, statements, msg):
+    """
+    Counts the SQL statements run on any connection to handle a request, not
+    counting transaction control or statements run by triggers (which SQLite
+    traces again under the text of the statement that fired them).
+
+    @param  {BitboxingReceiver} receiver
+    @param  {list of str}       statements Filled in by TRACE
+    @param  {str}               msg        BBTP request
+    @return {int}
+    """
+
+    statements.clear()
+    bitboxing_server.handle_request(msg, receiver)
+    queries = [x for i, x in enumerate(statements) if i == 0 or x != statements[i - 1]]
+
+    return len([x for x in queries if x.split()[0] not in ("BEGIN", "COMMIT", "ROLLBACK", "SAVEPOINT", "RELEASE")])
+
+def test_query_budgets(traced):
+    """
+    Each request stays within its statement budget, and a session token
+    never costs more statements than going without.
+    """
+
+    receiver, statements = traced
+    sender = BitboxingSender("player0", VERSION)
+    token_sender = BitboxingSender("player1", VERSION)
+    response = bitboxing_server.handle_request(token_sender.handle_login("password"), receiver)
+    token_sender.set_token(bbtp.parse_response(response)[1])
+
+    counts = {}
+    for name, request, budget in QUERY_BUDGETS:
+        counts[name] = (count_queries(receiver, statements, request(sender)), count_queries(receiver, statements, request(token_sender)))
+
+    assert {name: counts[name][0] for name, request, budget in QUERY_BUDGETS if counts[name][0] > budget} == {}
+    assert {name: counts[name] for name, request, budget in QUERY_BUDGETS if counts[name][1] > counts[name][0]} == {}
+
+def test_writes_are_counted(traced):
+    """
+    Statements run by the writer's connection are counted along with the
+    read-only ones.
+    """
+
+    receiver, statements = traced
+    statements.clear()
+    bitboxing_server.handle_request(BitboxingSender("player0", VERSION).handle_find("MVMKB"), receiver)
+
+    assert any(x.lstrip().upper().startswith("INSERT") for x in statements)
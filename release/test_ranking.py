@@ -0,0 +1,180 @@
+from bitboxing_data import PlayerScore
+from bitboxing_ranking import ScoreRanking
+import random
+
+def random_scores(n, seed=0):
+    """
+    Generates scores with plenty of ties.
+
+    @param  {int}                 n Number of players
+    @return {list of PlayerScore}
+    """
+
+    rng = random.Random(seed)
+
+    return [PlayerScore(f"player{i}", rng.randint(0, 5), rng.randint(0, 3)) for i in range(n)]
+
+def test_load_matches_compare_scores(ranked):
+    """
+    Loaded scores are ranked as compare_scores sorts them.
+    """
+
+    scores = random_scores(500)
+    ranking = ScoreRanking()
+    ranking.load(scores)
+
+    assert len(ranking) == 500
+    assert [x.to_dict() for x in ranking.top()] == ranked(scores)
+
+def test_add_matches_compare_scores(ranked):
+    """
+    Scores added to existing and new players keep the ranking, ranks and
+    scores in compare_scores order.
+    """
+
+    rng = random.Random(1)
+    scores = {x.player(): x for x in random_scores(300)}
+    ranking = ScoreRanking()
+    ranking.load(scores.values())
+
+    for i in range(1000):
+        player = f"player{rng.randrange(400)}"
+        finds, solves = rng.randint(0, 1), rng.randint(0, 1)
+        ranking.add(player, finds, solves)
+        old = scores.get(player, PlayerScore(player))
+        scores[player] = PlayerScore(player, old.finds() + finds, old.solves() + solves)
+
+    expected = ranked(scores.values())
+
+    assert [x.to_dict() for x in ranking.top()] == expected
+    assert [ranking.rank(x['player']) for x in expected] == list(range(1, len(expected) + 1))
+    assert all(ranking.score(x['player']).to_dict() == x for x in expected)
+
+def test_add_new_player():
+    """
+    Adding to a player who isn't ranked yet inserts them with that score.
+    """
+
+    ranking = ScoreRanking()
+    ranking.add("alice")
+    ranking.add("bob", finds=2, solves=1)
+
+    assert len(ranking) == 2
+    assert [x.to_dict() for x in ranking.top()] == [
+        {'player': "bob", 'finds': 2, 'solves': 1},
+        {'player': "alice", 'finds': 0, 'solves': 0},
+    ]
+
+def test_set_replaces_score():
+    """
+    Setting a score replaces it, including lowering it.
+    """
+
+    ranking = ScoreRanking()
+    ranking.load([PlayerScore("alice", 5, 5), PlayerScore("bob", 1, 1)])
+    ranking.set(PlayerScore("alice", 0, 0))
+
+    assert len(ranking) == 2
+    assert [x.player() for x in ranking.top()] == ["bob", "alice"]
+    assert ranking.score("alice").to_dict() == {'player': "alice", 'finds': 0, 'solves': 0}
+
+def test_ties_broken_by_name():
+    """
+    Players with the same solves and finds are ranked by name.
+    """
+
+    ranking = ScoreRanking()
+    for player in ["carol", "alice", "dave", "bob"]:
+        ranking.add(player, finds=2, solves=1)
+    ranking.add("erin", finds=3, solves=1)
+
+    assert [x.player() for x in ranking.top()] == ["erin", "alice", "bob", "carol", "dave"]
+    assert ranking.rank("alice") == 2
+    assert ranking.rank("dave") == 5
+
+def test_more_solves_beat_more_finds():
+    """
+    Solves count before finds.
+    """
+
+    ranking = ScoreRanking()
+    ranking.add("alice", finds=10, solves=0)
+    ranking.add("bob", finds=1, solves=1)
+
+    assert [x.player() for x in ranking.top()] == ["bob", "alice"]
+
+def test_missing_player():
+    """
+    A player who isn't ranked has no rank, no window and a zero score.
+    """
+
+    ranking = ScoreRanking()
+    ranking.load(random_scores(10))
+
+    assert ranking.rank("nobody") is None
+    assert ranking.around("nobody", 2) == []
+    assert ranking.score("nobody").to_dict() == {'player': "nobody", 'finds': 0, 'solves': 0}
+    assert ScoreRanking().rank("nobody") is None
+
+def test_top_count(ranked):
+    """
+    top returns at most count players, or everyone if count <= 0.
+    """
+
+    scores = random_scores(20)
+    ranking = ScoreRanking()
+    ranking.load(scores)
+    expected = ranked(scores)
+
+    assert [x.to_dict() for x in ranking.top(3)] == expected[:3]
+    assert [x.to_dict() for x in ranking.top(0)] == expected
+    assert [x.to_dict() for x in ranking.top(-1)] == expected
+    assert [x.to_dict() for x in ranking.top(100)] == expected
+    assert ScoreRanking().top() == []
+
+def around(ranking, player, count):
+    """
+    Gets a window from ScoreRanking.around as (rank, score dictionary).
+    """
+
+    return [(rank, x.to_dict()) for rank, x in ranking.around(player, count)]
+
+def test_around_middle(ranked):
+    """
+    A player in the middle gets count players on each side.
+    """
+
+    scores = random_scores(50)
+    ranking = ScoreRanking()
+    ranking.load(scores)
+    expected = ranked(scores)
+
+    assert around(ranking, expected[20]['player'], 3) == [(i + 1, expected[i]) for i in range(17, 24)]
+
+def test_around_edges(ranked):
+    """
+    Windows are cut off at the top and bottom of the ranking.
+    """
+
+    scores = random_scores(10)
+    ranking = ScoreRanking()
+    ranking.load(scores)
+    expected = ranked(scores)
+    window = lambda first, last: [(i + 1, expected[i]) for i in range(first, last)]
+
+    assert around(ranking, expected[0]['player'], 2) == window(0, 3)
+    assert around(ranking, expected[1]['player'], 2) == window(0, 4)
+    assert around(ranking, expected[9]['player'], 2) == window(7, 10)
+    assert around(ranking, expected[8]['player'], 2) == window(6, 10)
+    assert around(ranking, expected[5]['player'], 0) == window(5, 6)
+    assert around(ranking, expected[5]['player'], 100) == window(0, 10)
+
+def test_around_only_player():
+    """
+    A lone player's window holds just them.
+    """
+
+    ranking = ScoreRanking()
+    ranking.add("alice", finds=1)
+
+    assert around(ranking, "alice", 5) == [(1, {'player': "alice", 'finds': 1, 'solves': 0})]
@@ -0,0 +1,218 @@
+from bitboxing_receiver import BitboxingReceiver
+from bitboxing_responses import ResponseCache
+import bbtp
+import json
+import pytest
+
+class Builder:
+    """
+    Builds numbered responses and counts how many it has built.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        self.built = 0
+
+    def __call__(self):
+        """
+        Builds a response.
+
+        @return {str}
+        """
+
+        self.built += 1
+        return f"response {self.built}"
+
+def test_miss_then_hit():
+    """
+    A response is built on the first request and reused after that.
+    """
+
+    responses = ResponseCache()
+    build = Builder()
+
+    assert responses.get(None, 10, build) == "response 1"
+    assert responses.get(None, 10, build) == "response 1"
+    assert build.built == 1
+    assert responses.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+def test_keys():
+    """
+    Responses are kept apart by scope, count and variant.
+    """
+
+    responses = ResponseCache()
+    build = Builder()
+
+    for key in [(None, 10, None), ("TDQXO", 10, None), (None, 5, None), (None, 10, True)]:
+        responses.get(*key[:2], build, key[2])
+        responses.get(*key[:2], build, key[2])
+
+    assert build.built == 4
+
+def test_bump_invalidates_scope():
+    """
+    Bumping a scope rebuilds its responses and leaves other scopes cached.
+    """
+
+    responses = ResponseCache()
+    build = Builder()
+    responses.get(None, 10, build)
+    responses.get("TDQXO", 10, build)
+
+    responses.bump("TDQXO")
+
+    assert responses.get(None, 10, build) == "response 1"
+    assert responses.get("TDQXO", 10, build) == "response 3"
+
+    responses.bump(None, "TDQXO")
+
+    assert responses.get(None, 10, build) == "response 4"
+    assert responses.get("TDQXO", 10, build) == "response 5"
+
+def test_uncached_counts():
+    """
+    Responses for every player (count 0) or more than max_count players are
+    built every time.
+    """
+
+    responses = ResponseCache(max_count=20)
+    build = Builder()
+
+    for count in [0, 21]:
+        responses.get(None, count, build)
+        responses.get(None, count, build)
+
+    assert build.built == 4
+
+    responses.get(None, 20, build)
+    responses.get(None, 20, build)
+
+    assert build.built == 5
+
+@pytest.fixture
+def receiver(tmp_path):
+    """
+    A receiver with two registered players, each of whom has found MVMKB.
+
+    @return {BitboxingReceiver}
+    """
+
+    receiver = BitboxingReceiver("0.2", str(tmp_path / "test.db"))
+
+    for player in ["alice", "bob"]:
+        receiver.handle_register(player, "password")
+        receiver.handle_find(player, "MVMKB")
+
+    yield receiver
+    receiver.close()
+
+def leaderboard(receiver, count="10"):
+    """
+    Gets the game leaderboard.
+
+    @return {list of dict}
+    """
+
+    return json.loads(bbtp.parse_response(receiver.handle_leaderboard("alice", count))[1])
+
+def cache_leaderboard(receiver, cache):
+    """
+    Gets a cache leaderboard.
+
+    @return {list of str}
+    """
+
+    return json.loads(bbtp.parse_response(receiver.handle_cache_leaderboard("alice", cache))[1])
+
+def hits(receiver):
+    """
+    Gets the number of cached responses served so far.
+
+    @return {int}
+    """
+
+    return receiver.response_cache().stats()['hits']
+
+def test_receiver_reuses_responses(receiver):
+    """
+    Repeated leaderboard requests with no writes in between are served from
+    the cache.
+    """
+
+    first = (leaderboard(receiver), cache_leaderboard(receiver, "MVMKB"))
+    before = hits(receiver)
+
+    assert (leaderboard(receiver), cache_leaderboard(receiver, "MVMKB")) == first
+    assert hits(receiver) == before + 2
+
+def test_find_invalidates(receiver):
+    """
+    FIND rebuilds the game leaderboard and the found cache's leaderboard, but
+    not other caches'.
+    """
+
+    leaderboard(receiver)
+    cache_leaderboard(receiver, "TDQXO")
+    cache_leaderboard(receiver, "MVMKB")
+    before = hits(receiver)
+
+    receiver.handle_find("bob", "TDQXO")
+
+    assert leaderboard(receiver)[0] == {'player': "bob", 'finds': 2, 'solves': 0}
+    assert cache_leaderboard(receiver, "TDQXO") == ["bob"]
+    assert hits(receiver) == before
+    cache_leaderboard(receiver, "MVMKB")
+    assert hits(receiver) == before + 1
+
+def test_solve_invalidates(receiver):
+    """
+    A right SOLVE rebuilds the game and cache leaderboards; a wrong one only
+    changes attempts, so only the cache leaderboard is rebuilt.
+    """
+
+    leaderboard(receiver)
+    assert cache_leaderboard(receiver, "MVMKB") == ["alice", "bob"]
+    before = hits(receiver)
+
+    receiver.handle_solve("alice", "MVMKB", "?")
+
+    assert cache_leaderboard(receiver, "MVMKB") == ["bob", "alice"]
+    assert hits(receiver) == before
+    leaderboard(receiver)
+    assert hits(receiver) == before + 1
+
+    receiver.handle_solve("alice", "MVMKB", "G")
+
+    assert leaderboard(receiver)[0] == {'player': "alice", 'finds': 1, 'solves': 1}
+    assert cache_leaderboard(receiver, "MVMKB") == ["alice", "bob"]
+    assert hits(receiver) == before + 1
+
+def test_register_invalidates(receiver):
+    """
+    REGISTER rebuilds the game leaderboard with the new player on it.
+    """
+
+    leaderboard(receiver)
+    before = hits(receiver)
+
+    receiver.handle_register("carol", "password")
+
+    assert leaderboard(receiver)[-1] == {'player': "carol", 'finds': 0, 'solves': 0}
+    assert hits(receiver) == before
+
+def test_receiver_full_leaderboard_not_cached(receiver):
+    """
+    LEADERBOARD for every player (count 0) is rebuilt for each request.
+    """
+
+    before = receiver.response_cache().stats()
+
+    leaderboard(receiver, "0")
+    leaderboard(receiver, "0")
+
+    after = receiver.response_cache().stats()
+    assert (after['hits'], after['misses']) == (before['hits'], before['misses'] + 2)
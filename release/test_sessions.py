@@ -0,0 +1,157 @@
+from bitboxing_receiver import BitboxingReceiver
+from bitboxing_sender import BitboxingSender
+from bitboxing_sessions import SessionTable
+import bbtp
+import bitboxing_server
+import pytest
+
+VERSION = "0.2"
+
+class Clock:
+    """
+    A clock that only moves when told to.
+    """
+
+    def __init__(self):
+        """
+        Constructor.
+        """
+
+        self.now = 1000.0
+
+    def __call__(self):
+        """
+        Gets the current time.
+
+        @return {float}
+        """
+
+        return self.now
+
+@pytest.fixture
+def clock():
+    """
+    @return {Clock}
+    """
+
+    return Clock()
+
+def test_check(clock):
+    """
+    A token is only valid for the player it was created for.
+    """
+
+    sessions = SessionTable(10, clock)
+    token = sessions.create("alice")
+
+    assert sessions.check("alice", token)
+    assert not sessions.check("bob", token)
+    assert not sessions.check("alice", "not a token")
+    assert not sessions.check("alice", "")
+    assert token != sessions.create("alice")
+
+def test_sliding_expiry(clock):
+    """
+    Each use of a session pushes its expiry back by the timeout, and a
+    session left unused for longer than that expires.
+    """
+
+    sessions = SessionTable(10, clock)
+    token = sessions.create("alice")
+
+    for i in range(5):
+        clock.now += 9
+        assert sessions.check("alice", token)
+
+    clock.now += 10
+    assert sessions.check("alice", token)
+
+    clock.now += 10.5
+    assert not sessions.check("alice", token)
+
+def test_expired_session_removed(clock):
+    """
+    An expired session is removed once it's checked, and stays invalid.
+    """
+
+    sessions = SessionTable(10, clock)
+    token = sessions.create("alice")
+    clock.now += 11
+
+    assert not sessions.check("alice", token)
+    assert len(sessions) == 0
+
+    sessions.create("alice")
+    assert not sessions.check("alice", token)
+
+def test_sweep(clock):
+    """
+    Sessions that expired without being checked again are removed when a
+    session is created after the timeout has passed, and live ones are kept.
+    """
+
+    sessions = SessionTable(10, clock)
+    old = [sessions.create(f"player{i}") for i in range(5)]
+    clock.now += 6
+    live = sessions.create("alice")
+    clock.now += 5
+
+    sessions.create("bob")
+
+    assert len(sessions) == 2
+    assert sessions.check("alice", live)
+    assert not any(sessions.check(f"player{i}", x) for i, x in enumerate(old))
+
+@pytest.fixture
+def receiver(tmp_path, clock):
+    """
+    A receiver with one registered player, whose sessions use the fake clock.
+
+    @return {BitboxingReceiver}
+    """
+
+    receiver = BitboxingReceiver(VERSION, str(tmp_path / "test.db"))
+    receiver._sessions = SessionTable(10, clock)
+    receiver.handle_register("alice", "password")
+
+    yield receiver
+    receiver.close()
+
+def find(receiver, sender, token):
+    """
+    Sends a FIND request with a session token.
+
+    @return {str} Status code
+    """
+
+    sender = BitboxingSender(sender, VERSION)
+    sender.set_token(token)
+
+    return bbtp.parse_response(bitboxing_server.handle_request(sender.handle_find("MVMKB"), receiver))[0]
+
+def test_invalid_token_falls_back_to_database(receiver, clock):
+    """
+    A registered player with an unknown or expired token is still
+    authenticated, through the database.
+    """
+
+    sender = BitboxingSender("alice", VERSION)
+    token = bbtp.parse_response(bitboxing_server.handle_request(sender.handle_login("password"), receiver))[1]
+    clock.now += 11
+
+    assert not receiver._sessions.check("alice", token)
+    assert find(receiver, "alice", token) == bbtp.STATUS_OK
+    assert find(receiver, "alice", "not a token") == bbtp.STATUS_WITHOUT_CHANGE
+
+def test_unregistered_player_unauthenticated(receiver):
+    """
+    A player who isn't registered is refused, with no token or with another
+    player's.
+    """
+
+    sender = BitboxingSender("alice", VERSION)
+    token = bbtp.parse_response(bitboxing_server.handle_request(sender.handle_login("password"), receiver))[1]
+
+    assert find(receiver, "mallory", "") == bbtp.STATUS_UNAUTHENTICATED
+    assert find(receiver, "mallory", token) == bbtp.STATUS_UNAUTHENTICATED
+    assert find(receiver, "alice", token) == bbtp.STATUS_OK
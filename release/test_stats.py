@@ -0,0 +1,144 @@
+from bitboxing_sql import BitboxingSql
+import collections
+import pytest
+import random
+
+np = pytest.importorskip("numpy")
+
+from bitboxing_stats import FindColumns
+
+@pytest.fixture
+def sql(tmp_path):
+    """
+    A small database with random finds, plus finds that tie on everything
+    but the player's name, and a player with no finds.
+
+    @return {BitboxingSql}
+    """
+
+    sql = BitboxingSql(str(tmp_path / "test.db"))
+    sql.setup()
+
+    caches = [x[0] for x in BitboxingSql._get_puzzle_data()]
+    rng = random.Random(0)
+    users = [(f"player{i}", "password") for i in range(60)]
+    finds = []
+
+    for player, password in users[:50]:
+        for cache in rng.sample(caches[1:], rng.randint(0, len(caches) - 1)):
+            found = rng.randrange(1000)
+            solved = found + rng.randrange(100) if rng.random() < 0.5 else None
+            finds.append((player, cache, found, solved, rng.randint(0, 3)))
+
+    # Identical finds of the first cache, ranked by name only
+    for player, password in reversed(users[50:59]):
+        finds.append((player, caches[0], 10, 20 if player < "player55" else None, 1))
+
+    users.append(("nobody", "password"))
+
+    connection = sql.connection()
+    with connection:
+        connection.executemany("INSERT INTO Users(username, password) VALUES(?, ?)", users)
+        connection.executemany("INSERT INTO Finds(player, cache, time_found, time_solved, attempts) VALUES(?, ?, ?, ?, ?)", finds)
+
+    yield sql
+    sql.close()
+
+def cache_rows(sql, cache):
+    """
+    Gets a cache's finds as (player, time_found, time_solved, attempts).
+    """
+
+    return [x[:1] + x[2:] for x in sql.finds() if x[1] == cache]
+
+def test_leaderboard_matches_compare_scores(sql, ranked):
+    """
+    The full leaderboard, and its top, match compare_scores with ties broken
+    by name, including players with no finds.
+    """
+
+    columns = FindColumns.load(sql)
+    expected = ranked([sql.score(x) for x in sql.players()])
+
+    assert [x.to_dict() for x in columns.leaderboard()] == expected
+    assert [x.to_dict() for x in columns.leaderboard(10)] == expected[:10]
+    assert [x.to_dict() for x in columns.leaderboard(1)] == expected[:1]
+    assert [x.to_dict() for x in columns.leaderboard(len(expected) + 5)] == expected
+
+def test_score(sql):
+    """
+    Scores match the database, and a player who isn't registered has none.
+    """
+
+    columns = FindColumns.load(sql)
+
+    assert all(columns.score(x).to_dict() == sql.score(x).to_dict() for x in sql.players())
+    assert columns.score("stranger").to_dict() == {'player': "stranger", 'finds': 0, 'solves': 0}
+
+def test_cache_leaderboard_matches_sql(sql):
+    """
+    Every cache leaderboard, and its top, matches BitboxingSql.cache_leaderboard.
+    """
+
+    columns = FindColumns.load(sql)
+
+    for cache in columns.caches():
+        expected = [(x['player'], x['status'].to_dict()) for x in sql.cache_leaderboard(cache)]
+        assert [(x['player'], x['status'].to_dict()) for x in columns.cache_leaderboard(cache)] == expected
+        assert [(x['player'], x['status'].to_dict()) for x in columns.cache_leaderboard(cache, 3)] == expected[:3]
+
+def test_cache_leaderboard_ties_by_name(sql):
+    """
+    Finds that tie on everything else are ranked by name, solved first.
+    """
+
+    cache = BitboxingSql._get_puzzle_data()[0][0]
+    columns = FindColumns.load(sql)
+
+    assert [x['player'] for x in columns.cache_leaderboard(cache)] == [f"player{i}" for i in range(50, 59)]
+
+def test_cache_leaderboard_unknown_cache(sql):
+    """
+    A cache that doesn't exist has an empty leaderboard and no stats.
+    """
+
+    columns = FindColumns.load(sql)
+
+    assert columns.cache_leaderboard("NOPE") == []
+    assert columns.solve_times("NOPE") == {}
+    assert columns.attempts("NOPE") == []
+
+def test_report(sql):
+    """
+    Finds, solves, solve time percentiles and attempts per cache match the
+    rows they were built from.
+    """
+
+    columns = FindColumns.load(sql)
+    report = columns.report()
+
+    assert sorted(report) == sorted(sql.puzzles().keys())
+
+    for cache, stats in report.items():
+        rows = cache_rows(sql, cache)
+        how_long = [x[2] - x[1] for x in rows if x[2] is not None]
+        attempts = collections.Counter(x[3] for x in rows)
+
+        assert stats['finds'] == len(rows)
+        assert stats['solves'] == len(how_long)
+        assert stats['attempts'] == [attempts[i] for i in range(max(attempts, default=-1) + 1)]
+        if how_long:
+            assert stats['solve_times'] == pytest.approx({p: np.percentile(how_long, p) for p in (50, 90, 99)})
+        else:
+            assert stats['solve_times'] == {}
+
+def test_no_finds():
+    """
+    With no finds at all, every cache has empty stats and leaderboards.
+    """
+
+    columns = FindColumns(["alice", "bob"], ["MVMKB", "TDQXO"], [])
+
+    assert columns.report() == {x: {'finds': 0, 'solves': 0, 'solve_times': {}, 'attempts': []} for x in ["MVMKB", "TDQXO"]}
+    assert columns.cache_leaderboard("MVMKB") == []
+    assert [x.to_dict() for x in columns.leaderboard()] == [{'player': x, 'finds': 0, 'solves': 0} for x in ["alice", "bob"]]
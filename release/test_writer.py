@@ -0,0 +1,193 @@
+from bitboxing_sql import BitboxingSql
+from bitboxing_writer import BitboxingWriter
+from concurrent.futures import ThreadPoolExecutor
+import bitboxing_sql
+import pytest
+import sqlite3 as sqlite
+import threading
+import time
+
+@pytest.fixture
+def writer(monkeypatch, tmp_path):
+    """
+    A writer for a new database, and the statements run since it was set up.
+
+    @return {tuple (BitboxingWriter, list of str)} (writer, statements run so far)
+    """
+
+    statements = []
+    path = str(tmp_path / "test.db")
+    sql = BitboxingSql(path)
+    sql.setup()
+    sql.close()
+
+    monkeypatch.setattr(bitboxing_sql, "TRACE", statements.append)
+    writer = BitboxingWriter(path)
+
+    yield writer, statements
+    writer.close()
+
+def hold(monkeypatch, writer, executor):
+    """
+    Starts a commit that doesn't finish until it's released, so that writes
+    made in the meantime queue up behind it.
+
+    @return {Event} Set to let the commit finish
+    """
+
+    started, release = threading.Event(), threading.Event()
+    find = BitboxingSql.find
+
+    def held_find(sql, player, *args, **kwargs):
+        if player == "holder":
+            started.set()
+            release.wait(5)
+        return find(sql, player, *args, **kwargs)
+
+    monkeypatch.setattr(BitboxingSql, "find", held_find)
+    executor.submit(writer.find, "holder", "MVMKB", 0)
+    assert started.wait(5)
+
+    return release
+
+def queue_up(writer, executor, writes):
+    """
+    Submits writes, waiting until every one of them is queued.
+
+    @param  {list of tuple (function, list)} writes Writer methods and their arguments
+    @return {list of Future}
+    """
+
+    futures = [executor.submit(write, *args) for write, args in writes]
+
+    deadline = time.monotonic() + 5
+    while len(writer._queue) < len(writes):
+        assert time.monotonic() < deadline
+        time.sleep(0.001)
+
+    return futures
+
+def transactions(statements):
+    """
+    Counts the transactions started.
+
+    @return {int}
+    """
+
+    return len([x for x in statements if x.startswith("BEGIN")])
+
+def test_lone_write(writer):
+    """
+    A write with nothing else queued is committed in its own transaction.
+    """
+
+    writer, statements = writer
+
+    assert writer.find("alice", "MVMKB", 1)
+    assert not writer.find("alice", "MVMKB", 2)
+    assert transactions(statements) == 2
+
+def finds(tmp_path):
+    """
+    Gets every committed find.
+
+    @return {list of tuple}
+    """
+
+    sql = BitboxingSql(str(tmp_path / "test.db"))
+    finds = sql.finds()
+    sql.close()
+
+    return finds
+
+def test_concurrent_writes_share_a_transaction(writer, monkeypatch, tmp_path):
+    """
+    Writes queued while a commit is in progress are all committed together
+    in the next transaction.
+    """
+
+    writer, statements = writer
+
+    with ThreadPoolExecutor(16) as executor:
+        release = hold(monkeypatch, writer, executor)
+        futures = queue_up(writer, executor, [(writer.find, (f"player{i}", "MVMKB", i)) for i in range(10)])
+        release.set()
+
+        assert [x.result(5) for x in futures] == [True] * 10
+
+    assert transactions(statements) == 2
+    assert len(finds(tmp_path)) == 11
+
+def test_failed_write_retried_alone(writer, monkeypatch, tmp_path):
+    """
+    A write that fails in a group makes every write in the group retry in its
+    own transaction, so only that write fails.
+    """
+
+    writer, statements = writer
+    writes = [(writer.register, ("alice", "password")), (writer.register, ("alice", "password"))]
+    writes += [(writer.find, (f"player{i}", "MVMKB", i)) for i in range(4)]
+
+    with ThreadPoolExecutor(16) as executor:
+        release = hold(monkeypatch, writer, executor)
+        futures = queue_up(writer, executor, writes)
+        release.set()
+
+        errors = [x.exception(5) for x in futures]
+
+    assert sum(isinstance(x, sqlite.IntegrityError) for x in errors[:2]) == 1
+    assert errors[2:] == [None] * 4
+    assert [x.result() for x in futures[2:]] == [True] * 4
+    assert transactions(statements) == 2 + len(writes)
+
+    assert len(finds(tmp_path)) == 5
+
+class FailingRollback:
+    """
+    Wraps a connection whose rollback always fails.
+    """
+
+    def __init__(self, connection):
+        """
+        Constructor.
+
+        @param {Connection} connection
+        """
+
+        self._connection = connection
+
+    def rollback(self):
+        """
+        Fails.
+        """
+
+        raise sqlite.OperationalError("rollback failed")
+
+    def __getattr__(self, name):
+        """
+        Gets an attribute of the wrapped connection.
+        """
+
+        return getattr(self._connection, name)
+
+def test_failed_rollback_resolves_every_write(writer, monkeypatch):
+    """
+    If rolling back a failed group fails too, every write in the group gets
+    the error instead of waiting forever.
+    """
+
+    writer, statements = writer
+    writer.register("alice", "password")
+    connection = writer._sql.connection()
+    monkeypatch.setattr(writer._sql, "connection", lambda: FailingRollback(connection))
+
+    writes = [(writer.register, ("alice", "password"))] + [(writer.find, (f"player{i}", "MVMKB", i)) for i in range(4)]
+
+    with ThreadPoolExecutor(16) as executor:
+        release = hold(monkeypatch, writer, executor)
+        futures = queue_up(writer, executor, writes)
+        release.set()
+
+        errors = [x.exception(5) for x in futures]
+
+    assert all(isinstance(x, sqlite.OperationalError) for x in errors)
@@ -0,0 +1,127 @@
+from bbdb import CacheDatabase, FindStats
+import random
+
+def walk(db):
+    """
+    Gathers every player's found caches by walking every cache record, the
+    way CacheDatabase did before it indexed them by player.
+
+    @param  {CacheDatabase}                      db
+    @return {dict of str: dict of str: FindStats}    Player to cache to stats, players who found any
+    """
+
+    history = {}
+
+    for cache in db.to_dict()['dict']:
+        for player in db[cache].players():
+            stats = db[cache].stats(player)
+            if stats.found():
+                history.setdefault(player, {})[cache] = stats
+
+    return history
+
+def check(db, others=()):
+    """
+    Checks players(), history(), stats() and top() against a walk of every
+    cache record.
+
+    @param {CacheDatabase} db
+    @param {list of str}   others Players to check who may not have found anything
+    """
+
+    history = walk(db)
+
+    assert sorted(db.players()) == sorted(history)
+
+    for player in list(history) + list(others):
+        expected = history.get(player, {})
+        assert db.history(player) == expected
+        score = db.stats(player)
+        assert (score.finds(), score.solves()) == (len(expected), sum(x.solved() for x in expected.values()))
+
+    scores = {p: (len(h), sum(x.solved() for x in h.values())) for p, h in history.items()}
+    expected = sorted((-solves, -finds) for finds, solves in scores.values())
+    top = db.top()
+
+    # Ties may come in any order, so compare keys, then each player's score
+    assert [x.sort_key() for x in top] == expected
+    assert all(scores[x.player()] == (x.finds(), x.solves()) for x in top)
+    assert [x.sort_key() for x in db.top(3)] == expected[:3]
+
+def test_default_data_has_no_players():
+    """
+    A new database has no players.
+    """
+
+    db = CacheDatabase()
+
+    check(db, ["alice"])
+    assert db.top() == []
+
+def test_index_matches_walk():
+    """
+    The player index stays consistent with the cache records through
+    random finds, solve attempts and replaced stats.
+    """
+
+    rng = random.Random(0)
+    db = CacheDatabase()
+    caches = list(db.to_dict()['dict'])
+    players = [f"player{i}" for i in range(30)]
+
+    for i in range(2000):
+        player, cache = rng.choice(players), rng.choice(caches)
+        stats = db[cache].stats(player)
+        action = rng.random()
+
+        if action < 0.4 and not stats.found():
+            db[cache].find(player, i)
+        elif action < 0.8 and stats.found() and not stats.solved():
+            answer = db[cache].puzzle().answer()
+            db[cache].try_to_solve(player, answer if rng.random() < 0.3 else "?", i)
+        elif action < 0.9:
+            db[cache].set_stats(player, FindStats(i, i + rng.randrange(100) if rng.random() < 0.5 else None, rng.randint(0, 3)))
+        else:
+            db[cache].set_stats(player, FindStats.empty())
+
+        if i % 100 == 0:
+            check(db, players)
+
+    check(db, players)
+
+def test_from_dict_builds_index():
+    """
+    A database loaded from a dictionary indexes the stats it was given.
+    """
+
+    db = CacheDatabase()
+    db["TDQXO"].find("alice", 1)
+    db["TDQXO"].find("bob", 2)
+    db["MVMKB"].find("alice", 3)
+    db["MVMKB"].try_to_solve("alice", "G", 4)
+
+    loaded = CacheDatabase.from_dict(db.to_dict())
+
+    check(loaded, ["carol"])
+    assert loaded.stats("alice").to_dict() == {'player': "alice", 'finds': 2, 'solves': 1}
+
+def test_reset_stats():
+    """
+    A player whose finds are all replaced by empty stats is no longer
+    listed or ranked, and empty stats for a new player don't list them.
+    """
+
+    db = CacheDatabase()
+    db["TDQXO"].find("alice", 1)
+    db["MVMKB"].find("alice", 2)
+    db["TDQXO"].set_stats("alice", FindStats.empty())
+
+    check(db, ["alice"])
+    assert db.players() == ["alice"]
+
+    db["MVMKB"].set_stats("alice", FindStats.empty())
+    db["MVMKB"].set_stats("bob", FindStats.empty())
+
+    check(db, ["alice", "bob"])
+    assert db.players() == []
+    assert db.top() == []
@@ -0,0 +1,124 @@
+from bitboxing_receiver import BitboxingReceiver
+import bbtp
+import json
+import os
+import pytest
+
+VERSION = "0.1"
+
+@pytest.fixture
+def path(tmp_path):
+    """
+    A data file path whose default data has been written by a receiver.
+
+    @return {str}
+    """
+
+    path = str(tmp_path / "data.json")
+    BitboxingReceiver(VERSION, path).close()
+
+    return path
+
+def stats(receiver, player):
+    """
+    Gets a player's finds and solves.
+
+    @return {tuple (int, int)}
+    """
+
+    data = json.loads(bbtp.parse_response(receiver.handle_stats(player, player))[1])
+    return data['finds'], data['solves']
+
+def lines(path):
+    """
+    Counts the entries in a journal.
+
+    @return {int}
+    """
+
+    with open(path, 'r') as f:
+        return len(f.readlines())
+
+def test_journal_replayed(path):
+    """
+    Finds and solves journaled before a restart are replayed, and the journal
+    is removed once they're in a snapshot.
+    """
+
+    receiver = BitboxingReceiver(VERSION, path)
+    receiver.handle_find("alice", "MVMKB")
+    receiver.handle_solve("alice", "MVMKB", "G")
+    receiver.close()
+
+    receiver = BitboxingReceiver(VERSION, path)
+    receiver.close()
+
+    assert stats(receiver, "alice") == (1, 1)
+    assert lines(path + ".journal") == 0
+
+@pytest.mark.parametrize("before", [0, 1])
+def test_torn_entry_cut_off(path, before):
+    """
+    A torn last entry is dropped on replay, with or without complete entries
+    before it, and entries journaled after the restart are kept.
+    """
+
+    receiver = BitboxingReceiver(VERSION, path)
+    if before:
+        receiver.handle_find("alice", "MVMKB")
+    receiver.close()
+
+    with open(path + ".journal", 'a') as f:
+        f.write('{"cache": "TDQXO", "player": "bo')
+
+    receiver = BitboxingReceiver(VERSION, path)
+    receiver.handle_find("bob", "TDQXO")
+    receiver.close()
+
+    receiver = BitboxingReceiver(VERSION, path)
+    receiver.close()
+
+    assert stats(receiver, "alice") == (before, 0)
+    assert stats(receiver, "bob") == (1, 0)
+
+def test_failed_snapshot_keeps_old_journal(path, monkeypatch):
+    """
+    While snapshots fail, each rotation appends the journal to the old one
+    instead of replacing it, so every entry is replayed on restart.
+    """
+
+    receiver = BitboxingReceiver(VERSION, path)
+    monkeypatch.setattr(BitboxingReceiver, "_write_snapshot", staticmethod(lambda path, data: False))
+
+    receiver.handle_find("alice", "MVMKB")
+    receiver.snapshot()
+    receiver.handle_find("bob", "MVMKB")
+    receiver.snapshot()
+    receiver.handle_find("carol", "TDQXO")
+    receiver.close()
+
+    assert lines(path + ".journal.old") == 2
+    assert lines(path + ".journal") == 1
+
+    monkeypatch.undo()
+    receiver = BitboxingReceiver(VERSION, path)
+    receiver.close()
+
+    assert [stats(receiver, x) for x in ["alice", "bob", "carol"]] == [(1, 0)] * 3
+    assert not os.path.exists(path + ".journal.old")
+
+def test_snapshot_removes_old_journal(path):
+    """
+    A successful snapshot removes the journal it replaced.
+    """
+
+    receiver = BitboxingReceiver(VERSION, path)
+    receiver.handle_find("alice", "MVMKB")
+    receiver.snapshot()
+    receiver.close()
+
+    assert not os.path.exists(path + ".journal.old")
+    assert lines(path + ".journal") == 0
+
+    with open(path, 'r') as f:
+        assert 'alice' in f.read()